@@ -5,12 +5,11 @@ Webインターフェースとチャットボットのエンドポイントを
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 import os
+import threading
 from dotenv import load_dotenv
 import logging
 
-from src.vector_store import VectorStoreManager
-from src.chatbot import JTBCSupportChatbot
-from src.scheduler import UpdateScheduler
+from src.warmup import Warmup
 
 # 環境変数のロード
 load_dotenv()
@@ -37,6 +36,11 @@ def initialize_app():
         return False
     
     try:
+        # LangChain・Chroma・スケジューラーの読み込みはここで行う（サーバーの起動を待たせない）
+        from src.vector_store import VectorStoreManager
+        from src.chatbot import JTBCSupportChatbot
+        from src.scheduler import UpdateScheduler
+        
         # ベクトルストアの初期化
         logger.info("Initializing vector store...")
         vs_manager = VectorStoreManager(api_key)
@@ -44,13 +48,19 @@ def initialize_app():
         
         # チャットボットの初期化
         logger.info("Initializing chatbot...")
-        chatbot = JTBCSupportChatbot(vectorstore, api_key)
+        chatbot = JTBCSupportChatbot(vectorstore, api_key, lexical_index=vs_manager.lexical_index)
+        
+        # 更新で有効化された新しい世代のインデックスを、再起動せずに読み込む
+        vs_manager.watch_generations(
+            lambda: chatbot.retriever.swap(vs_manager.vectorstore, vs_manager.lexical_index)
+        )
         
         # スケジューラーの開始
         update_interval = int(os.getenv('UPDATE_INTERVAL_HOURS', 24))
         logger.info(f"Starting scheduler (interval: {update_interval} hours)...")
         scheduler = UpdateScheduler(interval_hours=update_interval)
-        scheduler.start()
+        # 初回の更新（全サイトのクロール）は時間がかかるので、準備完了を待たせずに別スレッドで実行する
+        threading.Thread(target=scheduler.start, name='initial-update', daemon=True).start()
         
         logger.info("Application initialized successfully")
         return True
@@ -60,6 +70,10 @@ def initialize_app():
         return False
 
 
+# 初期化はバックグラウンドで行い、HTTPサーバーはすぐに起動する
+warmup = Warmup(initialize_app, name='app-warmup')
+
+
 @app.route('/')
 def index():
     """ホームページ"""
@@ -72,15 +86,17 @@ def chat():
     try:
         data = request.get_json()
         question = data.get('question', '')
+        # 省略時は全カテゴリを検索する
+        category = data.get('category') or None
         
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         # 回答を生成
-        response = chatbot.ask(question)
+        response = chatbot.ask(question, category=category)
         
         return jsonify(response)
         
@@ -94,7 +110,7 @@ def suggestions():
     """サジェスト質問を取得"""
     try:
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         suggested = chatbot.get_suggested_questions()
         return jsonify({'suggestions': suggested})
@@ -104,16 +120,38 @@ def suggestions():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/categories', methods=['GET'])
+def categories():
+    """質問を絞り込めるカテゴリを取得"""
+    try:
+        if chatbot is None:
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
+        
+        return jsonify({'categories': chatbot.get_categories()})
+        
+    except Exception as e:
+        logger.error(f"Error in categories endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/status', methods=['GET'])
 def status():
     """システムステータスを取得"""
     return jsonify({
         'status': 'running',
         'chatbot_ready': chatbot is not None,
-        'scheduler_running': scheduler is not None
+        'warmup': warmup.status(),
+        'scheduler_running': scheduler is not None,
+        'query_cache': chatbot.retriever.cache.stats() if chatbot is not None else None
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """準備完了の確認（初期化が終わるまでは503を返す）"""
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+
 @app.route('/api/update', methods=['POST'])
 def trigger_update():
     """手動でデータ更新をトリガー"""
@@ -121,8 +159,9 @@ def trigger_update():
         if scheduler is None:
             return jsonify({'error': 'Scheduler not initialized'}), 500
         
-        # 更新を実行
-        scheduler.update_data()
+        # 更新を実行（初回実行・定期実行などの更新が実行中なら409）
+        if not scheduler.update_data():
+            return jsonify({'error': 'Update already in progress'}), 409
         
         return jsonify({'message': 'Update triggered successfully'})
         
@@ -132,14 +171,13 @@ def trigger_update():
 
 
 if __name__ == '__main__':
-    # アプリケーション初期化
-    if initialize_app():
-        # サーバー起動
-        port = int(os.getenv('FLASK_PORT', 5000))
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=os.getenv('FLASK_ENV') == 'development'
-        )
-    else:
-        logger.error("Failed to initialize application")
+    # アプリケーションの初期化はバックグラウンドで行う（準備ができたかは /api/ready で確認できる）
+    warmup.start()
+    
+    # サーバー起動
+    port = int(os.getenv('FLASK_PORT', 5000))
+    app.run(
+        host='0.0.0.0',
+        port=port,
+        debug=os.getenv('FLASK_ENV') == 'development'
+    )
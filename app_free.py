@@ -8,9 +8,7 @@ import os
 from dotenv import load_dotenv
 import logging
 
-from src.vector_store_free import VectorStoreManager
-from src.chatbot_free import JTBCSupportChatbot
-from src.scheduler import UpdateScheduler
+from src.warmup import Warmup
 
 # 環境変数のロード
 load_dotenv()
@@ -43,6 +41,11 @@ def initialize_app():
             return False
     
     try:
+        # LangChain・Chroma・埋め込みモデルの読み込みはここで行う（サーバーの起動を待たせない）
+        from src.vector_store_free import VectorStoreManager
+        from src.chatbot_free import JTBCSupportChatbot
+        from src.scheduler import UpdateScheduler
+        
         # ベクトルストアの初期化
         logger.info("Initializing vector store...")
         api_key = os.getenv('OPENAI_API_KEY') if not use_local else None
@@ -56,7 +59,13 @@ def initialize_app():
             vectorstore=vectorstore, 
             api_key=api_key,
             use_local=use_local,
-            model=model
+            model=model,
+            lexical_index=vs_manager.lexical_index
+        )
+        
+        # 更新で有効化された新しい世代のインデックスを、再起動せずに読み込む
+        vs_manager.watch_generations(
+            lambda: chatbot.retriever.swap(vs_manager.vectorstore, vs_manager.lexical_index)
         )
         
         # スケジューラーの開始
@@ -76,6 +85,10 @@ def initialize_app():
         return False
 
 
+# 初期化はバックグラウンドで行い、HTTPサーバーはすぐに起動する
+warmup = Warmup(initialize_app, name='app-warmup')
+
+
 @app.route('/')
 def index():
     """ホームページ"""
@@ -88,15 +101,17 @@ def chat():
     try:
         data = request.get_json()
         question = data.get('question', '')
+        # 省略時は全カテゴリを検索する
+        category = data.get('category') or None
         
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         # 回答を生成
-        response = chatbot.ask(question)
+        response = chatbot.ask(question, category=category)
         
         return jsonify(response)
         
@@ -110,7 +125,7 @@ def suggestions():
     """サジェスト質問を取得"""
     try:
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         suggested = chatbot.get_suggested_questions()
         return jsonify({'suggestions': suggested})
@@ -120,6 +135,20 @@ def suggestions():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/categories', methods=['GET'])
+def categories():
+    """質問を絞り込めるカテゴリを取得"""
+    try:
+        if chatbot is None:
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
+        
+        return jsonify({'categories': chatbot.get_categories()})
+        
+    except Exception as e:
+        logger.error(f"Error in categories endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/status', methods=['GET'])
 def status():
     """システムステータスを取得"""
@@ -127,12 +156,20 @@ def status():
     return jsonify({
         'status': 'running',
         'chatbot_ready': chatbot is not None,
+        'warmup': warmup.status(),
         'scheduler_running': scheduler is not None,
         'mode': 'free' if use_local else 'openai',
-        'model': os.getenv('LOCAL_LLM_MODEL', 'gemma2:2b') if use_local else 'gpt-4o-mini'
+        'model': os.getenv('LOCAL_LLM_MODEL', 'gemma2:2b') if use_local else 'gpt-4o-mini',
+        'query_cache': chatbot.retriever.cache.stats() if chatbot is not None else None
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """準備完了の確認（初期化が終わるまでは503を返す）"""
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+
 @app.route('/api/update', methods=['POST'])
 def trigger_update():
     """手動でデータ更新をトリガー"""
@@ -140,8 +177,9 @@ def trigger_update():
         if scheduler is None:
             return jsonify({'error': 'Scheduler not initialized'}), 500
         
-        # 更新を実行
-        scheduler.update_data()
+        # 更新を実行（初回実行・定期実行などの更新が実行中なら409）
+        if not scheduler.update_data():
+            return jsonify({'error': 'Update already in progress'}), 409
         
         return jsonify({'message': 'Update triggered successfully'})
         
@@ -151,23 +189,22 @@ def trigger_update():
 
 
 if __name__ == '__main__':
-    # アプリケーション初期化
-    if initialize_app():
-        # サーバー起動
-        port = int(os.getenv('FLASK_PORT', 5000))
-        print()
-        print("=" * 60)
-        print("🚀 JTBCサポートデスク チャットボット - 無料版")
-        print("=" * 60)
-        print(f"🌐 URL: http://localhost:{port}")
-        print("💰 コスト: 完全無料（APIキー不要）")
-        print("🤖 モデル:", os.getenv('LOCAL_LLM_MODEL', 'gemma2:2b'))
-        print()
-        
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=os.getenv('FLASK_ENV') == 'development'
-        )
-    else:
-        logger.error("Failed to initialize application")
+    # アプリケーションの初期化はバックグラウンドで行う（準備ができたかは /api/ready で確認できる）
+    warmup.start()
+    
+    # サーバー起動
+    port = int(os.getenv('FLASK_PORT', 5000))
+    print()
+    print("=" * 60)
+    print("🚀 JTBCサポートデスク チャットボット - 無料版")
+    print("=" * 60)
+    print(f"🌐 URL: http://localhost:{port}")
+    print("💰 コスト: 完全無料（APIキー不要）")
+    print("🤖 モデル:", os.getenv('LOCAL_LLM_MODEL', 'gemma2:2b'))
+    print()
+    
+    app.run(
+        host='0.0.0.0',
+        port=port,
+        debug=os.getenv('FLASK_ENV') == 'development'
+    )
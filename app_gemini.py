@@ -8,8 +8,7 @@ import os
 from dotenv import load_dotenv
 import logging
 
-from src.vector_store_free import VectorStoreManager
-from src.chatbot_gemini import JTBCSupportChatbot
+from src.warmup import Warmup
 # from src.scheduler import UpdateScheduler  # スケジューラーは一時的に無効化
 
 # 環境変数のロード
@@ -37,6 +36,10 @@ def initialize_app():
         return False
     
     try:
+        # LangChain・Chroma・埋め込みモデルの読み込みはここで行う（サーバーの起動を待たせない）
+        from src.vector_store_free import VectorStoreManager
+        from src.chatbot_gemini import JTBCSupportChatbot
+        
         # ベクトルストアの初期化（HuggingFace Embeddings - 完全無料）
         logger.info("Initializing vector store with HuggingFace Embeddings (FREE)...")
         vs_manager = VectorStoreManager(use_free=True)
@@ -48,7 +51,13 @@ def initialize_app():
         chatbot = JTBCSupportChatbot(
             vectorstore=vectorstore,
             gemini_api_key=gemini_api_key,
-            model=model
+            model=model,
+            lexical_index=vs_manager.lexical_index
+        )
+        
+        # 更新で有効化された新しい世代のインデックスを、再起動せずに読み込む
+        vs_manager.watch_generations(
+            lambda: chatbot.retriever.swap(vs_manager.vectorstore, vs_manager.lexical_index)
         )
         
         # スケジューラーの開始（必要に応じて）
@@ -68,6 +77,10 @@ def initialize_app():
         return False
 
 
+# 初期化はバックグラウンドで行い、HTTPサーバーはすぐに起動する
+warmup = Warmup(initialize_app, name='app-warmup')
+
+
 @app.route('/')
 def index():
     """ホームページ"""
@@ -80,15 +93,17 @@ def chat():
     try:
         data = request.get_json()
         question = data.get('question', '')
+        # 省略時は全カテゴリを検索する
+        category = data.get('category') or None
         
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         # 回答を生成
-        response = chatbot.ask(question)
+        response = chatbot.ask(question, category=category)
         
         return jsonify(response)
         
@@ -102,7 +117,7 @@ def suggestions():
     """サジェスト質問を取得"""
     try:
         if chatbot is None:
-            return jsonify({'error': 'Chatbot not initialized'}), 500
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
         
         suggested = chatbot.get_suggested_questions()
         return jsonify({'suggestions': suggested})
@@ -112,20 +127,42 @@ def suggestions():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/categories', methods=['GET'])
+def categories():
+    """質問を絞り込めるカテゴリを取得"""
+    try:
+        if chatbot is None:
+            return jsonify({'error': 'Chatbot not ready', 'warmup': warmup.status()}), 503
+        
+        return jsonify({'categories': chatbot.get_categories()})
+        
+    except Exception as e:
+        logger.error(f"Error in categories endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/status', methods=['GET'])
 def status():
     """システムステータスを取得"""
     return jsonify({
         'status': 'running',
         'chatbot_ready': chatbot is not None,
+        'warmup': warmup.status(),
         'scheduler_running': scheduler is not None,
         'mode': 'gemini',
         'embeddings': 'HuggingFace (FREE)',
         'llm': os.getenv('GEMINI_MODEL', 'gemini-pro'),
-        'cost': '無料枠60リクエスト/月'
+        'cost': '無料枠60リクエスト/月',
+        'query_cache': chatbot.retriever.cache.stats() if chatbot is not None else None
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """準備完了の確認（初期化が終わるまでは503を返す）"""
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+
 @app.route('/api/update', methods=['POST'])
 def trigger_update():
     """手動でデータ更新をトリガー"""
@@ -133,8 +170,9 @@ def trigger_update():
         if scheduler is None:
             return jsonify({'error': 'Scheduler not initialized'}), 500
         
-        # 更新を実行
-        scheduler.update_data()
+        # 更新を実行（初回実行・定期実行などの更新が実行中なら409）
+        if not scheduler.update_data():
+            return jsonify({'error': 'Update already in progress'}), 409
         
         return jsonify({'message': 'Update triggered successfully'})
         
@@ -144,29 +182,28 @@ def trigger_update():
 
 
 if __name__ == '__main__':
-    # アプリケーション初期化
-    if initialize_app():
-        # サーバー起動
-        port = int(os.getenv('FLASK_PORT', 5000))
-        print()
-        print("=" * 60)
-        print("🚀 JTBCサポートデスク チャットボット - Gemini版")
-        print("=" * 60)
-        print(f"🌐 URL: http://localhost:{port}")
-        print()
-        print("💰 コスト構成:")
-        print("   - Embeddings: HuggingFace（完全無料・無制限）✨")
-        print("   - LLM: Google Gemini（無料枠60リクエスト/月）")
-        print()
-        print("📊 使用状況:")
-        print("   - ベクトル化: 無料枠を消費しません")
-        print("   - チャット回答: 1回につき1リクエスト消費")
-        print()
-        
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=os.getenv('FLASK_ENV') == 'development'
-        )
-    else:
-        logger.error("Failed to initialize application")
+    # アプリケーションの初期化はバックグラウンドで行う（準備ができたかは /api/ready で確認できる）
+    warmup.start()
+    
+    # サーバー起動
+    port = int(os.getenv('FLASK_PORT', 5000))
+    print()
+    print("=" * 60)
+    print("🚀 JTBCサポートデスク チャットボット - Gemini版")
+    print("=" * 60)
+    print(f"🌐 URL: http://localhost:{port}")
+    print()
+    print("💰 コスト構成:")
+    print("   - Embeddings: HuggingFace（完全無料・無制限）✨")
+    print("   - LLM: Google Gemini（無料枠60リクエスト/月）")
+    print()
+    print("📊 使用状況:")
+    print("   - ベクトル化: 無料枠を消費しません")
+    print("   - チャット回答: 1回につき1リクエスト消費")
+    print()
+    
+    app.run(
+        host='0.0.0.0',
+        port=port,
+        debug=os.getenv('FLASK_ENV') == 'development'
+    )
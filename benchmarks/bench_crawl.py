@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+クロールのスループット計測
+記録済みのアーカイブ（src/crawl_archive.py）をローカルのHTTPサーバーで再生し、
+ワーカー数・解析プロセス数を変えたCrawlEngine.crawl_allの性能を比較します。
+各設定は別プロセスで実行し、ピークRSSを個別に計測します。
+
+使い方:
+    # 本番サイトから1回だけ記録する（CRAWL_SITESで指定したサイト）
+    python benchmarks/bench_crawl.py record data/crawl_archive
+
+    # 記録を再生して計測する
+    python benchmarks/bench_crawl.py run data/crawl_archive \\
+        --variant workers=1,parse=0 --variant workers=8,parse=2 --latency-ms 50
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from crawl_archive import CrawlArchive, ReplayServer, origin_of
+from crawl_engine import CrawlEngine, extract_page
+from site_profiles import get_profiles
+
+DEFAULT_VARIANTS = ['workers=1,parse=0', 'workers=4,parse=0', 'workers=8,parse=0', 'workers=4,parse=2']
+
+
+def parse_variant(spec: str) -> dict:
+    """"workers=4,parse=2" 形式の設定を辞書に変換"""
+    values = dict(part.split('=', 1) for part in spec.split(',') if part)
+    return {'workers': int(values.get('workers', 4)), 'parse': int(values.get('parse', 0))}
+
+
+def record(args) -> int:
+    """本番サイトをクロールし、すべてのレスポンスをアーカイブに記録する"""
+    with tempfile.TemporaryDirectory() as tmp:
+        # 検証子キャッシュを空にして、全ページの本文を記録する
+        engine = CrawlEngine(
+            get_profiles(args.sites),
+            cache_path=os.path.join(tmp, 'http_cache.json'),
+            sitemap_state_path=os.path.join(tmp, 'sitemap_state.json'),
+            record_dir=args.archive_dir
+        )
+        articles = engine.crawl_all()
+    print(f"📼 Recorded {len(articles)} articles to {args.archive_dir}")
+    return 0
+
+
+def run_variant(args) -> dict:
+    """再生サーバーに対して1つの設定でcrawl_allを実行し、計測結果を返す"""
+    variant = parse_variant(args.single_variant)
+    archive = CrawlArchive(args.archive_dir)
+    rate = args.rate
+
+    servers = []
+    profiles = []
+    for profile in get_profiles(','.join(archive.sites)):
+        server = ReplayServer(archive, origin_of(profile.base_url), latency=args.latency_ms / 1000).start()
+        servers.append(server)
+        profiles.append(replace(
+            profile,
+            base_url=server.url + urlsplit(profile.base_url).path,
+            auth='none',
+            requests_per_second=rate,
+            max_requests_per_second=rate
+        ))
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = CrawlEngine(
+                profiles,
+                max_workers=variant['workers'],
+                parse_workers=variant['parse'],
+                cache_path=os.path.join(tmp, 'http_cache.json'),
+                sitemap_state_path=os.path.join(tmp, 'sitemap_state.json')
+            )
+            if args.warm:
+                # 1回目で検証子キャッシュを作り、2回目（条件付きGET）を計測する
+                engine.crawl_all()
+
+            start = time.perf_counter()
+            articles = engine.crawl_all()
+            elapsed = time.perf_counter() - start
+            stats = engine.transport_stats.summary()
+    finally:
+        for server in servers:
+            server.stop()
+
+    return {
+        'variant': args.single_variant,
+        'articles': len(articles),
+        'requests': stats['requests'],
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(stats['requests'] / elapsed, 1) if elapsed else 0.0,
+        'bytes': stats['bytes'],
+        # Linuxではru_maxrssはKB単位
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'children_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def measure_parse(archive: CrawlArchive) -> float:
+    """記録済みの記事ページ1件あたりの解析時間（ミリ秒）"""
+    pages = []
+    for profile in get_profiles(','.join(archive.sites)):
+        origin = origin_of(profile.base_url)
+        pages.extend(
+            (body, profile.content_selectors, profile.title_selectors, profile.breadcrumb_selectors)
+            for url, body in archive.iter_pages(profile.article_pattern)
+            if url.startswith(origin)
+        )
+    if not pages:
+        return 0.0
+    start = time.perf_counter()
+    for page in pages:
+        extract_page(page)
+    return (time.perf_counter() - start) * 1000 / len(pages)
+
+
+def run(args) -> int:
+    archive = CrawlArchive(args.archive_dir)
+    print(f"📼 {args.archive_dir}: sites={', '.join(archive.sites)}, "
+          f"{len(archive.entries)} responses, latency={args.latency_ms} ms, warm={args.warm}")
+    print(f"🧩 parse time: {measure_parse(archive):.2f} ms/page")
+
+    print(f"{'variant':<22}{'articles':>9}{'pages/s':>10}{'seconds':>9}{'MB':>8}{'RSS MB':>9}{'child MB':>10}")
+    for spec in args.variant or DEFAULT_VARIANTS:
+        command = [sys.executable, os.path.abspath(__file__), 'run', args.archive_dir,
+                   '--single-variant', spec, '--latency-ms', str(args.latency_ms), '--rate', str(args.rate)]
+        if args.warm:
+            command.append('--warm')
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{spec:<22}{result['articles']:>9}{result['pages_per_sec']:>10.1f}{result['seconds']:>9.2f}"
+              f"{result['bytes'] / 1024 / 1024:>8.2f}{result['peak_rss_mb']:>9.1f}{result['children_peak_rss_mb']:>10.1f}")
+    return 0
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='本番サイトのレスポンスを記録する')
+    record_parser.add_argument('archive_dir', help='アーカイブの保存先')
+    record_parser.add_argument('--sites', help='サイトプロファイル名（カンマ区切り、省略時はCRAWL_SITES）')
+
+    run_parser = subparsers.add_parser('run', help='記録を再生して計測する')
+    run_parser.add_argument('archive_dir', help='記録済みのアーカイブ')
+    run_parser.add_argument('--variant', action='append', help='計測する設定（例: workers=4,parse=2、複数指定可）')
+    run_parser.add_argument('--latency-ms', type=float, default=0.0, help='再生サーバーで加える1リクエストあたりの遅延')
+    run_parser.add_argument('--rate', type=float, default=1000.0, help='ホストごとのレート上限（再生時は高めにする）')
+    run_parser.add_argument('--warm', action='store_true', help='検証子キャッシュが温まった状態（条件付きGET）を計測する')
+    run_parser.add_argument('--single-variant', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        return record(args)
+    if args.single_variant:
+        print(json.dumps(run_variant(args)))
+        return 0
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
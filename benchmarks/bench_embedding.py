@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+埋め込みのスループット計測
+記事ファイルのチャンク（省略時は合成テキスト）を、プロセス数とバッチサイズを変えた
+BatchedSentenceEmbeddings（src/embedding_pipeline.py）で埋め込み、chunks/sを比較します。
+
+使い方:
+    python benchmarks/bench_embedding.py [記事ファイル] --processes 0 --processes 2 --processes -1 --batch-size 64
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from article_store import iter_articles
+from embedding_pipeline import BatchedSentenceEmbeddings, resolve_processes
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def load_chunks(filepath: str, limit: int, chunk_size: int = 1000) -> list:
+    """記事本文をchunk_size文字ずつに区切ったテキスト"""
+    chunks = []
+    for article in iter_articles(filepath):
+        content = article.get('content', '')
+        chunks.extend(content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+        if len(chunks) >= limit:
+            break
+    return chunks[:limit]
+
+
+def synthetic_chunks(count: int) -> list:
+    """長さのばらついた計測用のテキスト"""
+    return [('ご利用方法についての説明です。' * (5 + i % 60)) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('articles', nargs='?', help='記事ファイル（.json / .jsonl）')
+    parser.add_argument('--limit', type=int, default=2000, help='埋め込むチャンク数')
+    parser.add_argument('--processes', type=int, action='append', help='プロセス数（複数指定可、-1でCPUコア数）')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--model', default=MODEL_NAME)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.articles, args.limit) if args.articles else synthetic_chunks(args.limit)
+    print(f"🧪 {len(chunks)} chunks, model={args.model}, batch_size={args.batch_size}, cpus={os.cpu_count()}")
+    print(f"{'processes':>10}{'seconds':>10}{'chunks/s':>10}")
+
+    for processes in args.processes or [0, -1]:
+        embeddings = BatchedSentenceEmbeddings(args.model, batch_size=args.batch_size, processes=processes)
+        # モデルの読み込みとプールの起動は計測から除く
+        embeddings.embed_documents(chunks[:args.batch_size])
+        embeddings.start_pool()
+        try:
+            start = time.perf_counter()
+            embeddings.embed_documents(chunks)
+            elapsed = time.perf_counter() - start
+        finally:
+            embeddings.close()
+        print(f"{max(1, resolve_processes(processes)):>10}{elapsed:>10.2f}{len(chunks) / elapsed:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+埋め込みの実行方式の計測
+PyTorch（BatchedSentenceEmbeddings）とONNX Runtime（OnnxSentenceEmbeddings、fp32 / int8）で、
+モデルの読み込み時間・質問1件の埋め込みレイテンシ・チャンクのインデックス化スループット・RSSと、
+最初のバックエンドのベクトルとのコサイン類似度を比較します。
+各バックエンドは別プロセスで実行し、RSSを個別に計測します。
+
+使い方:
+    python benchmarks/bench_embedding_backend.py [記事ファイル] --limit 1000 --threads 0
+    python benchmarks/bench_embedding_backend.py --backend torch --backend onnx-int8 --threads 1 --threads 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+
+from bench_embedding import MODEL_NAME, load_chunks, synthetic_chunks
+from bench_vector_index import rss_mb
+from embedding_pipeline import BatchedSentenceEmbeddings
+from onnx_embeddings import OnnxSentenceEmbeddings
+
+DEFAULT_BACKENDS = ['torch', 'onnx', 'onnx-int8']
+QUERIES = [
+    '総務省への届出について教えてください',
+    '請求書の発行方法',
+    'パスワードを忘れた場合',
+    '一次代理店の申請手続き',
+    '解約の手順を知りたい',
+]
+
+
+def create_embeddings(backend: str, args):
+    if backend == 'torch':
+        return BatchedSentenceEmbeddings(args.model, batch_size=args.batch_size)
+    return OnnxSentenceEmbeddings(args.model, batch_size=args.batch_size, quantize=backend == 'onnx-int8',
+                                  threads=args.single_threads, cache_dir=args.cache_dir)
+
+
+def run_backend(args) -> dict:
+    """1つのバックエンドで読み込み・質問の埋め込み・チャンクの埋め込みを計測する"""
+    chunks = load_chunks(args.articles, args.limit) if args.articles else synthetic_chunks(args.limit)
+    if args.single_backend == 'torch':
+        # PyTorchのスレッド数もONNX Runtimeと揃える
+        import torch
+        if args.single_threads:
+            torch.set_num_threads(args.single_threads)
+
+    base_rss = rss_mb()
+    embeddings = create_embeddings(args.single_backend, args)
+    start = time.perf_counter()
+    embeddings.embed_query(QUERIES[0])
+    load_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(args.queries):
+        start = time.perf_counter()
+        embeddings.embed_query(QUERIES[i % len(QUERIES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(chunks)
+    index_s = time.perf_counter() - start
+    np.save(args.save_vectors, np.asarray(vectors, dtype=np.float32))
+
+    return {
+        'load_s': round(load_s, 2),
+        'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p99_ms': round(latencies[max(0, int(len(latencies) * 0.99) - 1)], 2),
+        'chunks_per_s': round(len(chunks) / index_s, 1),
+        'rss_mb': rss_mb(),
+        'rss_delta_mb': round(rss_mb() - base_rss, 1),
+    }
+
+
+def cosine_to(reference: np.ndarray, vectors: np.ndarray) -> float:
+    """各チャンクのベクトルと基準のベクトルのコサイン類似度の最小値"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return float((reference * vectors).sum(axis=1).min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('articles', nargs='?', help='記事ファイル（.json / .jsonl）')
+    parser.add_argument('--limit', type=int, default=1000, help='埋め込むチャンク数')
+    parser.add_argument('--queries', type=int, default=100, help='レイテンシを計測する質問の回数')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--backend', action='append', help='torch / onnx / onnx-int8（複数指定可）')
+    parser.add_argument('--threads', type=int, action='append', help='演算スレッド数（複数指定可、0で既定値）')
+    parser.add_argument('--cache-dir', default='data/onnx_models', help='書き出したONNXモデルの保存先')
+    parser.add_argument('--single-backend', help=argparse.SUPPRESS)
+    parser.add_argument('--single-threads', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--save-vectors', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_backend:
+        print(json.dumps(run_backend(args)))
+        return 0
+
+    print(f"🧪 {args.limit} chunks, {args.queries} queries, model={args.model}, "
+          f"batch_size={args.batch_size}, cpus={os.cpu_count()}")
+    print(f"{'backend':<12}{'threads':>8}{'load s':>8}{'p50 ms':>8}{'p99 ms':>8}{'chunks/s':>10}"
+          f"{'RSS MB':>8}{'+RSS MB':>9}{'min cos':>9}")
+    reference = None
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backend or DEFAULT_BACKENDS:
+            for threads in args.threads or [0]:
+                vectors_path = os.path.join(directory, f"{backend}-{threads}.npy")
+                command = [sys.executable, os.path.abspath(__file__), '--single-backend', backend,
+                           '--single-threads', str(threads), '--save-vectors', vectors_path,
+                           '--limit', str(args.limit), '--queries', str(args.queries),
+                           '--batch-size', str(args.batch_size), '--model', args.model, '--cache-dir', args.cache_dir]
+                if args.articles:
+                    command.append(args.articles)
+                completed = subprocess.run(command, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    print(f"{backend:<12}{threads:>8} failed: {completed.stderr.strip().splitlines()[-1]}")
+                    continue
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                vectors = np.load(vectors_path)
+                # 最初に成功したバックエンドのベクトルを基準にする
+                if reference is None:
+                    reference = vectors
+                print(f"{backend:<12}{threads or 'auto':>8}{result['load_s']:>8.2f}{result['p50_ms']:>8.2f}"
+                      f"{result['p99_ms']:>8.2f}{result['chunks_per_s']:>10.1f}{result['rss_mb']:>8.1f}"
+                      f"{result['rss_delta_mb']:>9.1f}{cosine_to(reference, vectors):>9.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
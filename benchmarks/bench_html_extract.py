@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+HTML抽出のマイクロベンチマーク
+保存済みのページに対して、従来のBeautifulSoup(html.parser)による解析と
+lxmlベースの抽出レイヤー（src/html_extract.py）の1ページあたりの処理時間を比較します。
+
+使い方:
+    python benchmarks/bench_html_extract.py [保存済みHTMLのディレクトリ] [--repeat N]
+
+ディレクトリを省略した場合は、Zendesk風の合成ページで計測します。
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+from html_extract import extract_links, extract_article
+
+
+def synthetic_page(links: int = 300, paragraphs: int = 80) -> bytes:
+    """計測用の合成ページを作成"""
+    nav = ''.join(
+        f'<li><a href="/hc/ja/articles/{360000000 + i}-記事タイトル{i}?source=list">記事タイトル{i}</a></li>'
+        for i in range(links)
+    )
+    body = ''.join(f'<p>本文の段落{i}です。<strong>重要</strong>な説明が続きます。</p>' for i in range(paragraphs))
+    return (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"><title>記事</title>'
+        '<script>var x = 1;</script><style>p { color: red; }</style></head><body>'
+        f'<header><nav><ul>{nav}</ul></nav></header>'
+        f'<main><h1>記事タイトル</h1><div class="article-body">{body}</div></main>'
+        '</body></html>'
+    ).encode('utf-8')
+
+
+def bs4_links(content: bytes):
+    soup = BeautifulSoup(content, 'html.parser')
+    return [
+        (link.get('href', ''), link.get_text(strip=True))
+        for link in soup.find_all('a', href=True)
+        if '/hc/ja/articles/' in link.get('href', '')
+    ]
+
+
+def bs4_article(content: bytes):
+    soup = BeautifulSoup(content, 'html.parser')
+    title_elem = soup.find('h1') or soup.find('title')
+    content_elem = soup.find('div', class_='article-body') or soup.find('article') or soup.find('main')
+    return {
+        'title': title_elem.get_text(strip=True) if title_elem else '',
+        'content': content_elem.get_text(separator='\n', strip=True) if content_elem else '',
+    }
+
+
+def lxml_links(content: bytes):
+    return extract_links(content, '/hc/ja/articles/')
+
+
+def lxml_article(content: bytes):
+    return extract_article(content)
+
+
+def measure(func, pages, repeat: int) -> float:
+    """1ページあたりの平均処理時間（ミリ秒）を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            func(page)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages_dir', nargs='?', help='保存済みHTMLファイル（*.html）のディレクトリ')
+    parser.add_argument('--repeat', type=int, default=20, help='計測の繰り返し回数')
+    args = parser.parse_args()
+
+    if args.pages_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages_dir, '*.html'))):
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        if not pages:
+            print(f"❌ {args.pages_dir} に *.html が見つかりません")
+            return 1
+    else:
+        pages = [synthetic_page()]
+
+    total_kb = sum(len(page) for page in pages) / 1024
+    print(f"📄 {len(pages)} pages ({total_kb:.1f} KB), repeat={args.repeat}")
+
+    # 抽出結果が一致することを確認
+    mismatches = sum(1 for page in pages if bs4_article(page)['content'] != lxml_article(page)['content'])
+    if mismatches:
+        print(f"⚠️  本文の抽出結果が異なるページ: {mismatches}")
+
+    print(f"{'':<10}{'BeautifulSoup':>16}{'lxml':>12}{'speedup':>10}")
+    for name, baseline, fast in [('links', bs4_links, lxml_links), ('article', bs4_article, lxml_article)]:
+        baseline_ms = measure(baseline, pages, args.repeat)
+        fast_ms = measure(fast, pages, args.repeat)
+        print(f"{name:<10}{baseline_ms:>13.2f} ms{fast_ms:>9.2f} ms{baseline_ms / fast_ms:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+ベクトルインデックスの計測
+合成した埋め込みに対して、
+NumPyのフラットインデックス（src/flat_index.py）とChromaの読み込み時間・検索レイテンシ・RSSと、
+float32での厳密検索に対する再現率（recall@k）・ベクトルのメモリ・ディスク使用量を比較します。
+各バックエンドは別プロセスで実行し、RSSを個別に計測します。
+
+使い方:
+    python benchmarks/bench_vector_index.py --count 5000 --dim 384 --queries 200
+    python benchmarks/bench_vector_index.py --dim 1536 --backend flat --backend flat:int8 --backend flat:int8:norescore
+
+バックエンドの指定: flat[:精度[:norescore]]（精度はfloat32 / float16 / int8）、chroma
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from flat_index import FlatIndex
+
+DEFAULT_BACKENDS = ['flat', 'flat:float16', 'flat:int8', 'flat:int8:norescore', 'chroma']
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """計測用: テキスト（"doc-{番号}" / "query-{番号}"）に対応する合成ベクトルを返す"""
+
+    def __init__(self, vectors: np.ndarray, queries: np.ndarray):
+        self.vectors = vectors
+        self.queries = queries
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text.split('-')[1])].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.queries[int(text.split('-')[1])].tolist()
+
+
+def synthetic(count: int, dim: int, queries: int, seed: int = 0):
+    """クラスタ構造を持つ合成ベクトル（実際の埋め込みと同様に近傍が偏る）と、既存ベクトル近くの質問"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 50), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+    targets = vectors[rng.integers(0, count, queries)]
+    query_vectors = targets + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32)
+    return vectors, query_vectors
+
+
+def rss_mb() -> float:
+    """現在のRSS（/proc がない環境ではピークRSS）"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # Linuxではru_maxrssはKB単位
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def parse_backend(spec: str) -> dict:
+    """"flat:int8:norescore" 形式の指定を辞書に変換"""
+    parts = spec.split(':')
+    return {
+        'name': parts[0],
+        'precision': parts[1] if len(parts) > 1 else 'float32',
+        'rescore': 'norescore' not in parts[2:],
+    }
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """float32の全件検索による正解（各質問の上位k件の行番号）"""
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ vectors.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def directory_mb(directory: str) -> float:
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+    return round(total / 1024 / 1024, 2)
+
+
+def flat_index(directory: str, embeddings: Embeddings, backend: dict) -> FlatIndex:
+    return FlatIndex(directory, embeddings, precision=backend['precision'], rescore=backend['rescore'])
+
+
+def build(backend: dict, directory: str, embeddings: Embeddings, count: int):
+    texts = [f"doc-{i}" for i in range(count)]
+    metadatas = [{'url': f"https://example.com/articles/{i // 4}", 'chunk': i % 4} for i in range(count)]
+    ids = [str(i) for i in range(count)]
+    if backend['name'] == 'flat':
+        index = flat_index(directory, embeddings, backend)
+        index.add_texts(texts, metadatas, ids=ids)
+        index.save()
+    else:
+        from langchain_community.vectorstores import Chroma
+        index = Chroma(persist_directory=directory, embedding_function=embeddings)
+        for start in range(0, count, 1000):
+            index.add_texts(texts[start:start + 1000], metadatas[start:start + 1000], ids=ids[start:start + 1000])
+
+
+def load(backend: dict, directory: str, embeddings: Embeddings):
+    if backend['name'] == 'flat':
+        return flat_index(directory, embeddings, backend)
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=directory, embedding_function=embeddings)
+
+
+def run_backend(args) -> dict:
+    """1つのバックエンドでインデックスを作成し、別のインスタンスとして読み込んで検索を計測する"""
+    backend = parse_backend(args.single_backend)
+    vectors, queries = synthetic(args.count, args.dim, args.queries)
+    embeddings = PrecomputedEmbeddings(vectors, queries)
+    expected = exact_top_k(vectors, queries, args.k)
+
+    with tempfile.TemporaryDirectory() as directory:
+        build(backend, directory, embeddings, args.count)
+        # 作成に使ったベクトルは読み込み後のRSSに含めない
+        embeddings.vectors = None
+        del vectors
+        disk_mb = directory_mb(directory)
+
+        base_rss = rss_mb()
+        start = time.perf_counter()
+        index = load(backend, directory, embeddings)
+        # 初回の検索までを読み込み時間に含める（遅延読み込みの分）
+        index.similarity_search_by_vector(queries[0].tolist(), k=args.k)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        hits = 0
+        for query, relevant in zip(queries, expected):
+            vector = query.tolist()
+            start = time.perf_counter()
+            docs = index.similarity_search_by_vector(vector, k=args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(relevant & {int(doc.page_content.split('-')[1]) for doc in docs})
+
+    latencies.sort()
+    return {
+        'backend': args.single_backend,
+        'recall': round(hits / (len(expected) * args.k), 4),
+        'vector_mb': round(index.memory_bytes() / 1024 / 1024, 2) if backend['name'] == 'flat' else None,
+        'disk_mb': disk_mb,
+        'load_ms': round(load_ms, 1),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        'rss_mb': rss_mb(),
+        'rss_delta_mb': round(rss_mb() - base_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000, help='チャンク数')
+    parser.add_argument('--dim', type=int, default=384, help='次元数（OpenAIのtext-embedding-ada-002は1536）')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=4)
+    parser.add_argument('--backend', action='append',
+                        help='計測するバックエンド（例: flat / flat:float16 / flat:int8:norescore / chroma、複数指定可）')
+    parser.add_argument('--single-backend', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_backend:
+        print(json.dumps(run_backend(args)))
+        return 0
+
+    print(f"🧪 {args.count} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<22}{'recall':>8}{'vec MB':>8}{'disk MB':>9}{'load ms':>9}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'RSS MB':>8}{'+RSS MB':>9}")
+    for backend in args.backend or DEFAULT_BACKENDS:
+        command = [sys.executable, os.path.abspath(__file__), '--single-backend', backend,
+                   '--count', str(args.count), '--dim', str(args.dim), '--queries', str(args.queries), '-k', str(args.k)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend:<22} failed: {completed.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        vector_mb = f"{result['vector_mb']:.2f}" if result['vector_mb'] is not None else '-'
+        print(f"{backend:<22}{result['recall']:>8.3f}{vector_mb:>8}{result['disk_mb']:>9.2f}{result['load_ms']:>9.1f}"
+              f"{result['p50_ms']:>9.3f}{result['p99_ms']:>9.3f}{result['rss_mb']:>8.1f}{result['rss_delta_mb']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Help Center APIクローラーの再生計測
+記録済みのAPIレスポンス（src/crawl_archive.py の形式）をローカルのHTTPサーバーで再生し、
+ZendeskHelpCenterClient の全記事の取得と差分エクスポートでの取得を実行して、
+リクエスト数・記事数・所要時間と、記事IDの重複がないことを確認します。
+benchmarks/fixtures/zendesk_api には、全記事の一覧（2ページ）と、タイトル変更・新規・下書きへの変更を
+含む差分エクスポートを記録した小さなサンプルを同梱しています。
+
+使い方:
+    # 本番のヘルプセンターから1回だけ記録する（ZENDESK_BASE_URL、差分も記録する場合はZENDESK_EMAIL等）
+    python benchmarks/bench_zendesk_api.py record data/zendesk_archive
+
+    # 記録を再生して計測する（省略時は同梱のサンプル）
+    python benchmarks/bench_zendesk_api.py run [アーカイブ] --latency-ms 50
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from article_store import JsonlArticleStore
+from crawl_archive import CrawlArchive, ReplayServer, origin_of
+from zendesk_api import ZendeskHelpCenterClient
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'zendesk_api')
+INCREMENTAL_PATH = '/api/v2/help_center/incremental/articles.json'
+
+
+def record(args) -> int:
+    """本番のヘルプセンターから全記事（記録済みの状態があれば差分も）を取得し、レスポンスを記録する"""
+    base_url = os.getenv('ZENDESK_BASE_URL', "https://biz.help.jtbc.info")
+    with tempfile.TemporaryDirectory() as tmp:
+        client = ZendeskHelpCenterClient(base_url=base_url, state_path=os.path.join(tmp, 'state.json'),
+                                         record_dir=args.archive_dir)
+        store = JsonlArticleStore(os.path.join(tmp, 'articles.jsonl'))
+        count = client.crawl_to_store(store, incremental=False)
+        if client.authenticated:
+            # 直前の1日分の差分エクスポートも記録する
+            client.save_state({'start_time': int(time.time()) - 86400, 'full_sync_at': int(time.time())})
+            client.crawl_to_store(store)
+    print(f"📼 Recorded {count} articles to {args.archive_dir}")
+    return 0
+
+
+def recorded_start_time(archive: CrawlArchive):
+    """記録に含まれる差分エクスポートの開始時刻（記録がなければNone）"""
+    for origin, path in archive.entries:
+        parts = urlsplit(path)
+        if parts.path == INCREMENTAL_PATH and 'start_time' in parse_qs(parts.query):
+            return int(parse_qs(parts.query)['start_time'][0])
+    return None
+
+
+def crawl(client: ZendeskHelpCenterClient, store: JsonlArticleStore, incremental: bool) -> dict:
+    start = time.perf_counter()
+    count = client.crawl_to_store(store, incremental=incremental)
+    elapsed = time.perf_counter() - start
+    stats = client.transport_stats.summary()
+    ids = Counter(article.get('id') for article in store.iter_articles())
+    return {
+        'articles': count,
+        'unchanged': len(client.unchanged_urls),
+        'requests': stats['requests'],
+        'seconds': round(elapsed, 3),
+        'duplicate_ids': sorted(i for i, n in ids.items() if n > 1),
+    }
+
+
+def run(args) -> int:
+    archive = CrawlArchive(args.archive_dir)
+    base_url = archive.sites['zendesk_api']
+    start_time = recorded_start_time(archive)
+    print(f"📼 {args.archive_dir}: {len(archive.entries)} responses, latency={args.latency_ms} ms, "
+          f"incremental={'yes' if start_time else 'no'}")
+
+    results = []
+    with ReplayServer(archive, origin_of(base_url), latency=args.latency_ms / 1000) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'state.json')
+        store = JsonlArticleStore(os.path.join(tmp, 'articles.jsonl'))
+
+        client = ZendeskHelpCenterClient(base_url=server.url, state_path=state_path, requests_per_second=args.rate)
+        results.append(('full', crawl(client, store, incremental=False)))
+
+        if start_time:
+            client = ZendeskHelpCenterClient(base_url=server.url, state_path=state_path,
+                                             requests_per_second=args.rate)
+            # 再生サーバーは認証しないため、認証情報がなくても差分エクスポートを使う
+            client.authenticated = True
+            client.save_state({'start_time': start_time, 'full_sync_at': int(time.time())})
+            results.append(('incremental', crawl(client, store, incremental=True)))
+            titles = [article['title'] for article in store.iter_articles()]
+            print(f"📄 {', '.join(titles)}")
+
+    print(f"{'mode':<14}{'articles':>9}{'unchanged':>10}{'requests':>9}{'seconds':>9}")
+    ok = True
+    for mode, result in results:
+        print(f"{mode:<14}{result['articles']:>9}{result['unchanged']:>10}{result['requests']:>9}{result['seconds']:>9.3f}")
+        if result['duplicate_ids']:
+            ok = False
+            print(f"❌ {mode}: duplicate article ids {result['duplicate_ids']}")
+    if args.json:
+        print(json.dumps(dict(results)))
+    return 0 if ok else 1
+
+
+def main():
+    # zendesk_api はインポート時にINFOで設定するため、ルートのレベルを直接下げる
+    logging.getLogger().setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='本番のヘルプセンターのレスポンスを記録する')
+    record_parser.add_argument('archive_dir', help='アーカイブの保存先')
+
+    run_parser = subparsers.add_parser('run', help='記録を再生して計測する')
+    run_parser.add_argument('archive_dir', nargs='?', default=FIXTURE_DIR, help='記録済みのアーカイブ')
+    run_parser.add_argument('--latency-ms', type=float, default=0.0, help='再生サーバーで加える1リクエストあたりの遅延')
+    run_parser.add_argument('--rate', type=float, default=1000.0, help='レート上限（再生時は高めにする）')
+    run_parser.add_argument('--json', action='store_true', help='結果をJSONでも出力する')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        return record(args)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+JSONL形式の記事ストア
+クロール中の記事を1件ずつ追記し、フロンティアのチェックポイントを保存して
+中断したクロールを途中から再開できるようにします。
+"""
+import json
+import logging
+import os
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def iter_articles(filepath: str) -> Iterator[Dict]:
+    """記事ファイルを1件ずつ読み込む（.jsonlはストリーミング、.jsonは従来形式）"""
+    if filepath.endswith('.jsonl'):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で中断された行は読み飛ばす
+                    logger.warning(f"Skipping malformed line {line_no} in {filepath}")
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """イテラブルをsize件ずつのリストに分割"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class JsonlArticleStore:
+    def __init__(self, filepath: str = 'data/articles.jsonl', checkpoint_interval: int = 20):
+        """
+        Args:
+            filepath: 完成した記事ファイルの保存先
+            checkpoint_interval: 何件ごとにチェックポイントを保存するか
+        """
+        self.filepath = filepath
+        # クロール中は .partial に追記し、完了時に置き換える
+        self.partial_path = filepath + '.partial'
+        self.checkpoint_path = filepath + '.checkpoint.json'
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.file = None
+        self.count = 0
+
+    def start(self, resume: bool = True) -> Optional[Dict]:
+        """
+        書き込みを開始する。
+        resume=Trueで前回のチェックポイントが残っていればその内容を返し、続きから追記する。
+        """
+        directory = os.path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint and os.path.exists(self.partial_path):
+            saved = checkpoint.get('store', {})
+            if 'offset' in saved and os.path.getsize(self.partial_path) >= saved['offset']:
+                # チェックポイントの後に追記された記事は再取得されるため、重複しないよう切り詰める
+                os.truncate(self.partial_path, saved['offset'])
+                self.count = saved['count']
+            else:
+                # .partial はJSONL形式（拡張子では判定できないため行数を数える）
+                with open(self.partial_path, 'r', encoding='utf-8') as f:
+                    self.count = sum(1 for line in f if line.strip())
+            logger.info(f"Resuming crawl from checkpoint ({self.count} articles already saved)")
+            self.file = open(self.partial_path, 'a', encoding='utf-8')
+            return checkpoint
+
+        self.count = 0
+        self.file = open(self.partial_path, 'w', encoding='utf-8')
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return None
+
+    def append(self, article: Dict):
+        """記事を1件追記する"""
+        line = json.dumps(article, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.count += 1
+
+    def load_checkpoint(self) -> Optional[Dict]:
+        """チェックポイントを読み込む"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading checkpoint: {e}")
+            return None
+
+    def save_checkpoint(self, state: Dict):
+        """
+        チェックポイントを保存する（一時ファイル経由で置き換え）。
+        この時点の .partial のサイズと件数も保存し、再開時はそこまで切り詰める。
+        """
+        try:
+            with self.lock:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                saved = {'offset': os.fstat(self.file.fileno()).st_size, 'count': self.count}
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(dict(state, store=saved), f, ensure_ascii=False)
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            logger.error(f"Error saving checkpoint: {e}")
+
+    def finish(self):
+        """書き込みを完了し、完成したファイルに置き換えてチェックポイントを削除する"""
+        self.file.close()
+        self.file = None
+        os.replace(self.partial_path, self.filepath)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        logger.info(f"Saved {self.count} articles to {self.filepath}")
+
+    def close(self):
+        """完了させずに閉じる（チェックポイントは残す）"""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        """書き込みを破棄する（.partialとチェックポイントを削除し、完成したファイルはそのまま残す）"""
+        self.close()
+        for path in (self.partial_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def iter_articles(self) -> Iterator[Dict]:
+        """保存済みの記事を1件ずつ読み込む"""
+        return iter_articles(self.filepath)
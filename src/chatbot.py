@@ -7,12 +7,19 @@ from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 import logging
 
+try:
+    from .retrieval import create_retriever
+    from .index_sync import list_categories
+except ImportError:
+    from retrieval import create_retriever
+    from index_sync import list_categories
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class JTBCSupportChatbot:
-    def __init__(self, vectorstore, openai_api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(self, vectorstore, openai_api_key: str, model: str = "gpt-4o-mini", lexical_index=None):
         self.vectorstore = vectorstore
         self.llm = ChatOpenAI(
             temperature=0.7,
@@ -38,23 +45,31 @@ class JTBCSupportChatbot:
             input_variables=["context", "question"]
         )
         
+        # 質問の埋め込みをキャッシュするRetriever（同じ質問では埋め込みを再計算しない）
+        # lexical_indexがあれば語句の一致とベクトル検索を統合する
+        self.retriever = create_retriever(self.vectorstore, k=4, lexical_index=lexical_index)
+        
         # QAチェーンの作成
-        self.qa_chain = RetrievalQA.from_chain_type(
+        self.qa_chain = self.create_qa_chain(self.retriever)
+    
+    def create_qa_chain(self, retriever) -> RetrievalQA:
+        """retrieverで検索するQAチェーンを作成"""
+        return RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": 4}
-            ),
+            retriever=retriever,
             return_source_documents=True,
             chain_type_kwargs={"prompt": self.prompt}
         )
     
-    def ask(self, question: str) -> dict:
-        """質問に対する回答を生成"""
+    def ask(self, question: str, category: str = None) -> dict:
+        """質問に対する回答を生成（categoryを指定するとそのカテゴリの記事だけを参照する）"""
         try:
-            logger.info(f"Processing question: {question}")
+            logger.info(f"Processing question: {question}" + (f" (category: {category})" if category else ""))
             
-            result = self.qa_chain.invoke({"query": question})
+            # カテゴリを指定した場合は、そのカテゴリだけを検索するチェーンを使う
+            qa_chain = self.create_qa_chain(self.retriever.scoped(category)) if category else self.qa_chain
+            result = qa_chain.invoke({"query": question})
             
             response = {
                 "answer": result["result"],
@@ -80,6 +95,10 @@ class JTBCSupportChatbot:
                 "sources": []
             }
     
+    def get_categories(self) -> list:
+        """質問を絞り込めるカテゴリと記事数"""
+        return list_categories(self.retriever.vectorstore)
+    
     def get_suggested_questions(self) -> list:
         """よくある質問のサジェスト"""
         return [
@@ -105,7 +124,7 @@ if __name__ == "__main__":
         vectorstore = vs_manager.load_or_create_vectorstore()
         
         # チャットボット作成
-        chatbot = JTBCSupportChatbot(vectorstore, api_key)
+        chatbot = JTBCSupportChatbot(vectorstore, api_key, lexical_index=vs_manager.lexical_index)
         
         # テスト質問
         test_questions = [
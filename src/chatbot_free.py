@@ -4,23 +4,30 @@
 """
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain_openai import ChatOpenAI
 import logging
 import os
 
+try:
+    from .retrieval import create_retriever
+    from .index_sync import list_categories
+except ImportError:
+    from retrieval import create_retriever
+    from index_sync import list_categories
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class JTBCSupportChatbot:
-    def __init__(self, vectorstore, api_key: str = None, use_local: bool = True, model: str = None):
+    def __init__(self, vectorstore, api_key: str = None, use_local: bool = True, model: str = None,
+                 lexical_index=None):
         """
         Args:
             vectorstore: ベクトルストア
             api_key: OpenAI APIキー（use_local=Falseの場合のみ必要）
             use_local: Trueの場合はOllamaを使用、Falseの場合はOpenAIを使用
             model: 使用するモデル名
+            lexical_index: 文字n-gramの転置インデックス（ハイブリッド検索に使用）
         """
         self.vectorstore = vectorstore
         self.use_local = use_local
@@ -28,6 +35,8 @@ class JTBCSupportChatbot:
         # LLMの選択
         if use_local:
             # Ollamaを使用（完全無料）
+            # 使うLLMのライブラリだけを読み込む
+            from langchain_community.llms import Ollama
             model_name = model or "gemma2:2b"  # 軽量モデル
             logger.info(f"Using local Ollama model: {model_name}")
             self.llm = Ollama(
@@ -38,6 +47,7 @@ class JTBCSupportChatbot:
             # OpenAIを使用
             if not api_key:
                 raise ValueError("OpenAI使用時はapi_keyが必要です")
+            from langchain_openai import ChatOpenAI
             model_name = model or "gpt-4o-mini"
             logger.info(f"Using OpenAI model: {model_name}")
             self.llm = ChatOpenAI(
@@ -64,23 +74,31 @@ class JTBCSupportChatbot:
             input_variables=["context", "question"]
         )
         
+        # 質問の埋め込みをキャッシュするRetriever（同じ質問では埋め込みを再計算しない）
+        # lexical_indexがあれば語句の一致とベクトル検索を統合する
+        self.retriever = create_retriever(self.vectorstore, k=4, lexical_index=lexical_index)
+        
         # QAチェーンの作成
-        self.qa_chain = RetrievalQA.from_chain_type(
+        self.qa_chain = self.create_qa_chain(self.retriever)
+    
+    def create_qa_chain(self, retriever) -> RetrievalQA:
+        """retrieverで検索するQAチェーンを作成"""
+        return RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": 4}
-            ),
+            retriever=retriever,
             return_source_documents=True,
             chain_type_kwargs={"prompt": self.prompt}
         )
     
-    def ask(self, question: str) -> dict:
-        """質問に対する回答を生成"""
+    def ask(self, question: str, category: str = None) -> dict:
+        """質問に対する回答を生成（categoryを指定するとそのカテゴリの記事だけを参照する）"""
         try:
-            logger.info(f"Processing question: {question}")
+            logger.info(f"Processing question: {question}" + (f" (category: {category})" if category else ""))
             
-            result = self.qa_chain.invoke({"query": question})
+            # カテゴリを指定した場合は、そのカテゴリだけを検索するチェーンを使う
+            qa_chain = self.create_qa_chain(self.retriever.scoped(category)) if category else self.qa_chain
+            result = qa_chain.invoke({"query": question})
             
             response = {
                 "answer": result["result"],
@@ -106,6 +124,10 @@ class JTBCSupportChatbot:
                 "sources": []
             }
     
+    def get_categories(self) -> list:
+        """質問を絞り込めるカテゴリと記事数"""
+        return list_categories(self.retriever.vectorstore)
+    
     def get_suggested_questions(self) -> list:
         """よくある質問のサジェスト"""
         return [
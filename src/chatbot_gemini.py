@@ -5,20 +5,30 @@ HuggingFace Embeddings（無料）+ Google Gemini（無料枠60/月）
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+try:
+    from .retrieval import create_retriever
+    from .index_sync import list_categories
+except ImportError:
+    from retrieval import create_retriever
+    from index_sync import list_categories
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class JTBCSupportChatbot:
-    def __init__(self, vectorstore, gemini_api_key: str, model: str = "gemini-pro"):
+    def __init__(self, vectorstore, gemini_api_key: str, model: str = "gemini-pro", lexical_index=None):
         """
         Args:
             vectorstore: ベクトルストア（HuggingFace Embeddingsを使用）
             gemini_api_key: Google Gemini APIキー
             model: 使用するGeminiモデル名
+            lexical_index: 文字n-gramの転置インデックス（ハイブリッド検索に使用）
         """
         self.vectorstore = vectorstore
-        self.retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+        # 質問の埋め込みをキャッシュするRetriever（同じ質問では埋め込みを再計算しない）
+        # lexical_indexがあれば語句の一致とベクトル検索を統合する
+        self.retriever = create_retriever(vectorstore, k=4, lexical_index=lexical_index)
         
         logger.info(f"Using Google Gemini model: {model}")
         self.llm = ChatGoogleGenerativeAI(
@@ -27,13 +37,13 @@ class JTBCSupportChatbot:
             temperature=0.7,
         )
     
-    def ask(self, question: str) -> dict:
-        """質問に対する回答を生成"""
+    def ask(self, question: str, category: str = None) -> dict:
+        """質問に対する回答を生成（categoryを指定するとそのカテゴリの記事だけを参照する）"""
         try:
-            logger.info(f"Processing question: {question}")
+            logger.info(f"Processing question: {question}" + (f" (category: {category})" if category else ""))
             
             # 関連ドキュメントを検索
-            docs = self.retriever.get_relevant_documents(question)
+            docs = self.retriever.scoped(category).invoke(question)
             
             # コンテキストを作成
             context = "\n\n".join([doc.page_content for doc in docs])
@@ -80,6 +90,10 @@ class JTBCSupportChatbot:
                 "sources": []
             }
     
+    def get_categories(self) -> list:
+        """質問を絞り込めるカテゴリと記事数"""
+        return list_categories(self.retriever.vectorstore)
+    
     def get_suggested_questions(self) -> list:
         """よくある質問のサジェスト"""
         return [
@@ -0,0 +1,203 @@
+"""
+クロールの記録と再生
+取得したレスポンスを簡易アーカイブ（index.jsonl + 本文ファイル）に記録し、
+ローカルのHTTPサーバーで再生します。本番サイトにアクセスせずにクロール性能を計測するために使います。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 記録するレスポンスヘッダー（本文はデコード済みで保存するためContent-Encoding等は除く）
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location', 'Retry-After')
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class ResponseRecorder:
+    """requestsのレスポンスフックとして登録し、取得したレスポンスをアーカイブに記録する"""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.body_dir = os.path.join(archive_dir, 'bodies')
+        self.index_path = os.path.join(archive_dir, 'index.jsonl')
+        self.manifest_path = os.path.join(archive_dir, 'manifest.json')
+        self.lock = threading.Lock()
+        os.makedirs(self.body_dir, exist_ok=True)
+
+    def add_site(self, name: str, base_url: str):
+        """記録対象のサイトをマニフェストに登録（再生時にプロファイルと対応付ける）"""
+        with self.lock:
+            manifest = self._load_manifest()
+            manifest.setdefault('sites', {})[name] = base_url
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def record(self, response, *args, **kwargs):
+        """レスポンスフック：本文を内容のハッシュで保存し、インデックスに1行追記"""
+        content = response.content or b''
+        digest = hashlib.sha256(content).hexdigest()
+        body_path = os.path.join(self.body_dir, digest)
+        entry = {
+            'url': response.url,
+            'method': response.request.method,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            'body': digest,
+            'recorded_at': time.time(),
+        }
+        with self.lock:
+            if not os.path.exists(body_path):
+                with open(body_path, 'wb') as f:
+                    f.write(content)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return response
+
+
+class CrawlArchive:
+    """記録済みアーカイブの読み込み"""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.body_dir = os.path.join(archive_dir, 'bodies')
+        with open(os.path.join(archive_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        # (オリジン, パス+クエリ) -> インデックスの行（同じURLは最後に記録した成功レスポンスを使う）
+        self.entries: Dict[Tuple[str, str], Dict] = {}
+        with open(os.path.join(archive_dir, 'index.jsonl'), 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get('method', 'GET') != 'GET':
+                    continue
+                key = self.key(entry['url'])
+                previous = self.entries.get(key)
+                if previous is None or entry['status'] != 304 or previous['status'] == 304:
+                    self.entries[key] = entry
+
+    @staticmethod
+    def key(url: str) -> Tuple[str, str]:
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        return f"{parts.scheme}://{parts.netloc}", path
+
+    @property
+    def sites(self) -> Dict[str, str]:
+        """記録したサイト名とbase_urlの対応"""
+        return dict(self.manifest.get('sites', {}))
+
+    def origins(self):
+        return sorted({origin for origin, _ in self.entries})
+
+    def lookup(self, origin: str, path: str) -> Optional[Dict]:
+        return self.entries.get((origin, path))
+
+    def read_body(self, entry: Dict) -> bytes:
+        with open(os.path.join(self.body_dir, entry['body']), 'rb') as f:
+            return f.read()
+
+    def iter_pages(self, pattern: str = ''):
+        """URLにpatternを含む200応答の (URL, 本文) を返す"""
+        for entry in self.entries.values():
+            if entry['status'] == 200 and pattern in entry['url']:
+                yield entry['url'], self.read_body(entry)
+
+
+class ReplayServer:
+    """
+    アーカイブの1オリジン分を再生するローカルHTTPサーバー。
+    本文・Locationヘッダー内の元のオリジンは再生サーバーのアドレスに書き換える。
+    """
+
+    def __init__(self, archive: CrawlArchive, origin: str, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, serve_robots: bool = False):
+        """
+        Args:
+            archive: 再生するアーカイブ
+            origin: 再生する元のオリジン（https://example.com）
+            latency: 1リクエストごとに加える遅延（秒、ネットワーク遅延の模擬）
+            serve_robots: Falseの場合はrobots.txtを404にする（Crawl-delayで計測が律速されないように）
+        """
+        self.archive = archive
+        self.origin = origin
+        self.latency = latency
+        self.serve_robots = serve_robots
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread: Optional[threading.Thread] = None
+
+    def _rewrite(self, data: bytes) -> bytes:
+        return data.replace(self.origin.encode(), self.url.encode())
+
+    def _make_handler(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if replay.latency:
+                    time.sleep(replay.latency)
+
+                entry = replay.archive.lookup(replay.origin, self.path)
+                if entry is None or (self.path == '/robots.txt' and not replay.serve_robots):
+                    self._send(404, {}, b'')
+                    return
+
+                headers = dict(entry['headers'])
+                etag = headers.get('ETag')
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self._send(304, {'ETag': etag}, b'')
+                    return
+
+                if 'Location' in headers:
+                    headers['Location'] = replay._rewrite(headers['Location'].encode()).decode()
+                self._send(entry['status'], headers, replay._rewrite(replay.archive.read_body(entry)))
+
+            def _send(self, status: int, headers: Dict[str, str], body: bytes):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'ReplayServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Replaying {self.origin} at {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'ReplayServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,861 @@
+"""
+マルチサイト対応のクロールエンジン
+サイトプロファイル（site_profiles.py）に従い、複数のヘルプセンターを1つのプロセスで並行してクロールします。
+ワーカープール・検証子キャッシュ・レートリミッターはサイト間で共有し、レートはホストごとに制御します。
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime
+from itertools import chain, zip_longest
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+try:
+    from .rate_limiter import AdaptiveThrottle
+    from .http_transport import create_session, TransportStats
+    from .http_cache import ValidatorCache
+    from .frontier import CrawlFrontier, url_key
+    from .article_store import JsonlArticleStore
+    from .html_extract import extract_links, extract_listing, extract_article, parse_html
+    from .parse_pipeline import FetchParsePipeline
+    from .session_store import SessionStore
+    from .crawl_archive import ResponseRecorder
+    from .sitemap import SitemapState, parse_sitemap
+    from .recrawl_policy import RecrawlPolicy
+    from .site_profiles import SiteProfile, get_profiles
+except ImportError:
+    from rate_limiter import AdaptiveThrottle
+    from http_transport import create_session, TransportStats
+    from http_cache import ValidatorCache
+    from frontier import CrawlFrontier, url_key
+    from article_store import JsonlArticleStore
+    from html_extract import extract_links, extract_listing, extract_article, parse_html
+    from parse_pipeline import FetchParsePipeline
+    from session_store import SessionStore
+    from crawl_archive import ResponseRecorder
+    from sitemap import SitemapState, parse_sitemap
+    from recrawl_policy import RecrawlPolicy
+    from site_profiles import SiteProfile, get_profiles
+
+logger = logging.getLogger(__name__)
+
+
+def extract_page(page: Tuple[bytes, Sequence[str], Sequence[str], Sequence[str]]) -> Dict:
+    """(本文, 本文セレクタ, タイトルセレクタ, パンくずセレクタ) から記事を抽出（解析プロセスで実行する）"""
+    content, content_selectors, title_selectors, breadcrumb_selectors = page
+    return extract_article(content, content_selectors=content_selectors, title_selectors=title_selectors,
+                           breadcrumb_selectors=breadcrumb_selectors)
+
+
+def interleave(iterables: Iterable[Iterable]) -> Iterator:
+    """各イテラブルから1件ずつ交互に取り出す（ホストごとのレート待ちを分散させる）"""
+    missing = object()
+    for item in chain.from_iterable(zip_longest(*iterables, fillvalue=missing)):
+        if item is not missing:
+            yield item
+
+
+class SiteCrawler:
+    """1サイト分の取得・抽出処理（プロファイルの設定に従う）"""
+    # 一覧ページのページ送りをたどる上限
+    MAX_LISTING_PAGES = 50
+
+    def __init__(self, profile: SiteProfile, rate_limiter: AdaptiveThrottle, http_cache: ValidatorCache,
+                 unchanged_urls: set, transport_stats: Optional[TransportStats] = None,
+                 pool_size: int = 10, session_path: Optional[str] = None,
+                 sitemap_state: Optional[SitemapState] = None, lastmods: Optional[Dict[str, str]] = None,
+                 deferred_urls: Optional[set] = None, skipped_urls: Optional[set] = None):
+        self.profile = profile
+        self.name = profile.name
+        self.base_url = profile.base_url
+        self.rate_limiter = rate_limiter
+        self.http_cache = http_cache
+        # 前回から変化がなかった記事のURL（エンジン全体で共有）
+        self.unchanged_urls = unchanged_urls
+        # 前回取得時のlastmodと、今回サイトマップで見つけたlastmod（キーはurl_key）
+        self.sitemap_state = sitemap_state
+        self.lastmods = lastmods if lastmods is not None else {}
+        # 再クロール方針で今回は取得を見送る記事と、リクエストせずにキャッシュから返した記事
+        self.deferred_urls = deferred_urls if deferred_urls is not None else set()
+        self.skipped_urls = skipped_urls if skipped_urls is not None else set()
+        # 接続プール・リトライ・タイムアウトを設定した共通トランスポート
+        self.session = create_session(
+            pool_size=pool_size,
+            max_retries=int(os.getenv('CRAWL_MAX_RETRIES', 3)),
+            timeout=(5.0, float(os.getenv('CRAWL_TIMEOUT_SECONDS', 30))),
+            headers=profile.headers,
+            stats=transport_stats
+        )
+        self.logged_in = False
+        self.credentials = (None, None)
+        # ログインに成功するたびに増やす（セッション切れを同時に検出したスレッドのうち1つだけが再ログインする）
+        self.login_lock = threading.Lock()
+        self.login_generation = 0
+        # 一覧・サイトマップの一部を取得できなかった（記事の一覧が不完全な）場合はTrue
+        self.discovery_failed = False
+        # ログイン済みのCookieを保存して次回以降のクロールで再利用する
+        self.session_store = SessionStore(session_path) if profile.auth == 'form' and session_path else None
+
+    def absolute_url(self, href: str) -> str:
+        return urljoin(self.base_url + '/', href)
+
+    def url_key(self, url: str) -> str:
+        return url_key(url, self.base_url, self.profile.locale)
+
+    # --- 認証 ---
+
+    def login(self, email: Optional[str] = None, password: Optional[str] = None) -> bool:
+        """ログインフォームからログイン"""
+        # 環境変数から取得
+        if not email:
+            email = os.getenv(self.profile.login_email_env)
+        if not password:
+            password = os.getenv(self.profile.login_password_env)
+
+        if not email or not password:
+            logger.warning(f"[{self.name}] Login credentials not provided. Continuing without login...")
+            return False
+        self.credentials = (email, password)
+
+        try:
+            logger.info(f"[{self.name}] Attempting to login...")
+
+            # ログインページにアクセス
+            login_url = self.absolute_url(self.profile.login_path)
+            self.rate_limiter.acquire(login_url)
+            response = self.session.get(login_url)
+            self.rate_limiter.observe(login_url, response)
+
+            # CSRFトークンを取得（必要な場合）
+            login_data = {
+                'user[email]': email,
+                'user[password]': password,
+            }
+            root = parse_html(response.content)
+            if root is not None:
+                tokens = root.xpath('//input[@name="authenticity_token"]/@value')
+                if tokens:
+                    login_data['authenticity_token'] = tokens[0]
+
+            # ログインリクエストを送信
+            self.rate_limiter.acquire(login_url)
+            login_response = self.session.post(
+                login_url,
+                data=login_data,
+                allow_redirects=True
+            )
+
+            # ログイン成功を確認
+            if 'signin' not in login_response.url and login_response.status_code == 200:
+                logger.info(f"[{self.name}] ✅ Successfully logged in!")
+                self.logged_in = True
+                self.login_generation += 1
+                if self.session_store:
+                    self.session_store.save(self.session)
+                return True
+            else:
+                logger.error(f"[{self.name}] ❌ Login failed. Please check your credentials.")
+                return False
+
+        except Exception as e:
+            logger.error(f"[{self.name}] Error during login: {e}")
+            return False
+
+    def validate_session(self) -> bool:
+        """保存済みセッションが有効かを1回の軽いリクエストで確認"""
+        me_url = f"{self.profile.origin}/api/v2/users/me.json"
+        try:
+            self.rate_limiter.acquire(me_url)
+            response = self.session.get(me_url, allow_redirects=False)
+            self.rate_limiter.observe(me_url, response)
+            if response.status_code != 200:
+                return False
+            # 未ログインの場合もユーザー情報は返るがidがnullになる
+            return bool(response.json().get('user', {}).get('id'))
+        except Exception as e:
+            logger.warning(f"[{self.name}] Could not validate saved session: {e}")
+            return False
+
+    def ensure_logged_in(self) -> bool:
+        """保存済みセッションが有効ならそれを使い、無効な場合のみログインする"""
+        if self.session_store and self.session_store.load(self.session):
+            if self.validate_session():
+                logger.info(f"[{self.name}] ✅ Reusing saved login session")
+                self.logged_in = True
+                return True
+            logger.info(f"[{self.name}] Saved login session was rejected. Logging in again...")
+            self.session.cookies.clear()
+            self.session_store.clear()
+        return self.login()
+
+    def relogin(self, generation: int, url: str) -> bool:
+        """
+        クロール中にセッションが切れた場合に再ログインし、やり直してよいかを返す。
+        generationはリクエスト前のlogin_generation。別のスレッドがその後に再ログインしていれば
+        ログインせずに新しいセッションでやり直し、再ログインに失敗した後は何度も試さない。
+        """
+        with self.login_lock:
+            if self.login_generation != generation:
+                return self.logged_in
+            if not self.logged_in:
+                return False
+            logger.warning(f"[{self.name}] Session rejected while fetching {url}. Logging in again...")
+            self.logged_in = False
+            self.session.cookies.clear()
+            return self.login(*self.credentials)
+
+    def prepare(self):
+        """クロール開始前の準備（認証が必要なサイトではログイン）"""
+        if self.profile.auth == 'form':
+            self.ensure_logged_in()
+
+    def save_session(self):
+        """クロール中に更新されたCookieを保存"""
+        if self.logged_in and self.session_store:
+            self.session_store.save(self.session)
+
+    @staticmethod
+    def _is_signin_redirect(response: requests.Response) -> bool:
+        """ログインページへリダイレクトされた（セッションが拒否された）かを判定"""
+        return bool(response.history) and 'signin' in urlparse(response.url).path
+
+    # --- 取得 ---
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GETリクエストを送る。クロール中にセッションが切れてログインページへ
+        リダイレクトされた場合は、再ログインして1回だけ透過的にやり直す。
+        """
+        generation = self.login_generation
+        self.rate_limiter.acquire(url)
+        response = self.session.get(url, **kwargs)
+        self.rate_limiter.observe(url, response)
+
+        if self._is_signin_redirect(response) and self.relogin(generation, url):
+            self.rate_limiter.acquire(url)
+            response = self.session.get(url, **kwargs)
+            self.rate_limiter.observe(url, response)
+        return response
+
+    def fetch_robots(self, robots_url: str) -> Optional[str]:
+        """robots.txtを取得（Crawl-delayの確認用）"""
+        response = self.session.get(robots_url)
+        return response.text if response.status_code == 200 else None
+
+    def get_categories(self) -> List[Dict]:
+        """トップページからカテゴリ・セクションの一覧を取得"""
+        try:
+            response = self._get(self.base_url)
+            response.raise_for_status()
+
+            categories = []
+            # カテゴリリンクを探す（lxmlで<a href>だけを取り出す）
+            for href, title in extract_links(response.content):
+                if title and any(pattern in href for pattern in self.profile.listing_patterns):
+                    categories.append({
+                        'title': title,
+                        'url': self.absolute_url(href)
+                    })
+
+            logger.info(f"[{self.name}] Found {len(categories)} categories")
+            return categories
+        except Exception as e:
+            logger.error(f"[{self.name}] Error fetching categories: {e}")
+            self.discovery_failed = True
+            return []
+
+    def get_sitemap_entries(self) -> Optional[List[Tuple[str, Optional[str]]]]:
+        """
+        sitemap.xml（サイトマップインデックスの子も含む）から、このサイトの記事の (URL, lastmod) を返す。
+        サイトマップがない、または記事が見つからない場合はNone。
+        """
+        if not self.profile.sitemap_path:
+            return None
+
+        prefix = self.base_url.rstrip('/') + '/'
+        root_url = urljoin(self.profile.origin, self.profile.sitemap_path)
+        pending = [root_url]
+        seen = set()
+        entries = []
+        while pending:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            try:
+                response = self._get(sitemap_url)
+            except Exception as e:
+                logger.warning(f"[{self.name}] Could not fetch {sitemap_url}: {e}")
+                response = None
+            if response is None or response.status_code != 200:
+                # サイトマップインデックスの子を取得できなければ記事の一覧は不完全
+                if sitemap_url != root_url:
+                    self.discovery_failed = True
+                continue
+
+            urls, children = parse_sitemap(response.content)
+            pending.extend(children)
+            entries.extend(
+                (loc, lastmod) for loc, lastmod in urls
+                if loc.startswith(prefix) and self.profile.article_pattern in loc
+            )
+
+        if not entries:
+            logger.info(f"[{self.name}] No sitemap entries found. Falling back to listing pages")
+            return None
+        logger.info(f"[{self.name}] Found {len(entries)} articles in sitemap")
+        return entries
+
+    def get_listings(self) -> List[Dict]:
+        """
+        記事リンクを集める一覧ページを返す。
+        一覧ページを持たないサイトではトップページ自体を一覧として扱う。
+        """
+        if not self.profile.listing_patterns:
+            return [{'title': self.profile.category or '', 'url': self.base_url}]
+
+        # 同じカテゴリ・セクションページは1回だけ取得
+        listing_frontier = CrawlFrontier(self.base_url, self.profile.locale)
+        return [
+            category for category in self.get_categories()
+            if listing_frontier.add(category['url'])
+        ]
+
+    def get_articles_from_category(self, category_url: str) -> List[Dict]:
+        """一覧ページから記事リンクを取得（ページ送りがあれば次のページもたどる）"""
+        articles = []
+        page_url = category_url
+        seen = set()
+        try:
+            while page_url and page_url not in seen and len(seen) < self.MAX_LISTING_PAGES:
+                seen.add(page_url)
+                response = self._get(page_url)
+                response.raise_for_status()
+
+                links, next_href = extract_listing(response.content, self.profile.article_pattern)
+                articles.extend({'title': title, 'url': self.absolute_url(href)} for href, title in links)
+                page_url = urljoin(page_url, next_href) if next_href else None
+            if page_url and page_url not in seen:
+                logger.warning(f"[{self.name}] Stopped after {len(seen)} listing pages of {category_url}")
+                self.discovery_failed = True
+        except Exception as e:
+            logger.error(f"[{self.name}] Error fetching articles from {page_url}: {e}")
+            self.discovery_failed = True
+
+        logger.info(f"[{self.name}] Found {len(articles)} articles in {category_url} ({len(seen)} pages)")
+        return articles
+
+    def fetch_article_page(self, article_url: str) -> Tuple[Optional[Dict], Optional[requests.Response]]:
+        """
+        記事ページを取得する（解析はしない）。
+        前回から変化がなければ (前回の記事データ, None)、変化していれば (None, レスポンス) を返す。
+        """
+        key = self.url_key(article_url)
+        lastmod = self.lastmods.get(key)
+        # 再取得を見送る記事や、サイトマップのlastmodが前回から進んでいない記事は
+        # リクエストせずに前回の結果を使う
+        if article_url in self.deferred_urls or (
+                self.sitemap_state and self.sitemap_state.is_unchanged(key, lastmod)):
+            cached = self.http_cache.get_article(article_url)
+            if cached is not None:
+                self.unchanged_urls.add(article_url)
+                self.skipped_urls.add(article_url)
+                return cached, None
+
+        try:
+            response = self._get(
+                article_url,
+                headers=self.http_cache.conditional_headers(article_url)
+            )
+
+            # 304 Not Modified なら解析を省略して前回の結果を使う
+            cached = self.http_cache.lookup_unchanged(article_url, response)
+            if cached is not None:
+                self.unchanged_urls.add(article_url)
+            else:
+                response.raise_for_status()
+            if self.sitemap_state:
+                self.sitemap_state.update(key, lastmod)
+            return (cached, None) if cached is not None else (None, response)
+        except Exception as e:
+            logger.error(f"[{self.name}] Error fetching article content from {article_url}: {e}")
+            return None, None
+
+    def parse_input(self, response: requests.Response) -> Tuple[bytes, Sequence[str], Sequence[str], Sequence[str]]:
+        """extract_pageに渡す解析の入力"""
+        return (response.content, self.profile.content_selectors, self.profile.title_selectors,
+                self.profile.breadcrumb_selectors)
+
+    def build_article(self, article_url: str, response: requests.Response, extracted: Dict) -> Dict:
+        """抽出結果から記事データを作成し、検証子キャッシュに保存"""
+        if not extracted['title'] and not extracted['content']:
+            logger.warning(f"[{self.name}] No content found for {article_url}")
+            return {}
+
+        article = {
+            'title': extracted['title'],
+            'content': extracted['content'],
+            'url': article_url,
+            'crawled_at': datetime.now().isoformat()
+        }
+        if self.profile.category:
+            article['category'] = self.profile.category
+        elif len(extracted.get('breadcrumbs', [])) > 1:
+            # 一覧ページを経由しない記事はパンくず（先頭のヘルプセンター名を除く）をカテゴリとする
+            article['categories'] = extracted['breadcrumbs'][1:]
+            article['category'] = article['categories'][0]
+        if self.http_cache.store(article_url, response, article):
+            # ページ内のトークンなどが変わっただけで、タイトルと本文は前回と同じ
+            self.unchanged_urls.add(article_url)
+        return article
+
+    def get_article_content(self, article_url: str) -> Dict:
+        """記事の詳細内容を取得"""
+        cached, response = self.fetch_article_page(article_url)
+        if cached is not None:
+            return cached
+        if response is None:
+            return {}
+
+        try:
+            # タイトルと本文を抽出
+            return self.build_article(article_url, response, extract_page(self.parse_input(response)))
+        except Exception as e:
+            logger.error(f"[{self.name}] Error parsing article content from {article_url}: {e}")
+            return {}
+
+    def new_frontier(self) -> CrawlFrontier:
+        """このサイト用の（記事IDをキーに重複を排除する）フロンティア"""
+        return CrawlFrontier(self.base_url, self.profile.locale)
+
+
+class CrawlEngine:
+    def __init__(self, profiles: Optional[List[SiteProfile]] = None,
+                 max_workers: Optional[int] = None,
+                 requests_per_second: Optional[float] = None,
+                 cache_path: str = 'data/http_cache.json',
+                 parse_workers: Optional[int] = None,
+                 session_path: str = 'data/session_cookies_{name}.json',
+                 record_dir: Optional[str] = None,
+                 sitemap_state_path: str = 'data/sitemap_state.json',
+                 recrawl_policy: Optional[RecrawlPolicy] = None):
+        """
+        Args:
+            profiles: クロールするサイトのプロファイル（省略時は環境変数CRAWL_SITES）
+            max_workers: 全サイトで共有するワーカー数（同時に実行するリクエスト数の上限）
+            requests_per_second: プロファイルで指定がないホストの初期レート
+            cache_path: HTTP検証子キャッシュの保存先
+            parse_workers: HTML解析に使うプロセス数（0の場合は取得スレッド内で解析）
+            session_path: ログインCookieの保存先（{name}はプロファイル名に置き換える）
+            record_dir: 取得したレスポンスを記録するディレクトリ（省略時は環境変数CRAWL_RECORD_DIR）
+            sitemap_state_path: 前回取得した記事のlastmodの保存先
+            recrawl_policy: 記事ごとの再取得間隔と1日の取得数の上限（Noneの場合は毎回すべて確認）
+        """
+        self.profiles = profiles or get_profiles()
+        self.max_workers = max_workers or int(os.getenv('CRAWL_MAX_WORKERS', 4))
+        self.parse_workers = parse_workers if parse_workers is not None else int(os.getenv('CRAWL_PARSE_WORKERS', 0))
+        # サーバーの応答に応じてホストごとにレートを自動調整（robots.txtのCrawl-delayも守る）
+        self.rate_limiter = AdaptiveThrottle(
+            rate=requests_per_second or float(os.getenv('CRAWL_REQUESTS_PER_SECOND', 2.0)),
+            max_rate=float(os.getenv('CRAWL_MAX_REQUESTS_PER_SECOND', 8.0)),
+            robots_fetcher=self._fetch_robots
+        )
+        self.http_cache = ValidatorCache(cache_path)
+        # 直近のクロールで前回から変化がなかった記事のURL
+        self.unchanged_urls = set()
+        # サイトマップで見つけた記事のlastmod（前回の値と比べて未更新の記事は取得しない）
+        self.sitemap_state = SitemapState(sitemap_state_path)
+        self.lastmods: Dict[str, str] = {}
+        self.recrawl_policy = recrawl_policy
+        self.deferred_urls = set()
+        self.skipped_urls = set()
+        # 直近のクロールで取得・解析に失敗した記事のURLと、記事の一覧をすべて取得できたか
+        # （どちらもサイトから削除されたとは限らないため、チャンクの削除対象から外す）
+        self.failed_urls = set()
+        self.discovery_complete = True
+        self.transport_stats = TransportStats()
+        # ベンチマーク用に取得したレスポンスを記録する（crawl_archive.pyで再生できる）
+        record_dir = record_dir or os.getenv('CRAWL_RECORD_DIR')
+        self.recorder = ResponseRecorder(record_dir) if record_dir else None
+
+        self.sites: Dict[str, SiteCrawler] = {}
+        for profile in self.profiles:
+            self.rate_limiter.configure_host(
+                profile.base_url, profile.requests_per_second, profile.max_requests_per_second
+            )
+            self.sites[profile.name] = SiteCrawler(
+                profile, self.rate_limiter, self.http_cache, self.unchanged_urls,
+                transport_stats=self.transport_stats,
+                pool_size=self.max_workers,
+                session_path=session_path.format(name=profile.name),
+                sitemap_state=self.sitemap_state,
+                lastmods=self.lastmods,
+                deferred_urls=self.deferred_urls,
+                skipped_urls=self.skipped_urls
+            )
+            if self.recorder:
+                self.recorder.add_site(profile.name, profile.base_url)
+                self.sites[profile.name].session.hooks['response'].append(self.recorder.record)
+
+    def _fetch_robots(self, robots_url: str) -> Optional[str]:
+        """robots.txtを同じホストのサイトのセッションで取得"""
+        host = urlparse(robots_url).netloc
+        sites = list(self.sites.values())
+        site = next((s for s in sites if urlparse(s.base_url).netloc == host), sites[0])
+        return site.fetch_robots(robots_url)
+
+    def discover(self, frontiers: Optional[Dict[str, CrawlFrontier]] = None) -> Dict[str, CrawlFrontier]:
+        """
+        各サイトの記事URLをサイトごとのフロンティアに登録する。
+        sitemap.xmlがあればそこから記事とlastmodを取得し、なければ一覧ページを巡回する。
+        一覧ページの取得は全サイト分をまとめて共有ワーカーで並行して行う。
+        """
+        if frontiers is None:
+            frontiers = {name: site.new_frontier() for name, site in self.sites.items()}
+        sites = [self.sites[name] for name in frontiers]
+        link_counts = {site.name: 0 for site in sites}
+        for site in sites:
+            site.discovery_failed = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            sitemaps = list(executor.map(lambda site: site.get_sitemap_entries(), sites))
+            for site, entries in zip(sites, sitemaps):
+                for article_url, lastmod in entries or []:
+                    link_counts[site.name] += 1
+                    frontiers[site.name].add(article_url, site.profile.category)
+                    if lastmod:
+                        self.lastmods[site.url_key(article_url)] = lastmod
+            sites_without_sitemap = [site for site, entries in zip(sites, sitemaps) if entries is None]
+
+            # 各サイトのトップページを並行取得
+            listings = list(executor.map(lambda site: site.get_listings(), sites_without_sitemap))
+
+            listing_futures = []
+            for site, categories in zip(sites_without_sitemap, listings):
+                if not categories:
+                    logger.warning(f"[{site.name}] No categories found. "
+                                   "Site might require login or has different structure.")
+                    site.discovery_failed = True
+                for category in categories:
+                    listing_futures.append(
+                        (site, category, executor.submit(site.get_articles_from_category, category['url']))
+                    )
+
+            for site, category, future in listing_futures:
+                logger.info(f"[{site.name}] Crawling category: {category['title']}")
+                for article in future.result():
+                    link_counts[site.name] += 1
+                    frontiers[site.name].add(article['url'], category['title'])
+
+        for site in sites:
+            frontier = frontiers[site.name]
+            logger.info(f"[{site.name}] Found {len(frontier)} unique articles "
+                        f"({link_counts[site.name] - len(frontier)} duplicate links skipped)")
+            if site.discovery_failed:
+                logger.warning(f"[{site.name}] Article discovery was incomplete")
+                self.discovery_complete = False
+        return frontiers
+
+    def plan_recrawl(self, frontiers: Dict[str, CrawlFrontier]):
+        """再クロール方針に従い、今回は取得を見送る記事を決める"""
+        self.deferred_urls.clear()
+        if self.recrawl_policy:
+            urls = [url for frontier in frontiers.values() for url in frontier.fetch_urls()]
+            self.deferred_urls.update(self.recrawl_policy.select(urls))
+
+    def pending_items(self, frontiers: Dict[str, CrawlFrontier], done: Iterable[str] = ()) -> Iterator[Tuple[str, str]]:
+        """未取得の (サイト名, 記事URL) をサイトが交互になる順で返す"""
+        done = set(done)
+        return interleave(
+            [(name, url) for url in frontier.fetch_urls() if url not in done]
+            for name, frontier in frontiers.items()
+        )
+
+    def fetch_articles(self, frontiers: Dict[str, CrawlFrontier],
+                       items: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        記事本文を並行取得し、(サイト名, URL, 記事データ) を返す。
+        先行して投入するリクエスト数を制限し、取得済みの記事がメモリに溜まらないようにする。
+        parse_workersが1以上の場合は、解析を別プロセスで行うパイプラインを使う。
+        """
+        if self.parse_workers > 0:
+            results = self._fetch_and_parse_in_processes(items)
+        else:
+            results = self._fetch_and_parse_in_threads(items)
+
+        for name, article_url, article_data in results:
+            if article_data and self.recrawl_policy and article_url not in self.skipped_urls:
+                # 実際に取得した記事の本文ハッシュを変更履歴に記録
+                self.recrawl_policy.observe(article_url, article_data)
+            if article_data:
+                # 記事が現れたすべてのカテゴリを1件のレコードに記録
+                # （サイトマップから見つけた記事はパンくずから得たカテゴリを使う）
+                article_categories = (frontiers[name].categories_for(article_url)
+                                      or article_data.get('categories', []))
+                article_data['category'] = article_categories[0] if article_categories else ''
+                article_data['categories'] = article_categories
+            yield name, article_url, article_data
+
+    def _fetch_and_parse_in_threads(self, items: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str, Dict]]:
+        """取得スレッド内で解析まで行う（投入順に返す）"""
+        window = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for name, article_url in items:
+                future = executor.submit(self.sites[name].get_article_content, article_url)
+                window.append((name, article_url, future))
+                if len(window) >= self.max_workers * 2:
+                    name, article_url, future = window.popleft()
+                    yield name, article_url, future.result()
+            while window:
+                name, article_url, future = window.popleft()
+                yield name, article_url, future.result()
+
+    def _fetch_and_parse_in_processes(self, items: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str, Dict]]:
+        """取得はスレッド、解析はプロセスプールで行う（解析が完了した順に返す）"""
+        def fetch(item):
+            site = self.sites[item[0]]
+            cached, response = site.fetch_article_page(item[1])
+            return (cached, response), (site.parse_input(response) if response is not None else None)
+
+        pipeline = FetchParsePipeline(
+            fetch=fetch,
+            parse=extract_page,
+            fetch_workers=self.max_workers,
+            parse_workers=self.parse_workers
+        )
+
+        for (name, article_url), (cached, response), extracted in pipeline.run(items):
+            if cached is not None:
+                yield name, article_url, cached
+            elif response is not None and extracted is not None:
+                yield name, article_url, self.sites[name].build_article(article_url, response, extracted)
+            else:
+                yield name, article_url, {}
+
+    def _start_crawl(self, mode: str):
+        logger.info(f"Starting {mode} (sites={', '.join(self.sites)}, max_workers={self.max_workers}, "
+                    f"parse_workers={self.parse_workers}, rate={self.rate_limiter.rate}/s per host)...")
+        self.transport_stats.reset()
+        self.skipped_urls.clear()
+        for site in self.sites.values():
+            site.prepare()
+
+    def _finish_crawl(self):
+        self.http_cache.save()
+        self.sitemap_state.save()
+        if self.recrawl_policy:
+            self.recrawl_policy.save()
+        for site in self.sites.values():
+            site.save_session()
+        logger.info(f"HTTP stats: {self.transport_stats.summary()}")
+
+    def crawl_all(self) -> List[Dict]:
+        """全サイトの全記事をクロール（共有のスレッドプールで並行取得）"""
+        self._start_crawl('full crawl')
+        all_articles = []
+        self.unchanged_urls.clear()
+        self.lastmods.clear()
+        self.failed_urls.clear()
+        self.discovery_complete = True
+
+        frontiers = self.discover()
+        self.plan_recrawl(frontiers)
+        for _, article_url, article_data in self.fetch_articles(frontiers, self.pending_items(frontiers)):
+            if article_data and article_data.get('content'):
+                all_articles.append(article_data)
+                logger.info(f"Crawled: {article_data['title']}")
+            else:
+                self.failed_urls.add(article_url)
+
+        self._finish_crawl()
+        logger.info(f"Crawl completed. Total articles: {len(all_articles)} "
+                    f"(unchanged: {len(self.unchanged_urls)})")
+        return all_articles
+
+    def _restore_frontiers(self, checkpoint: Dict) -> Dict[str, CrawlFrontier]:
+        """チェックポイントからサイトごとのフロンティアを復元"""
+        saved = checkpoint.get('frontiers')
+        if saved is None and 'frontier' in checkpoint:
+            # 単一サイト時代のチェックポイントは先頭のサイトのものとみなす
+            saved = {next(iter(self.sites)): checkpoint['frontier']}
+
+        frontiers = {}
+        for name, site in self.sites.items():
+            if name in (saved or {}):
+                frontiers[name] = CrawlFrontier.from_dict(saved[name], site.base_url, site.profile.locale)
+        return frontiers
+
+    def crawl_to_store(self, store: JsonlArticleStore, resume: bool = True) -> int:
+        """
+        全サイトの全記事をクロールし、取得した順にJSONLストアへ追記する。
+        中断された場合はチェックポイントから未取得の記事だけを再開する。
+        1件も取得できなかった場合は、前回の記事データをそのまま残す。
+        """
+        self._start_crawl('streaming crawl')
+        checkpoint = store.start(resume)
+
+        if checkpoint:
+            frontiers = self._restore_frontiers(checkpoint)
+            done = set(checkpoint.get('done', []))
+            self.unchanged_urls.clear()
+            self.unchanged_urls.update(checkpoint.get('unchanged', []))
+            self.lastmods.clear()
+            self.lastmods.update(checkpoint.get('lastmods', {}))
+            self.failed_urls.clear()
+            self.failed_urls.update(checkpoint.get('failed', []))
+            self.discovery_complete = checkpoint.get('discovery_complete', True)
+            # チェックポイントの後に追加されたサイトは一覧から巡回する
+            missing = {name: site.new_frontier() for name, site in self.sites.items() if name not in frontiers}
+            if missing:
+                frontiers.update(self.discover(missing))
+        else:
+            done = set()
+            self.unchanged_urls.clear()
+            self.lastmods.clear()
+            self.failed_urls.clear()
+            self.discovery_complete = True
+            frontiers = self.discover()
+        self.plan_recrawl(frontiers)
+
+        def save_checkpoint():
+            store.save_checkpoint({
+                'frontiers': {name: frontier.to_dict() for name, frontier in frontiers.items()},
+                'done': list(done),
+                'unchanged': list(self.unchanged_urls),
+                'lastmods': dict(self.lastmods),
+                'failed': list(self.failed_urls),
+                'discovery_complete': self.discovery_complete,
+            })
+            self.http_cache.save()
+            self.sitemap_state.save()
+            if self.recrawl_policy:
+                self.recrawl_policy.save()
+
+        save_checkpoint()
+        pending = self.pending_items(frontiers, done)
+
+        try:
+            for i, (_, article_url, article_data) in enumerate(self.fetch_articles(frontiers, pending), 1):
+                if article_data and article_data.get('content'):
+                    store.append(article_data)
+                    logger.info(f"Crawled: {article_data['title']}")
+                else:
+                    self.failed_urls.add(article_url)
+                done.add(article_url)
+
+                if i % store.checkpoint_interval == 0:
+                    save_checkpoint()
+        except BaseException:
+            save_checkpoint()
+            store.close()
+            raise
+
+        self._finish_crawl()
+        if not store.count and os.path.exists(store.filepath):
+            # サイトの停止やログインの失敗で1件も取得できなかった場合は前回の記事データを残す
+            logger.error(f"No articles crawled. Keeping {store.filepath}")
+            store.discard()
+            return 0
+        store.finish()
+        logger.info(f"Crawl completed. Total articles: {store.count} "
+                    f"(unchanged: {len(self.unchanged_urls)})")
+        return store.count
+
+    def save_to_json(self, articles: List[Dict], filepath: str = 'data/articles.json'):
+        """記事データをJSONファイルに保存"""
+        try:
+            directory = os.path.dirname(filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(articles, f, ensure_ascii=False, indent=2)
+            logger.info(f"Saved {len(articles)} articles to {filepath}")
+        except Exception as e:
+            logger.error(f"Error saving to JSON: {e}")
+
+
+class SingleSiteCrawler:
+    """
+    1サイトだけをクロールするクローラー（サイト別クローラーの共通基底クラス）。
+    処理はすべてCrawlEngineに委譲する。
+    """
+    PROFILE: SiteProfile
+
+    def __init__(self, base_url: Optional[str] = None,
+                 max_workers: Optional[int] = None,
+                 requests_per_second: Optional[float] = None,
+                 cache_path: str = 'data/http_cache.json',
+                 parse_workers: Optional[int] = None,
+                 session_path: str = 'data/session_cookies_{name}.json',
+                 **profile_overrides):
+        profile = replace(self.PROFILE, base_url=base_url or self.PROFILE.base_url, **profile_overrides)
+        self.engine = CrawlEngine(
+            [profile],
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            cache_path=cache_path,
+            parse_workers=parse_workers,
+            session_path=session_path
+        )
+        self.site = self.engine.sites[profile.name]
+        self.base_url = profile.base_url
+        self.max_workers = self.engine.max_workers
+        self.parse_workers = self.engine.parse_workers
+        self.session = self.site.session
+        self.rate_limiter = self.engine.rate_limiter
+        self.http_cache = self.engine.http_cache
+        self.transport_stats = self.engine.transport_stats
+        # 直近のクロールで前回から変化がなかった記事のURL（エンジンと同じ集合）
+        self.unchanged_urls = self.engine.unchanged_urls
+
+    def get_categories(self) -> List[Dict]:
+        """カテゴリ一覧を取得"""
+        return self.site.get_categories()
+
+    def get_articles_from_category(self, category_url: str) -> List[Dict]:
+        """特定のカテゴリから記事一覧を取得"""
+        return self.site.get_articles_from_category(category_url)
+
+    def fetch_article_page(self, article_url: str) -> Tuple[Optional[Dict], Optional[requests.Response]]:
+        """記事ページを取得する（解析はしない）"""
+        return self.site.fetch_article_page(article_url)
+
+    def build_article(self, article_url: str, response: requests.Response, extracted: Dict) -> Dict:
+        """抽出結果から記事データを作成し、検証子キャッシュに保存"""
+        return self.site.build_article(article_url, response, extracted)
+
+    def get_article_content(self, article_url: str) -> Dict:
+        """記事の詳細内容を取得"""
+        return self.site.get_article_content(article_url)
+
+    def discover(self, frontier: CrawlFrontier):
+        """カテゴリ・セクションを巡回し、記事URLをフロンティアに登録"""
+        self.engine.discover({self.site.name: frontier})
+
+    def fetch_articles(self, frontier: CrawlFrontier, article_urls: Iterable[str]) -> Iterator[Tuple[str, Dict]]:
+        """記事本文を並行取得し、(URL, 記事データ) を返す"""
+        name = self.site.name
+        items = ((name, url) for url in article_urls)
+        for _, article_url, article_data in self.engine.fetch_articles({name: frontier}, items):
+            yield article_url, article_data
+
+    def crawl_all(self) -> List[Dict]:
+        """全記事をクロール"""
+        return self.engine.crawl_all()
+
+    def crawl_to_store(self, store: JsonlArticleStore, resume: bool = True) -> int:
+        """全記事をクロールし、取得した順にJSONLストアへ追記する"""
+        return self.engine.crawl_to_store(store, resume)
+
+    def save_to_json(self, articles: List[Dict], filepath: str = 'data/articles.json'):
+        """記事データをJSONファイルに保存"""
+        self.engine.save_to_json(articles, filepath)
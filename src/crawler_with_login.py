@@ -1,225 +1,48 @@
 """
 JTBCサポートサイトのクローラー（ログイン対応版）
 サイトから記事情報を取得し、データベースに保存します。
+処理はサイトプロファイル "jtbc_login" を使ってCrawlEngineで行います。
 """
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
-import json
-import time
-from datetime import datetime
+from typing import Optional
 import logging
-import os
 from dotenv import load_dotenv
 
+try:
+    from .crawl_engine import SingleSiteCrawler
+    from .site_profiles import SITE_PROFILES
+except ImportError:
+    from crawl_engine import SingleSiteCrawler
+    from site_profiles import SITE_PROFILES
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-class JTBCSupportCrawler:
-    def __init__(self, base_url: str = "https://biz.help.jtbc.info/hc/ja"):
-        self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
-        self.logged_in = False
-    
-    def login(self, email: Optional[str] = None, password: Optional[str] = None) -> bool:
-        """JTBCサポートサイトにログイン"""
-        # 環境変数から取得
-        if not email:
-            email = os.getenv('JTBC_LOGIN_EMAIL')
-        if not password:
-            password = os.getenv('JTBC_LOGIN_PASSWORD')
-        
-        if not email or not password:
-            logger.warning("Login credentials not provided. Continuing without login...")
-            return False
-        
-        try:
-            logger.info("Attempting to login to JTBC support site...")
-            
-            # ログインページにアクセス
-            login_url = f"{self.base_url}/signin"
-            response = self.session.get(login_url)
-            
-            # CSRFトークンを取得（必要な場合）
-            soup = BeautifulSoup(response.content, 'html.parser')
-            csrf_token = None
-            csrf_input = soup.find('input', {'name': 'authenticity_token'})
-            if csrf_input:
-                csrf_token = csrf_input.get('value')
-            
-            # ログインリクエストを送信
-            login_data = {
-                'user[email]': email,
-                'user[password]': password,
-            }
-            
-            if csrf_token:
-                login_data['authenticity_token'] = csrf_token
-            
-            login_response = self.session.post(
-                login_url,
-                data=login_data,
-                allow_redirects=True
-            )
-            
-            # ログイン成功を確認
-            if 'signin' not in login_response.url and login_response.status_code == 200:
-                logger.info("✅ Successfully logged in!")
-                self.logged_in = True
-                return True
-            else:
-                logger.error("❌ Login failed. Please check your credentials.")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error during login: {e}")
-            return False
+class JTBCSupportCrawler(SingleSiteCrawler):
+    PROFILE = SITE_PROFILES['jtbc_login']
     
-    def get_categories(self) -> List[Dict]:
-        """カテゴリ一覧を取得"""
-        try:
-            response = self.session.get(self.base_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            categories = []
-            # カテゴリリンクを探す
-            category_links = soup.find_all('a', href=True)
-            
-            for link in category_links:
-                href = link.get('href', '')
-                if '/hc/ja/categories/' in href or '/hc/ja/sections/' in href:
-                    title = link.get_text(strip=True)
-                    if title:
-                        full_url = href if href.startswith('http') else 'https://biz.help.jtbc.info' + href
-                        categories.append({
-                            'title': title,
-                            'url': full_url
-                        })
-            
-            logger.info(f"Found {len(categories)} categories")
-            return categories
-        except Exception as e:
-            logger.error(f"Error fetching categories: {e}")
-            return []
+    def __init__(self, base_url: str = "https://biz.help.jtbc.info/hc/ja",
+                 cache_path: str = 'data/http_cache.json',
+                 session_path: str = 'data/session_cookies.json', **kwargs):
+        super().__init__(base_url, cache_path=cache_path, session_path=session_path, **kwargs)
     
-    def get_articles_from_category(self, category_url: str) -> List[Dict]:
-        """特定のカテゴリから記事一覧を取得"""
-        try:
-            response = self.session.get(category_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            articles = []
-            article_links = soup.find_all('a', href=True)
-            
-            for link in article_links:
-                href = link.get('href', '')
-                if '/hc/ja/articles/' in href:
-                    title = link.get_text(strip=True)
-                    if title:
-                        full_url = href if href.startswith('http') else 'https://biz.help.jtbc.info' + href
-                        articles.append({
-                            'title': title,
-                            'url': full_url
-                        })
-            
-            logger.info(f"Found {len(articles)} articles in category")
-            return articles
-        except Exception as e:
-            logger.error(f"Error fetching articles from category: {e}")
-            return []
+    @property
+    def logged_in(self) -> bool:
+        return self.site.logged_in
     
-    def get_article_content(self, article_url: str) -> Dict:
-        """記事の詳細内容を取得"""
-        try:
-            response = self.session.get(article_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # タイトルを取得
-            title_elem = soup.find('h1') or soup.find('title')
-            title = title_elem.get_text(strip=True) if title_elem else ''
-            
-            # 本文を取得
-            content_elem = soup.find('div', class_='article-body') or \
-                          soup.find('article') or \
-                          soup.find('main') or \
-                          soup.find('div', class_='article-content')
-            
-            content = ''
-            if content_elem:
-                # テキストを抽出
-                content = content_elem.get_text(separator='\n', strip=True)
-            
-            return {
-                'title': title,
-                'content': content,
-                'url': article_url,
-                'crawled_at': datetime.now().isoformat()
-            }
-        except Exception as e:
-            logger.error(f"Error fetching article content from {article_url}: {e}")
-            return {}
+    def login(self, email: Optional[str] = None, password: Optional[str] = None) -> bool:
+        """JTBCサポートサイトにログイン"""
+        return self.site.login(email, password)
     
-    def crawl_all(self) -> List[Dict]:
-        """全記事をクロール"""
-        logger.info("Starting full crawl...")
-        
-        # ログイン試行
-        self.login()
-        
-        all_articles = []
-        
-        # カテゴリを取得
-        categories = self.get_categories()
-        
-        if not categories:
-            logger.warning("No categories found. Site might require login or has different structure.")
-            return []
-        
-        for category in categories:
-            logger.info(f"Crawling category: {category['title']}")
-            time.sleep(1)  # レート制限対策
-            
-            # カテゴリ内の記事を取得
-            articles = self.get_articles_from_category(category['url'])
-            
-            for article in articles:
-                time.sleep(1)  # レート制限対策
-                article_data = self.get_article_content(article['url'])
-                
-                if article_data and article_data.get('content'):
-                    article_data['category'] = category['title']
-                    all_articles.append(article_data)
-                    logger.info(f"Crawled: {article_data['title']}")
-        
-        logger.info(f"Crawl completed. Total articles: {len(all_articles)}")
-        return all_articles
+    def validate_session(self) -> bool:
+        """保存済みセッションが有効かを1回の軽いリクエストで確認"""
+        return self.site.validate_session()
     
-    def save_to_json(self, articles: List[Dict], filepath: str = 'data/articles.json'):
-        """記事データをJSONファイルに保存"""
-        try:
-            # dataディレクトリが存在しない場合は作成
-            import os
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(articles, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved {len(articles)} articles to {filepath}")
-        except Exception as e:
-            logger.error(f"Error saving to JSON: {e}")
+    def ensure_logged_in(self) -> bool:
+        """保存済みセッションが有効ならそれを使い、無効な場合のみログインする"""
+        return self.site.ensure_logged_in()
 
 
 if __name__ == "__main__":
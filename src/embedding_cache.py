@@ -0,0 +1,165 @@
+"""
+埋め込みベクトルのディスクキャッシュ
+(埋め込みモデル名, 正規化したチャンク本文のハッシュ) をキーにベクトルをSQLiteに保存し、
+同じ本文を2回以上埋め込まないようにします（再実行・再構築・コレクションの作り直しでも有効）。
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# SQLiteのIN句に一度に渡すキーの数
+LOOKUP_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用に本文を正規化（NFKC・空白の統一）"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def model_name_of(embeddings: Embeddings) -> str:
+    """埋め込みオブジェクトからモデル名を取得（取得できなければクラス名）"""
+    # model_nameを先に見る（BatchedSentenceEmbeddingsのmodelはモデルを読み込むプロパティ）
+    for attr in ('model_name', 'model'):
+        name = getattr(embeddings, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(embeddings).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """embed_documentsの結果をキャッシュする埋め込みのラッパー"""
+
+    def __init__(self, embeddings: Embeddings, cache_path: str = 'data/embedding_cache.sqlite',
+                 model_name: Optional[str] = None):
+        """
+        Args:
+            embeddings: 実際に埋め込みを計算するオブジェクト
+            cache_path: キャッシュの保存先（SQLite）
+            model_name: キャッシュキーに使うモデル名（省略時はembeddingsから取得）
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name or model_name_of(embeddings)
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, '
+            'PRIMARY KEY (model, text_hash))'
+        )
+        # モデルごとの累計の埋め込み件数と所要時間（キャッシュで節約できた時間の見積もりに使う）
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS timings ('
+            'model TEXT PRIMARY KEY, embedded INTEGER NOT NULL, seconds REAL NOT NULL)'
+        )
+        self.conn.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """ヒット率などの集計をリセット（インデックス化の実行ごとに呼ぶ）"""
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.embed_seconds = 0.0
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self.lock:
+            for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                chunk = unique[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})',
+                    [self.model_name, *chunk]
+                )
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]], seconds: float):
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)',
+                [(self.model_name, key, array('f', vector).tobytes()) for key, vector in vectors.items()]
+            )
+            self.conn.execute(
+                'INSERT INTO timings (model, embedded, seconds) VALUES (?, ?, ?) '
+                'ON CONFLICT(model) DO UPDATE SET embedded = embedded + excluded.embedded, '
+                'seconds = seconds + excluded.seconds',
+                (self.model_name, len(vectors), seconds)
+            )
+            self.conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """キャッシュにない本文だけを埋め込み、結果をキャッシュに保存する"""
+        hashes = [text_hash(text) for text in texts]
+        cached = self._lookup(hashes)
+
+        # 同じ本文が複数あっても1回だけ埋め込む
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            seconds = time.perf_counter() - start
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed, seconds)
+            cached.update(computed)
+        else:
+            seconds = 0.0
+
+        with self.lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+            self.embed_seconds += seconds
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict:
+        """直近のリセット以降のヒット率と、キャッシュで節約できた時間の見積もり"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT embedded, seconds FROM timings WHERE model = ?', (self.model_name,)
+            ).fetchone()
+            hits, misses, embed_seconds = self.hits, self.misses, self.embed_seconds
+        per_text = row[1] / row[0] if row and row[0] else 0.0
+        total = hits + misses
+        return {
+            'model': self.model_name,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'embed_seconds': round(embed_seconds, 2),
+            'saved_seconds': round(hits * per_text, 2),
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"Embedding cache ({stats['model']}): {stats['hits']} hits, {stats['misses']} misses "
+                    f"(hit rate {stats['hit_rate']:.1%}), embedded in {stats['embed_seconds']}s, "
+                    f"saved ~{stats['saved_seconds']}s")
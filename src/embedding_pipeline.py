@@ -0,0 +1,111 @@
+"""
+Sentence Transformersによるバッチ埋め込み
+チャンクを長さ順に並べて近い長さ同士でバッチを作り（パディングの無駄を減らす）、
+必要に応じてCPUの全コアでマルチプロセスのプールを使って埋め込みます。
+HuggingFaceEmbeddingsと同じモデル・正規化で、同じベクトルを返します。
+"""
+import logging
+import os
+import time
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_processes(processes: int) -> int:
+    """プロセス数の設定値を解決（負の値はCPUコア数）"""
+    if processes < 0:
+        return os.cpu_count() or 1
+    return processes
+
+
+class BatchedSentenceEmbeddings(Embeddings):
+    """長さ順のバッチとマルチプロセスのプールで埋め込むEmbeddings"""
+
+    def __init__(self, model_name: str, batch_size: int = 64, processes: int = 0,
+                 device: str = 'cpu', normalize_embeddings: bool = True):
+        """
+        Args:
+            model_name: Sentence Transformersのモデル名
+            batch_size: 1回のencodeに渡すチャンク数
+            processes: 埋め込みに使うプロセス数（0・1: 単一プロセス、負の値: CPUコア数）
+            device: モデルを載せるデバイス
+            normalize_embeddings: ベクトルを正規化するか
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.processes = resolve_processes(processes)
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self._model = None
+        self._pool = None
+
+    @property
+    def model(self):
+        """モデル（初回の埋め込み時に読み込む）"""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def start_pool(self):
+        """マルチプロセスのプールを起動（processesが2以上の場合のみ）"""
+        if self._pool is not None or self.processes < 2:
+            return
+        # 各ワーカーが全コア分のスレッドを使うと奪い合いになるため、ワーカーは1スレッドで動かす
+        saved = os.environ.get('OMP_NUM_THREADS')
+        os.environ['OMP_NUM_THREADS'] = '1'
+        try:
+            self._pool = self.model.start_multi_process_pool([self.device] * self.processes)
+        finally:
+            if saved is None:
+                os.environ.pop('OMP_NUM_THREADS', None)
+            else:
+                os.environ['OMP_NUM_THREADS'] = saved
+        logger.info(f"Started embedding pool with {self.processes} processes")
+
+    def close(self):
+        """プールを停止（インデックス化の終了時に呼ぶ）"""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def _encode(self, texts: List[str]):
+        if self.processes >= 2:
+            self.start_pool()
+            # 各プロセスに長さの近いチャンクがまとまって渡るよう、プロセス数に応じて分割する
+            chunk_size = max(self.batch_size, -(-len(texts) // (self.processes * 4)))
+            return self.model.encode_multi_process(
+                texts, self._pool, batch_size=self.batch_size, chunk_size=chunk_size,
+                normalize_embeddings=self.normalize_embeddings
+            )
+        return self.model.encode(
+            texts, batch_size=self.batch_size,
+            normalize_embeddings=self.normalize_embeddings, show_progress_bar=False
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """長い順に並べ替えて埋め込み、元の順序に戻して返す"""
+        if not texts:
+            return []
+        start = time.perf_counter()
+        # HuggingFaceEmbeddingsと同じく改行は空白として扱う
+        texts = [text.replace('\n', ' ') for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors = self._encode([texts[i] for i in order])
+
+        result: List[Optional[List[float]]] = [None] * len(texts)
+        for position, index in enumerate(order):
+            result[index] = vectors[position].tolist()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Embedded {len(texts)} chunks in {elapsed:.2f}s "
+                    f"({len(texts) / elapsed if elapsed else 0:.1f} chunks/s, processes={max(1, self.processes)})")
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode(
+            text.replace('\n', ' '), normalize_embeddings=self.normalize_embeddings, show_progress_bar=False
+        ).tolist()
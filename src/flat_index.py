@@ -0,0 +1,436 @@
+"""
+NumPyによるフラットなベクトルインデックス
+数千チャンク程度のコーパス向けに、正規化した埋め込みを1つの .npy 行列（メモリマップで読み込み）と
+メタデータの配列に保存し、行列とベクトルの積1回と argpartition で厳密な上位k件を返します。
+Chromaの代わりにVectorStoreManagerのバックエンドとして使えるよう、index_syncが使うAPI
+（get / add_documents / delete）とLangChainのVectorStoreのインターフェースを備えます。
+ベクトルはfloat16、またはベクトルごとのスケール付きのint8で保存でき、メモリとディスクを節約できます。
+保存時に行を代表のカテゴリ順に並べ、カテゴリを指定した検索ではそのカテゴリの区間（セグメント）の行と、
+ほかのカテゴリを代表とする、そのカテゴリにも属する行だけを走査します。
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    from .index_sync import CATEGORY_KEY_PREFIX, chunk_categories
+except ImportError:
+    from index_sync import CATEGORY_KEY_PREFIX, chunk_categories
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = 'vectors.npy'
+CODES_FILE = 'codes.npy'
+SCALES_FILE = 'scales.npy'
+METADATA_FILE = 'metadata.json'
+
+PRECISIONS = ('float32', 'float16', 'int8')
+# セグメントに分けるメタデータのキー（代表のカテゴリ）
+PARTITION_KEY = 'category'
+# 圧縮形式のベクトルをfloat32に戻して内積を計算するときの1ブロックの行数（CPUキャッシュに収まる大きさにする）
+SCORE_BLOCK_ROWS = 256
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """各行をL2正規化（内積がコサイン類似度になる）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """ベクトルを圧縮形式に変換し (符号, ベクトルごとのスケール) を返す（スケールはint8のみ）"""
+    if precision == 'float16':
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = np.asarray(codes, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * scales[:, None]
+    return vectors
+
+
+def concat(existing: Optional[np.ndarray], added: np.ndarray) -> np.ndarray:
+    if existing is None or not len(existing):
+        return added
+    return np.concatenate([existing, added])
+
+
+def take_rows(array: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """昇順の行番号の行（連続した区間ならメモリマップのままスライスする）"""
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+        return array[rows[0]:rows[-1] + 1]
+    return array[rows]
+
+
+def matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Chromaのwhere条件（{'key': 値} / {'key': {'$eq'|'$ne'|'$in'|'$nin': ...}} / '$and' / '$or'）の判定"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, operand in condition.items():
+            if op == '$eq' and value != operand:
+                return False
+            if op == '$ne' and value == operand:
+                return False
+            if op == '$in' and value not in operand:
+                return False
+            if op == '$nin' and value in operand:
+                return False
+    return True
+
+
+class FlatIndex(VectorStore):
+    """
+    メモリマップした埋め込み行列に対する全件（厳密）検索のベクトルストア。
+    precisionにfloat16 / int8を指定すると圧縮形式のベクトルで検索し、
+    候補（上位k×rescore_factor件）だけをfloat32のベクトルで再スコアリングする。
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings, precision: str = 'float32',
+                 rescore: bool = True, rescore_factor: int = 10):
+        """
+        Args:
+            directory: インデックスの保存先（vectors.npy・codes.npy・scales.npy と metadata.json）
+            embedding: 埋め込みに使うオブジェクト
+            precision: 検索に使うベクトルの精度（float32 / float16 / int8）
+            rescore: 圧縮形式のとき、float32のベクトルも保存して候補を再スコアリングするか
+            rescore_factor: 再スコアリングする候補の件数（kの倍数）
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision} (available: {', '.join(PRECISIONS)})")
+        self.directory = directory
+        self.embedding = embedding
+        self.precision = precision
+        self.keep_full = precision == 'float32' or rescore
+        self.rescore_factor = rescore_factor
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        # float32のベクトル（keep_fullの場合のみ）と、圧縮形式のベクトル・スケール（float32以外の場合のみ）
+        self.vectors: Optional[np.ndarray] = None
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        # カテゴリ -> 行番号（追加・削除で作り直す）
+        self._partitions: Optional[Dict[str, np.ndarray]] = None
+        self.dirty = False
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _load(self):
+        if not os.path.exists(self._path(METADATA_FILE)):
+            return
+        try:
+            with open(self._path(METADATA_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stored = data.get('precision', 'float32')
+            has_full = data.get('full', True)
+            count = len(data['ids'])
+
+            vectors = codes = scales = None
+            if count:
+                if has_full:
+                    vectors = np.load(self._path(VECTORS_FILE), mmap_mode='r')
+                if stored != 'float32':
+                    codes = np.load(self._path(CODES_FILE), mmap_mode='r')
+                    if stored == 'int8':
+                        scales = np.load(self._path(SCALES_FILE))
+                for array in (vectors, codes, scales):
+                    if array is not None and len(array) != count:
+                        raise ValueError(f"{len(array)} vectors but {count} metadata entries")
+        except Exception as e:
+            # 壊れたインデックスは空として扱い、次回のインデックス化で作り直す
+            logger.error(f"Error loading flat index from {self.directory}: {e}")
+            return
+
+        self.ids, self.texts, self.metadatas = data['ids'], data['texts'], data['metadatas']
+        if count and (stored != self.precision or (self.keep_full and vectors is None)):
+            # 保存時と異なる精度が指定された場合は変換する（float32がなければ圧縮形式から復元）
+            full = np.asarray(vectors, dtype=np.float32) if vectors is not None else dequantize(codes, scales)
+            self._set_vectors(full)
+            self.dirty = True
+            logger.info(f"Converted flat index from {stored} to {self.precision}")
+        else:
+            self.vectors = vectors if self.keep_full else None
+            self.codes, self.scales = codes, scales
+        logger.info(f"Loaded flat index ({count} vectors, {self.precision}) from {self.directory}")
+
+    def _set_vectors(self, full: np.ndarray):
+        self.vectors = full if self.keep_full else None
+        if self.precision == 'float32':
+            self.codes = self.scales = None
+        else:
+            self.codes, self.scales = quantize(full, self.precision)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def memory_bytes(self) -> int:
+        """検索で走査するベクトルのバイト数（float32以外では再スコアリング用のベクトルは含まない）"""
+        if self.codes is not None:
+            return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        return self.vectors.nbytes if self.vectors is not None else 0
+
+    def save(self):
+        """変更があればディスクに書き出す（一時ファイル経由で置き換え、メタデータは最後に書く）"""
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._group_by_partition()
+
+        arrays = {VECTORS_FILE: self.vectors, CODES_FILE: self.codes, SCALES_FILE: self.scales}
+        written = []
+        for filename, array in arrays.items():
+            if array is None:
+                continue
+            with open(self._path(filename) + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            written.append(filename)
+        with open(self._path(METADATA_FILE) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'precision': self.precision,
+                'full': self.vectors is not None,
+                'ids': self.ids,
+                'texts': self.texts,
+                'metadatas': self.metadatas,
+            }, f, ensure_ascii=False)
+
+        for filename in written:
+            os.replace(self._path(filename) + '.tmp', self._path(filename))
+        os.replace(self._path(METADATA_FILE) + '.tmp', self._path(METADATA_FILE))
+        # 精度を変えた場合などに残った、使わないファイルを削除する
+        for filename, array in arrays.items():
+            if array is None and os.path.exists(self._path(filename)):
+                os.remove(self._path(filename))
+        self.dirty = False
+        logger.info(f"Saved flat index ({len(self.ids)} vectors, {self.precision}) to {self.directory}")
+
+    def partitions(self) -> Dict[str, np.ndarray]:
+        """カテゴリごとの、そのカテゴリに属する行の昇順の行番号（カテゴリなしは''）"""
+        if self._partitions is None:
+            groups: Dict[str, List[int]] = {}
+            for row, meta in enumerate(self.metadatas):
+                for category in chunk_categories(meta) or ['']:
+                    groups.setdefault(category, []).append(row)
+            self._partitions = {key: np.asarray(rows, dtype=np.int64) for key, rows in groups.items()}
+        return self._partitions
+
+    def _group_by_partition(self):
+        """代表のカテゴリが同じ行が連続するように並べ替える（既に連続していれば何もしない）"""
+        keys = [meta.get(PARTITION_KEY) or '' for meta in self.metadatas]
+        runs = sum(1 for a, b in zip(keys, keys[1:]) if a != b) + 1 if keys else 0
+        if runs <= len(set(keys)):
+            return
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        for name in ('vectors', 'codes', 'scales'):
+            array = getattr(self, name)
+            if array is not None:
+                setattr(self, name, np.asarray(array[order]))
+        self.ids = [self.ids[i] for i in order]
+        self.texts = [self.texts[i] for i in order]
+        self.metadatas = [self.metadatas[i] for i in order]
+        self._partitions = None
+
+    def _partition_rows(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """whereが1つのカテゴリへの所属だけの条件（{'category:<名前>': True}）ならその行番号、それ以外はNone"""
+        if not where or len(where) != 1:
+            return None
+        key, condition = next(iter(where.items()))
+        if not key.startswith(CATEGORY_KEY_PREFIX):
+            return None
+        if isinstance(condition, dict):
+            if list(condition) != ['$eq']:
+                return None
+            condition = condition['$eq']
+        if condition is not True:
+            return None
+        return self.partitions().get(key[len(CATEGORY_KEY_PREFIX):], np.zeros(0, dtype=np.int64))
+
+    # --- 書き込み（index_syncから使う） ---
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"{len(self.ids) + i}" for i in range(len(texts))]
+
+        # 同じIDがあれば置き換える
+        existing = set(self.ids)
+        self.delete(ids=[cid for cid in ids if cid in existing])
+
+        added = normalize_rows(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32))
+        if self.keep_full:
+            self.vectors = concat(self.vectors, added)
+        if self.precision != 'float32':
+            codes, scales = quantize(added, self.precision)
+            self.codes = concat(self.codes, codes)
+            if scales is not None:
+                self.scales = concat(self.scales, scales)
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(dict(meta) for meta in metadatas)
+        self._partitions = None
+        self.dirty = True
+        return ids
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        """保存済みのチャンクのメタデータを置き換える（ベクトルはそのまま、行の並べ替えは保存時に行う）"""
+        rows = {cid: row for row, cid in enumerate(self.ids)}
+        for cid, meta in zip(ids, metadatas):
+            if cid in rows:
+                self.metadatas[rows[cid]] = dict(meta)
+        self._partitions = None
+        self.dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        remove = set(ids or [])
+        if not remove:
+            return True
+        keep = [i for i, cid in enumerate(self.ids) if cid not in remove]
+        if len(keep) == len(self.ids):
+            return True
+        for name in ('vectors', 'codes', 'scales'):
+            array = getattr(self, name)
+            if array is not None:
+                setattr(self, name, np.asarray(array[keep]))
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._partitions = None
+        self.dirty = True
+        return True
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, List]:
+        """Chromaのget()と同じ形式で保存済みのチャンクを返す"""
+        include = ['metadatas', 'documents'] if include is None else include
+        wanted = set(ids) if ids is not None else None
+        rows = [
+            i for i, cid in enumerate(self.ids)
+            if (wanted is None or cid in wanted) and matches(self.metadatas[i], where)
+        ]
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+        result = {'ids': [self.ids[i] for i in rows]}
+        if 'metadatas' in include:
+            result['metadatas'] = [self.metadatas[i] for i in rows]
+        if 'documents' in include:
+            result['documents'] = [self.texts[i] for i in rows]
+        return result
+
+    # --- 検索 ---
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        全ベクトル（rowsを指定した場合はその行のベクトル）との内積。
+        圧縮形式ならブロックごとにfloat32に戻して計算する。
+        """
+        if self.codes is None:
+            return (self.vectors if rows is None else take_rows(self.vectors, rows)) @ query
+        codes = self.codes if rows is None else take_rows(self.codes, rows)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = np.asarray(codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + SCORE_BLOCK_ROWS] = block @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def _top_k(self, query_vector: List[float], k: int, where: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        if not self.ids:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        # カテゴリだけの条件なら、そのセグメントの行だけを走査する（scoresはsegmentの行の順）
+        segment = self._partition_rows(where)
+        scores = self._scores(query, segment)
+
+        candidates = len(scores)
+        if where and segment is None:
+            allowed = np.fromiter((matches(meta, where) for meta in self.metadatas), dtype=bool, count=len(self.ids))
+            scores = np.where(allowed, scores, -np.inf)
+            candidates = int(allowed.sum())
+        k = min(k, candidates)
+        if k <= 0:
+            return []
+
+        if self.codes is not None and self.vectors is not None:
+            # 圧縮形式のスコアで候補を絞り、float32のベクトルで再スコアリングする
+            shortlist = min(candidates, k * self.rescore_factor)
+            rows = np.sort(np.argpartition(-scores, shortlist - 1)[:shortlist])
+            if segment is not None:
+                rows = segment[rows]
+            exact = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:k]
+            return [(int(rows[i]), float(exact[i])) for i in order]
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = segment[top] if segment is not None else top
+        return [(int(row), float(scores[i])) for row, i in zip(rows, top)]
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """上位k件の (ドキュメント, コサイン類似度)"""
+        return [(self._document(row), score) for row, score in self._top_k(embedding, k, filter)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def _select_relevance_score_fn(self):
+        # スコアはコサイン類似度なので、[-1, 1] を [0, 1] に変換する
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[Dict]] = None,
+                   directory: str = './flat_index', ids: Optional[List[str]] = None, **kwargs: Any) -> 'FlatIndex':
+        index = cls(directory, embedding)
+        index.add_texts(texts, metadatas, ids=ids)
+        index.save()
+        return index
@@ -0,0 +1,134 @@
+"""
+クロールフロンティア
+URLを正規化し、記事IDをキーに重複を排除します。
+同じ記事が複数のカテゴリ・セクションに現れた場合は1件にまとめ、
+所属するカテゴリをすべて記録します。
+"""
+import re
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+# /hc/<locale>/<種類>/<ID>-<タイトル> 形式のZendeskのURL
+ZENDESK_PATH_PATTERN = re.compile(
+    r'^/hc(?:/(?P<locale>[A-Za-z]{2}(?:-[A-Za-z]{2})?))?/(?P<kind>articles|sections|categories)/(?P<id>\d+)'
+)
+
+
+def path_prefix(locale: Optional[str]) -> str:
+    """ヘルプセンターのパスの先頭部分（/hc/<locale>）"""
+    return f"/hc/{locale}" if locale else "/hc"
+
+
+def clean_url(url: str, base_url: Optional[str] = None, locale: Optional[str] = 'ja') -> str:
+    """
+    取得に使うURLを整形する。
+    クエリ文字列・フラグメントを除去し、ロケール表記（ja-jp、省略など）を統一する。
+    タイトル部分は取得時のリダイレクトを避けるため残す。
+    """
+    if base_url:
+        url = urljoin(base_url, url)
+    parts = urlsplit(url)
+    path = parts.path
+
+    match = ZENDESK_PATH_PATTERN.match(path)
+    if match and locale:
+        path = f"{path_prefix(locale)}/{match.group('kind')}/{path[match.end('kind') + 1:]}"
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+
+def canonicalize_url(url: str, base_url: Optional[str] = None, locale: Optional[str] = 'ja') -> str:
+    """URLを正規化する（clean_urlに加えて、記事・セクション・カテゴリのタイトル部分も除去）"""
+    url = clean_url(url, base_url, locale)
+    parts = urlsplit(url)
+
+    match = ZENDESK_PATH_PATTERN.match(parts.path)
+    if match:
+        prefix = path_prefix(locale or match.group('locale'))
+        path = f"{prefix}/{match.group('kind')}/{match.group('id')}"
+        return urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+    return url.rstrip('/')
+
+
+def article_id(url: str) -> Optional[str]:
+    """記事URLから記事IDを取得"""
+    match = ZENDESK_PATH_PATTERN.match(urlsplit(url).path)
+    if match and match.group('kind') == 'articles':
+        return match.group('id')
+    return None
+
+
+def url_key(url: str, base_url: Optional[str] = None, locale: Optional[str] = 'ja') -> str:
+    """重複判定のキー（記事IDがあればホスト+ID、なければ正規化URL）"""
+    url = clean_url(url, base_url, locale)
+    article = article_id(url)
+    if article:
+        return f"{urlsplit(url).netloc}:{article}"
+    return canonicalize_url(url, base_url, locale)
+
+
+class CrawlFrontier:
+    """記事IDをキーに取得済みURLを管理するフロンティア（スレッドセーフ）"""
+
+    def __init__(self, base_url: Optional[str] = None, locale: Optional[str] = 'ja'):
+        self.base_url = base_url
+        self.locale = locale
+        self.urls: Dict[str, str] = {}
+        self.categories: Dict[str, List[str]] = {}
+        self.lock = threading.Lock()
+
+    def key(self, url: str) -> str:
+        """重複判定のキー（記事IDがあればホスト+ID、なければ正規化URL）"""
+        return url_key(url, self.base_url, self.locale)
+
+    def add(self, url: str, category: Optional[str] = None) -> Optional[str]:
+        """
+        URLを追加する。初めて見る記事なら取得用URLを返し、
+        既知の記事ならカテゴリだけ追記してNoneを返す。
+        """
+        fetch_url = clean_url(url, self.base_url, self.locale)
+        key = self.key(fetch_url)
+
+        with self.lock:
+            is_new = key not in self.urls
+            if is_new:
+                self.urls[key] = fetch_url
+                self.categories[key] = []
+            if category and category not in self.categories[key]:
+                self.categories[key].append(category)
+
+        return fetch_url if is_new else None
+
+    def categories_for(self, url: str) -> List[str]:
+        """記事が所属するカテゴリ一覧を返す"""
+        with self.lock:
+            return list(self.categories.get(self.key(url), []))
+
+    def fetch_urls(self) -> List[str]:
+        """登録順に取得用URLを返す"""
+        with self.lock:
+            return list(self.urls.values())
+
+    def to_dict(self) -> Dict:
+        """チェックポイント保存用の辞書に変換"""
+        with self.lock:
+            return {
+                'urls': dict(self.urls),
+                'categories': {key: list(value) for key, value in self.categories.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict, base_url: Optional[str] = None, locale: Optional[str] = 'ja') -> 'CrawlFrontier':
+        """チェックポイントからフロンティアを復元"""
+        frontier = cls(base_url, locale)
+        frontier.urls = dict(data.get('urls', {}))
+        frontier.categories = {key: list(value) for key, value in data.get('categories', {}).items()}
+        return frontier
+
+    def __contains__(self, url: str) -> bool:
+        with self.lock:
+            return self.key(url) in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
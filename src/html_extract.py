@@ -0,0 +1,129 @@
+"""
+HTML抽出レイヤー
+lxmlでページを解析し、必要なリンクと本文ノードだけを取り出します。
+BeautifulSoup(html.parser)で全体のツリーを構築するより高速です。
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from lxml import etree, html as lxml_html
+
+# 本文として扱わない要素（BeautifulSoupのget_textと同様に除外する）
+IGNORED_TAGS = ('script', 'style', 'template', 'noscript')
+
+# 本文ノードの候補（"タグ.クラス" 形式、先頭から順に探す）
+DEFAULT_CONTENT_SELECTORS = ('div.article-body', 'article', 'main')
+DEFAULT_TITLE_SELECTORS = ('h1', 'title')
+
+# 一覧ページの「次のページ」リンクの候補
+NEXT_PAGE_XPATH = (
+    '//a[@rel="next"]/@href | //link[@rel="next"]/@href'
+    " | //li[contains(concat(' ', normalize-space(@class), ' '), ' pagination-next ')]/a/@href"
+)
+
+_parsers: Dict[str, lxml_html.HTMLParser] = {}
+
+
+def get_parser(encoding: str = 'utf-8') -> lxml_html.HTMLParser:
+    """エンコーディングごとのパーサーを返す（コメントは解析時に除去）"""
+    parser = _parsers.get(encoding)
+    if parser is None:
+        parser = lxml_html.HTMLParser(encoding=encoding, remove_comments=True)
+        _parsers[encoding] = parser
+    return parser
+
+
+def parse_html(content: bytes, encoding: str = 'utf-8'):
+    """HTMLを解析してルート要素を返す（空の場合はNone）"""
+    if not content or not content.strip():
+        return None
+    try:
+        return lxml_html.document_fromstring(content, parser=get_parser(encoding))
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def selector_to_xpath(selector: str) -> str:
+    """"タグ.クラス" 形式のセレクタをXPathに変換"""
+    tag, _, class_name = selector.partition('.')
+    tag = tag or '*'
+    if class_name:
+        return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+    return f"//{tag}"
+
+
+def find_first(root, selectors: Sequence[str]):
+    """セレクタを順に試し、最初に見つかった要素を返す"""
+    if root is None:
+        return None
+    for selector in selectors:
+        found = root.xpath(selector_to_xpath(selector))
+        if found:
+            return found[0]
+    return None
+
+
+def inline_text(element) -> str:
+    """要素のテキストを連結して返す（BeautifulSoupの get_text(strip=True) 相当）"""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def block_text(element) -> str:
+    """要素のテキストを改行区切りで返す（get_text(separator='\\n', strip=True) 相当）"""
+    etree.strip_elements(element, *IGNORED_TAGS, with_tail=False)
+    return '\n'.join(text.strip() for text in element.itertext() if text.strip())
+
+
+def extract_links(content: bytes, pattern: Optional[str] = None, encoding: str = 'utf-8') -> List[Tuple[str, str]]:
+    """
+    ページ内の <a href> を (href, リンクテキスト) のリストで返す。
+    patternを指定した場合はhrefにpatternを含むリンクのみ返す。
+    """
+    return _links(parse_html(content, encoding), pattern)
+
+
+def _links(root, pattern: Optional[str]) -> List[Tuple[str, str]]:
+    if root is None:
+        return []
+
+    links = []
+    for anchor in root.iter('a'):
+        href = anchor.get('href')
+        if not href or (pattern and pattern not in href):
+            continue
+        links.append((href, inline_text(anchor)))
+    return links
+
+
+def extract_listing(content: bytes, pattern: Optional[str] = None,
+                    encoding: str = 'utf-8') -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """一覧ページから (リンクのリスト, 次のページのhref) を返す（ページ送りがなければNone）"""
+    root = parse_html(content, encoding)
+    if root is None:
+        return [], None
+    next_links = root.xpath(NEXT_PAGE_XPATH)
+    return _links(root, pattern), (next_links[0] if next_links else None)
+
+
+def extract_article(content: bytes,
+                    content_selectors: Sequence[str] = DEFAULT_CONTENT_SELECTORS,
+                    title_selectors: Sequence[str] = DEFAULT_TITLE_SELECTORS,
+                    encoding: str = 'utf-8',
+                    breadcrumb_selectors: Sequence[str] = ()) -> Dict:
+    """
+    記事ページからタイトルと本文テキストを抽出。
+    breadcrumb_selectorsを指定した場合はパンくずリストの各項目も 'breadcrumbs' として返す。
+    """
+    root = parse_html(content, encoding)
+
+    title_elem = find_first(root, title_selectors)
+    # パンくずは本文ノードの外にあることが多いため、本文の加工前に取り出す
+    breadcrumb_elem = find_first(root, breadcrumb_selectors) if breadcrumb_selectors else None
+    content_elem = find_first(root, content_selectors)
+
+    extracted = {
+        'title': inline_text(title_elem) if title_elem is not None else '',
+        'content': block_text(content_elem) if content_elem is not None else '',
+    }
+    if breadcrumb_selectors:
+        items = breadcrumb_elem.findall('.//li') if breadcrumb_elem is not None else []
+        extracted['breadcrumbs'] = [text for text in (inline_text(item) for item in items) if text]
+    return extracted
@@ -0,0 +1,103 @@
+"""
+HTTP検証子キャッシュ
+URLごとのETag / Last-Modified / 本文ハッシュをディスクに保存し、
+条件付きGETで未更新の記事の再取得・再解析を省略します。
+本文ハッシュは抽出したタイトルと本文から計算するため、ページ内のトークンなどが変わっただけの記事も未更新と判定できます。
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+try:
+    from .recrawl_policy import content_hash
+except ImportError:
+    from recrawl_policy import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ValidatorCache:
+    def __init__(self, filepath: str = 'data/http_cache.json'):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """キャッシュファイルを読み込む"""
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            logger.info(f"Loaded {len(entries)} cached validators from {self.filepath}")
+            return entries
+        except Exception as e:
+            logger.error(f"Error loading HTTP cache: {e}")
+            return {}
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """条件付きGET用のヘッダーを返す（解析済み記事がある場合のみ）"""
+        with self.lock:
+            entry = self.entries.get(url)
+        if not entry or not entry.get('article'):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get_article(self, url: str) -> Optional[Dict]:
+        """前回解析した記事データを返す"""
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry and entry.get('article'):
+            return dict(entry['article'])
+        return None
+
+    def lookup_unchanged(self, url: str, response) -> Optional[Dict]:
+        """
+        304 Not Modified なら前回の記事データを返す（解析を省略できる）。
+        200の場合は解析後にstoreで本文ハッシュを比較する。
+        """
+        if response.status_code == 304:
+            return self.get_article(url)
+        return None
+
+    def store(self, url: str, response, article: Dict) -> bool:
+        """
+        取得したレスポンスの検証子と解析結果を保存する。
+        抽出したタイトルと本文が前回と同じ（未更新）ならTrueを返す。
+        """
+        digest = content_hash(article)
+        with self.lock:
+            previous = self.entries.get(url) or {}
+            self.entries[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content_hash': digest,
+                'article': article,
+            }
+        return bool(previous.get('article')) and previous.get('content_hash') == digest
+
+    def save(self):
+        """キャッシュをディスクに書き出す（一時ファイル経由で置き換え）"""
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with self.lock:
+                data = json.dumps(self.entries, ensure_ascii=False)
+
+            tmp_path = self.filepath + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.filepath)
+            logger.info(f"Saved {len(self.entries)} cached validators to {self.filepath}")
+        except Exception as e:
+            logger.error(f"Error saving HTTP cache: {e}")
@@ -0,0 +1,131 @@
+"""
+クローラー共通のHTTPトランスポート
+接続プールのサイズ調整、指数バックオフ（ジッター付き）のリトライ、
+すべてのリクエストへのタイムアウト設定、リクエストごとの所要時間の記録を行います。
+"""
+import logging
+import random
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# (接続タイムアウト, 読み込みタイムアウト) 秒
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# リトライ対象のステータスコード
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class JitteredRetry(Retry):
+    """バックオフ時間にジッターを加えたRetry（同時リトライが同じ瞬間に集中しないようにする）"""
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return random.uniform(backoff / 2, backoff * 1.5)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """タイムアウト未指定のリクエストに既定のタイムアウトを設定するアダプター"""
+
+    def __init__(self, *args, timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class TransportStats:
+    """リクエストごとの所要時間・ステータス・転送量を集計する（スレッドセーフ）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.total_seconds = 0.0
+            self.max_seconds = 0.0
+            self.bytes = 0
+            self.statuses: Dict[int, int] = {}
+
+    def record(self, response: requests.Response, *args, **kwargs) -> requests.Response:
+        """レスポンスフックとして登録して使う"""
+        elapsed = response.elapsed.total_seconds()
+        size = len(response.content or b'')
+        with self.lock:
+            self.requests += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.bytes += size
+            self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+        logger.debug(f"{response.request.method} {response.url} -> {response.status_code} "
+                     f"({elapsed * 1000:.0f} ms, {size} bytes)")
+        return response
+
+    def summary(self) -> Dict:
+        """集計結果を辞書で返す"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'avg_ms': round(self.total_seconds * 1000 / self.requests, 1) if self.requests else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 1),
+                'bytes': self.bytes,
+                'statuses': dict(self.statuses),
+            }
+
+
+def create_session(pool_size: int = 10, max_retries: int = 3, backoff_factor: float = 0.5,
+                   timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                   headers: Optional[Dict[str, str]] = None,
+                   stats: Optional[TransportStats] = None) -> requests.Session:
+    """
+    クローラー用のSessionを作成する。
+
+    Args:
+        pool_size: ホストごとの接続プールのサイズ（クロールの同時実行数に合わせる）
+        max_retries: 冪等なリクエスト（GET/HEAD）のリトライ回数
+        backoff_factor: 指数バックオフの基準秒数
+        timeout: 既定のタイムアウト（接続, 読み込み）
+        headers: 追加するリクエストヘッダー
+        stats: リクエストの所要時間を記録するTransportStats
+    """
+    retry = JitteredRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        # リトライし尽くした場合も最後のレスポンスを返し、呼び出し側で判定する
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout,
+        max_retries=retry,
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        # プールが埋まっている場合は使い捨ての接続を作らずに空きを待つ
+        pool_block=True,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if headers:
+        session.headers.update(headers)
+    if stats is not None:
+        session.hooks['response'].append(stats.record)
+    return session
@@ -0,0 +1,264 @@
+"""
+インデックスの世代管理（ブルー/グリーン）
+インデックスの更新は現在の世代をコピーした新しいディレクトリ（generations/<世代ID>）に対して行い、
+検証してから CURRENT ファイルを一時ファイル経由で置き換えて切り替えます。
+稼働中のアプリは CURRENT の変化を検知して、再起動せずに新しい世代に切り替えます。
+古い世代は指定した数だけ残し、ロールバックに使えます。
+世代の作成から有効化（または破棄）までは root/.lock の排他ロックを保持し、
+同時に動いた更新（/api/update とスケジューラーなど）が互いの更新を失わないようにします。
+
+使い方:
+    python src/index_generations.py list [persist_directory]
+    python src/index_generations.py rollback [persist_directory]
+    python src/index_generations.py discard <世代ID> [persist_directory]
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windowsではプロセス間のロックを行わない
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+GENERATIONS_DIR = 'generations'
+LOCK_FILE = '.lock'
+INFO_FILE = 'GENERATION.json'
+
+
+class IndexGenerations:
+    """persist_directory配下のインデックスの世代"""
+
+    def __init__(self, root: str, keep: int = 3):
+        """
+        Args:
+            root: インデックスの保存先（VectorStoreManagerのpersist_directory）
+            keep: 現在の世代のほかに残す古い世代の数
+        """
+        self.root = root
+        self.keep = keep
+        self.generations_dir = os.path.join(root, GENERATIONS_DIR)
+        self._lock = None
+
+    def current(self) -> Optional[str]:
+        """現在の世代ID（まだ世代がない場合はNone）"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def path(self, generation: Optional[str]) -> str:
+        """世代のディレクトリ（Noneの場合は世代管理以前のroot直下）"""
+        if generation is None:
+            return self.root
+        return os.path.join(self.generations_dir, generation)
+
+    def current_path(self) -> str:
+        return self.path(self.current())
+
+    def info(self, generation: str) -> Dict:
+        """世代の作成時の情報（parent: コピー元の世代ID、sequence: 作成順の連番）"""
+        try:
+            with open(os.path.join(self.path(generation), INFO_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _acquire(self):
+        """書き込みの排他ロックを取る（別のプロセス・別のインスタンスが保持している間は待つ）"""
+        if self._lock is not None:
+            raise RuntimeError("Index generation lock is already held by this instance")
+        os.makedirs(self.root, exist_ok=True)
+        lock = open(os.path.join(self.root, LOCK_FILE), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"Waiting for index lock {lock.name}...")
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        self._lock = lock
+
+    def _release(self):
+        if self._lock is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock.fileno(), fcntl.LOCK_UN)
+        self._lock.close()
+        self._lock = None
+
+    def list(self) -> List[str]:
+        """保存されている世代ID（作成順。世代の連番で並べ、連番のない以前の世代はその前に名前順で並べる）"""
+        if not os.path.isdir(self.generations_dir):
+            return []
+        names = [
+            name for name in os.listdir(self.generations_dir)
+            if os.path.isdir(os.path.join(self.generations_dir, name)) and not name.endswith('.tmp')
+        ]
+        return sorted(names, key=lambda name: (self.info(name).get('sequence', 0), name))
+
+    def create(self) -> str:
+        """
+        現在の世代をコピーして新しい世代を作り、その世代IDを返す（まだ有効化しない）。
+        書き込みの排他ロックを取り、activate() か discard() まで保持する。
+        """
+        self._acquire()
+        try:
+            # 並び順は時刻ではなく連番で決める（IDの時刻はUTCで、夏時間の切り替えの影響を受けない）
+            sequence = max((self.info(name).get('sequence', 0) for name in self.list()), default=0) + 1
+            generation = time.strftime('%Y%m%d-%H%M%SZ', time.gmtime()) + f"-{sequence:06d}"
+            parent = self.current()
+            source = self.path(parent)
+            target = self.path(generation)
+            os.makedirs(self.generations_dir, exist_ok=True)
+
+            tmp_target = target + '.tmp'
+            if os.path.isdir(source):
+                # 世代管理以前のroot直下のインデックスは、世代ディレクトリ・CURRENT・ロックを除いてコピーする
+                ignore = (shutil.ignore_patterns(GENERATIONS_DIR, CURRENT_FILE, LOCK_FILE, '*.tmp')
+                          if source == self.root else None)
+                shutil.copytree(source, tmp_target, ignore=ignore)
+            else:
+                os.makedirs(tmp_target)
+            with open(os.path.join(tmp_target, INFO_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'parent': parent, 'sequence': sequence}, f)
+            os.replace(tmp_target, target)
+        except Exception:
+            self._release()
+            raise
+        logger.info(f"Created index generation {generation} from {source}")
+        return generation
+
+    def _write_current(self, generation: str):
+        """CURRENTを一時ファイル経由で置き換える（読み手は常に新旧どちらかの世代IDを読む）"""
+        tmp_path = os.path.join(self.root, CURRENT_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    def activate(self, generation: str):
+        """
+        世代を切り替え、古い世代を削除して書き込みのロックを解放する。
+        作成後に現在の世代が変わっていた場合（コピー元が現在の世代でない場合）はRuntimeErrorを送出する。
+        """
+        try:
+            parent, current = self.info(generation).get('parent'), self.current()
+            if parent != current:
+                raise RuntimeError(
+                    f"Index generation {generation} was built from {parent}, but the current generation is {current}"
+                )
+            self._write_current(generation)
+            logger.info(f"Activated index generation {generation}")
+            self.prune()
+        finally:
+            self._release()
+
+    def discard(self, generation: str):
+        """
+        有効化しなかった世代を削除して書き込みのロックを解放する。
+        create()を経ずに呼んだ場合（ロールバックで戻す前の世代の明示的な削除など）はロックを取ってから削除する。
+        """
+        if self._lock is None:
+            self._acquire()
+        try:
+            if generation != self.current():
+                shutil.rmtree(self.path(generation), ignore_errors=True)
+                logger.info(f"Discarded index generation {generation}")
+        finally:
+            self._release()
+
+    def prune(self):
+        """
+        現在の世代より古い世代をkeep世代だけ残して削除する。
+        現在より新しい世代（ロールバックで戻す前の世代）は discard() で明示的に削除するまで残す。
+        """
+        current = self.current()
+        generations = self.list()
+        if current not in generations:
+            return
+        older = generations[:generations.index(current)]
+        for generation in older[:max(0, len(older) - self.keep)]:
+            shutil.rmtree(self.path(generation), ignore_errors=True)
+            logger.info(f"Removed old index generation {generation}")
+
+    def rollback(self) -> Optional[str]:
+        """1つ前の世代に戻し、その世代IDを返す（戻せる世代がなければNone）"""
+        self._acquire()
+        try:
+            current = self.current()
+            generations = self.list()
+            if current not in generations or generations.index(current) == 0:
+                return None
+            previous = generations[generations.index(current) - 1]
+            self._write_current(previous)
+            logger.info(f"Rolled back index generation {current} -> {previous}")
+            return previous
+        finally:
+            self._release()
+
+
+class GenerationWatcher:
+    """CURRENTの変化を定期的に確認し、変わったらon_change(世代ID)を呼ぶバックグラウンドスレッド"""
+
+    def __init__(self, generations: IndexGenerations, on_change: Callable[[Optional[str]], None],
+                 interval: float = 30.0, generation: Optional[str] = None):
+        self.generations = generations
+        self.on_change = on_change
+        self.interval = interval
+        self.generation = generation
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='index-generation-watcher', daemon=True)
+
+    def start(self) -> 'GenerationWatcher':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            generation = self.generations.current()
+            if generation == self.generation:
+                continue
+            try:
+                self.on_change(generation)
+                self.generation = generation
+            except Exception as e:
+                # 読み込みに失敗した場合は現在の世代のまま、次の確認で再試行する
+                logger.error(f"Error switching to index generation {generation}: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    args = sys.argv[2:]
+    target = args.pop(0) if command == 'discard' and args else None
+    generations = IndexGenerations(args[0] if args else './chroma_db')
+
+    if command == 'rollback':
+        previous = generations.rollback()
+        print(f"Rolled back to {previous}" if previous else "No previous generation to roll back to")
+    elif command == 'discard':
+        # ロールバックで戻す前の世代など、現在の世代以外を明示的に削除する
+        if target is None or target == generations.current():
+            print("Specify a generation other than the current one")
+        else:
+            generations.discard(target)
+            print(f"Discarded {target}")
+    else:
+        current = generations.current()
+        for generation in generations.list():
+            print(f"{'*' if generation == current else ' '} {generation}")
@@ -0,0 +1,233 @@
+"""
+ベクトルストアの冪等な更新
+チャンクに決定的なID（記事URL・チャンク番号・本文ハッシュ）を付け、
+変化したチャンクだけを追加し、変更・削除された記事の古いチャンクを削除します。
+同じ記事を何度インデックス化しても、インデックスの件数は記事の件数に比例したままになります。
+本文が同じでもタイトル・カテゴリなどのメタデータが変わったチャンクは、埋め込み直さずにメタデータだけを書き換えます。
+"""
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Chromaから一度に読み出す・削除する件数
+PAGE_SIZE = 1000
+# チャンクが属するカテゴリごとに立てるメタデータのキーの接頭辞（Chromaのメタデータはリストを持てないため）
+CATEGORY_KEY_PREFIX = 'category:'
+# 変化を判定するメタデータのキー（カテゴリの所属のキーは接頭辞で判定）
+SEARCH_METADATA_KEYS = ('title', 'url', 'category', 'chunk', 'chunk_id')
+
+
+def category_key(category: str) -> str:
+    """カテゴリの所属を表すメタデータのキー（値はTrue）"""
+    return CATEGORY_KEY_PREFIX + category
+
+
+def article_categories(article: Dict) -> List[str]:
+    """記事のカテゴリ（複数のカテゴリに属する記事はcategoriesのすべて、それ以外はcategory）"""
+    categories = article.get('categories') or [article.get('category')]
+    return list(dict.fromkeys(category for category in categories if category))
+
+
+def category_metadata(article: Dict) -> Dict:
+    """チャンクのカテゴリのメタデータ（category: 代表のカテゴリ、category:<名前>: 属するすべてのカテゴリ）"""
+    categories = article_categories(article)
+    metadata = {'category': categories[0] if categories else ''}
+    metadata.update((category_key(category), True) for category in categories)
+    return metadata
+
+
+def chunk_categories(metadata: Optional[Dict]) -> List[str]:
+    """チャンクが属するカテゴリ（所属のキーを持たない以前のチャンクはcategoryのみ）"""
+    metadata = metadata or {}
+    categories = [key[len(CATEGORY_KEY_PREFIX):] for key, value in metadata.items()
+                  if key.startswith(CATEGORY_KEY_PREFIX) and value]
+    if not categories and metadata.get('category'):
+        return [metadata['category']]
+    return categories
+
+
+def search_metadata(metadata: Optional[Dict]) -> Dict:
+    """
+    検索結果や絞り込みに使うメタデータ（タイトル・URL・カテゴリ・チャンク番号）。
+    crawled_atのようにクロールのたびに変わる値は含めない。
+    """
+    return {key: value for key, value in (metadata or {}).items()
+            if key in SEARCH_METADATA_KEYS or key.startswith(CATEGORY_KEY_PREFIX)}
+
+
+def chunk_id(url: str, ordinal: int, text: str) -> str:
+    """チャンクのID（URLのハッシュ-チャンク番号-本文のハッシュ）"""
+    url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return f"{url_hash}-{ordinal}-{text_hash}"
+
+
+def assign_chunk_ids(chunks: List) -> List[str]:
+    """記事ごとにチャンク番号を振り、IDをメタデータにも記録して返す（chunksは記事内の順序どおりであること）"""
+    ordinals: Dict[str, int] = defaultdict(int)
+    ids = []
+    for chunk in chunks:
+        url = chunk.metadata.get('url', '')
+        ordinal = ordinals[url]
+        ordinals[url] += 1
+        cid = chunk_id(url, ordinal, chunk.page_content)
+        chunk.metadata['chunk'] = ordinal
+        chunk.metadata['chunk_id'] = cid
+        ids.append(cid)
+    return ids
+
+
+def existing_chunks(vectorstore, urls: Iterable[str]) -> Dict[str, Dict]:
+    """指定した記事URLのチャンクとして保存済みのIDとメタデータ"""
+    urls = list(urls)
+    if not urls:
+        return {}
+    result = vectorstore.get(where={'url': {'$in': urls}}, include=['metadatas'])
+    return {cid: meta or {} for cid, meta in zip(result['ids'], result['metadatas'])}
+
+
+def update_metadatas(vectorstore, ids: List[str], metadatas: List[Dict], stored: List[Dict]):
+    """保存済みのチャンクのメタデータを書き換える（埋め込みは計算し直さない）"""
+    if hasattr(vectorstore, '_collection'):
+        # Chromaのupdateは既存のメタデータとマージするため、なくなったキーはNoneで削除する
+        merged = [dict({key: None for key in old if key not in new}, **new) for new, old in zip(metadatas, stored)]
+        for start in range(0, len(ids), PAGE_SIZE):
+            vectorstore._collection.update(ids=ids[start:start + PAGE_SIZE], metadatas=merged[start:start + PAGE_SIZE])
+    else:
+        vectorstore.update_metadatas(ids, metadatas)
+
+
+def upsert_chunks(vectorstore, chunks: List, add_batch_size: Optional[int] = None,
+                  lexical_index=None) -> Tuple[int, int, Set[str]]:
+    """
+    チャンクを記事単位でベクトルストアと同期する。
+    未登録のIDのチャンクだけを追加（埋め込みを計算）し、同じ記事の不要になったチャンクは削除する。
+    登録済みのIDでもメタデータ（タイトル・カテゴリなど）が変わったチャンクは、メタデータだけを書き換える
+    （取得日時だけが変わったチャンクは書き換えない）。
+    add_batch_sizeを指定すると、その件数ずつ埋め込んで順にストアへ書き込む。
+    lexical_index（LexicalIndex）を渡すと、同じチャンクを転置インデックスにも反映する。
+
+    Returns:
+        (追加したチャンク数, 削除したチャンク数, 変化があった記事のURL)
+    """
+    ids = assign_chunk_ids(chunks)
+    existing = existing_chunks(vectorstore, {chunk.metadata.get('url', '') for chunk in chunks})
+
+    stale = set(existing) - set(ids)
+    changed_urls = set()
+
+    to_add = {}
+    to_update = {}
+    for cid, chunk in zip(ids, chunks):
+        if cid in existing:
+            if search_metadata(existing[cid]) != search_metadata(chunk.metadata) and cid not in to_update:
+                to_update[cid] = chunk
+                changed_urls.add(chunk.metadata.get('url', ''))
+        elif cid not in to_add:
+            to_add[cid] = chunk
+            changed_urls.add(chunk.metadata.get('url', ''))
+
+    if to_update:
+        update_ids = list(to_update)
+        update_metadatas(vectorstore, update_ids, [to_update[cid].metadata for cid in update_ids],
+                         [existing[cid] for cid in update_ids])
+        if lexical_index is not None:
+            lexical_index.update_categories(update_ids, (chunk_categories(to_update[cid].metadata)
+                                                         for cid in update_ids))
+
+    if stale:
+        changed_urls.update(existing[cid].get('url', '') for cid in stale)
+        delete_chunks(vectorstore, stale, lexical_index)
+    # 長さの近いチャンクが同じバッチに入るよう、長い順に追加する
+    ids_to_add = sorted(to_add, key=lambda cid: len(to_add[cid].page_content), reverse=True)
+    docs_to_add = [to_add[cid] for cid in ids_to_add]
+    step = add_batch_size or len(ids_to_add) or 1
+    for start in range(0, len(ids_to_add), step):
+        vectorstore.add_documents(docs_to_add[start:start + step], ids=ids_to_add[start:start + step])
+        if lexical_index is not None:
+            lexical_index.add(ids_to_add[start:start + step],
+                              (doc.page_content for doc in docs_to_add[start:start + step]),
+                              (chunk_categories(doc.metadata) for doc in docs_to_add[start:start + step]))
+    return len(to_add), len(stale), changed_urls
+
+
+def iter_chunk_metadata(vectorstore, page_size: int = PAGE_SIZE) -> Iterator[Tuple[str, Dict]]:
+    """保存済みの全チャンクの (ID, メタデータ) を順に返す"""
+    offset = 0
+    while True:
+        result = vectorstore.get(include=['metadatas'], limit=page_size, offset=offset)
+        ids = result['ids']
+        if not ids:
+            return
+        yield from zip(ids, result['metadatas'])
+        offset += len(ids)
+
+
+def delete_chunks(vectorstore, ids: Iterable[str], lexical_index=None, page_size: int = PAGE_SIZE) -> int:
+    ids = list(ids)
+    for start in range(0, len(ids), page_size):
+        vectorstore.delete(ids=ids[start:start + page_size])
+    if lexical_index is not None:
+        lexical_index.delete(ids)
+    return len(ids)
+
+
+def prune_removed(vectorstore, live_urls: Set[str], lexical_index=None) -> int:
+    """live_urlsに含まれない記事（サイトから削除された記事）のチャンクを削除し、削除数を返す"""
+    stale = [cid for cid, meta in iter_chunk_metadata(vectorstore) if (meta or {}).get('url') not in live_urls]
+    return delete_chunks(vectorstore, stale, lexical_index)
+
+
+def count_chunks(vectorstore) -> int:
+    """保存済みのチャンク数（ChromaとFlatIndexの両方に対応）"""
+    if hasattr(vectorstore, '_collection'):
+        return vectorstore._collection.count()
+    return vectorstore.count()
+
+
+def save_index(vectorstore, lexical_index=None):
+    """
+    書き込みを明示的に保存する必要があるストア（FlatIndex）なら保存する（Chromaは自動で永続化される）。
+    転置インデックスを渡した場合はあわせて保存する。
+    """
+    if hasattr(vectorstore, 'save'):
+        vectorstore.save()
+    if lexical_index is not None:
+        lexical_index.save()
+
+
+def validate_index(vectorstore, lexical_index=None):
+    """
+    新しい世代を有効化する前の検証（空でない・転置インデックスとチャンク数が一致する・検索できる）。
+    問題があればValueErrorを送出する。
+    """
+    count = count_chunks(vectorstore)
+    if count == 0:
+        raise ValueError("Index is empty")
+    if lexical_index is not None and lexical_index.count() != count:
+        raise ValueError(f"Lexical index has {lexical_index.count()} chunks, vector store has {count}")
+    # 保存済みのチャンク1件で検索できることを確認（埋め込みはキャッシュから取り出される）
+    sample = vectorstore.get(limit=1, include=['documents'])
+    vector = vectorstore.embeddings.embed_documents(sample['documents'])[0]
+    if not vectorstore.similarity_search_by_vector(vector, k=1):
+        raise ValueError("Probe search returned no results")
+
+
+def list_categories(vectorstore) -> List[Dict]:
+    """保存済みのチャンクのカテゴリと記事数（記事数の多い順、カテゴリなしは除く。複数のカテゴリの記事はそれぞれに数える）"""
+    urls: Dict[str, Set[str]] = defaultdict(set)
+    for _, meta in iter_chunk_metadata(vectorstore):
+        for category in chunk_categories(meta):
+            urls[category].add(meta.get('url', ''))
+    return [
+        {'name': category, 'count': len(urls[category])}
+        for category in sorted(urls, key=lambda c: (-len(urls[c]), c))
+    ]
+
+
+def has_legacy_chunks(vectorstore) -> bool:
+    """決定的なIDやカテゴリの所属のキーを持たない（以前の方式で追加された）チャンクが残っているか"""
+    return any(
+        'chunk_id' not in (meta or {}) or (meta.get('category') and category_key(meta['category']) not in meta)
+        for _, meta in iter_chunk_metadata(vectorstore)
+    )
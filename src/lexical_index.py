@@ -0,0 +1,279 @@
+"""
+文字n-gramの転置インデックス（BM25）
+チャンク本文の文字バイグラム・トライグラムの転置インデックスをメモリ上に持ち、
+「総務省」「一次代理店」のような日本語の語句に完全一致するチャンクをBM25で検索します。
+ベクトルインデックスと同じチャンクID・同じタイミングで追加・削除し、.npz に保存します。
+チャンクごとに属するカテゴリ（複数可）を持ち、カテゴリを指定した検索ではそのカテゴリのチャンクだけをスコアに残します。
+"""
+import logging
+import math
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .index_sync import chunk_categories
+except ImportError:
+    from index_sync import chunk_categories
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (2, 3)
+# 英数字・かな・漢字の連続（記号と空白で区切る）
+TOKEN_RUN = re.compile(r'\w+')
+# ベクトルストアから再構築するときに一度に読み出す件数
+PAGE_SIZE = 1000
+# category_namesの1要素に複数のカテゴリを並べるときの区切り
+CATEGORY_SEPARATOR = '\n'
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = NGRAM_SIZES) -> Counter:
+    """正規化した本文の文字n-gramの出現回数（n-gramより短い語はそのまま使う）"""
+    grams = Counter()
+    for run in TOKEN_RUN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if len(run) < min(sizes):
+            grams[run] += 1
+            continue
+        for n in sizes:
+            for i in range(len(run) - n + 1):
+                grams[run[i:i + n]] += 1
+    return grams
+
+
+class LexicalIndex:
+    """チャンクIDをキーにした文字n-gramのBM25インデックス（削除は墓標を立て、保存時に詰める）"""
+
+    def __init__(self, filepath: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            filepath: 保存先（.npz）
+            k1: BM25の語の出現回数の飽和パラメータ
+            b: BM25の文書長の正規化パラメータ
+        """
+        self.filepath = filepath
+        self.k1 = k1
+        self.b = b
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.lengths = array('I')
+        self.alive = bytearray()
+        self.total_length = 0
+        # チャンクのカテゴリ（category_namesの番号。category_namesの要素は属するカテゴリをCATEGORY_SEPARATORで連結したもの）
+        self.category_codes = array('H')
+        self.category_names: List[str] = []
+        # n-gram -> (チャンクの行番号, 出現回数)
+        self.docs: Dict[str, array] = {}
+        self.tfs: Dict[str, array] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.filepath):
+            return
+        try:
+            with np.load(self.filepath, allow_pickle=False) as data:
+                ids = data['ids'].tolist()
+                lengths = data['lengths']
+                terms = data['terms'].tolist()
+                offsets = data['offsets']
+                docs = data['docs']
+                tfs = data['tfs']
+                category_codes = data['category_codes']
+                category_names = data['category_names'].tolist()
+        except KeyError:
+            # カテゴリを持たない以前の形式は読み込まず、syncでベクトルストアから作り直す
+            logger.info(f"Lexical index {self.filepath} has no categories, rebuilding")
+            return
+        except Exception as e:
+            logger.error(f"Error loading lexical index from {self.filepath}: {e}")
+            return
+
+        self.ids = ids
+        self.rows = {cid: row for row, cid in enumerate(ids)}
+        self.lengths = array('I', lengths.astype(np.uint32).tobytes())
+        self.alive = bytearray(b'\x01' * len(ids))
+        self.total_length = int(lengths.sum())
+        self.category_codes = array('H', category_codes.astype(np.uint16).tobytes())
+        self.category_names = category_names
+        for i, term in enumerate(terms):
+            start, end = offsets[i], offsets[i + 1]
+            self.docs[term] = array('i', docs[start:end].tobytes())
+            self.tfs[term] = array('H', tfs[start:end].tobytes())
+        logger.info(f"Loaded lexical index ({len(ids)} chunks, {len(terms)} n-grams) from {self.filepath}")
+
+    def count(self) -> int:
+        return len(self.rows)
+
+    def _category_code(self, categories: Iterable[str]) -> int:
+        """チャンクが属するカテゴリ（1つの場合は文字列も可）の組み合わせの番号"""
+        if isinstance(categories, str):
+            categories = [categories]
+        name = CATEGORY_SEPARATOR.join(sorted({category for category in categories if category}))
+        if name not in self.category_names:
+            self.category_names.append(name)
+        return self.category_names.index(name)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str], categories: Optional[Iterable[Iterable[str]]] = None):
+        """チャンクを追加（登録済みのIDは無視、categoriesはチャンクごとの属するカテゴリ）"""
+        ids, texts = list(ids), list(texts)
+        categories = [[] for _ in ids] if categories is None else list(categories)
+        for cid, text, category in zip(ids, texts, categories):
+            if cid in self.rows:
+                continue
+            row = len(self.ids)
+            grams = char_ngrams(text)
+            length = sum(grams.values())
+            self.ids.append(cid)
+            self.rows[cid] = row
+            self.lengths.append(length)
+            self.alive.append(1)
+            self.category_codes.append(self._category_code(category))
+            self.total_length += length
+            for term, tf in grams.items():
+                if term not in self.docs:
+                    self.docs[term] = array('i')
+                    self.tfs[term] = array('H')
+                self.docs[term].append(row)
+                self.tfs[term].append(min(tf, 0xFFFF))
+            self.dirty = True
+
+    def update_categories(self, ids: Iterable[str], categories: Iterable[Iterable[str]]):
+        """登録済みのチャンクの属するカテゴリを置き換える"""
+        for cid, category in zip(ids, categories):
+            row = self.rows.get(cid)
+            if row is None:
+                continue
+            code = self._category_code(category)
+            if self.category_codes[row] != code:
+                self.category_codes[row] = code
+                self.dirty = True
+
+    def delete(self, ids: Iterable[str]):
+        for cid in ids:
+            row = self.rows.pop(cid, None)
+            if row is None:
+                continue
+            self.alive[row] = 0
+            self.total_length -= self.lengths[row]
+            self.ids[row] = None
+            self.dirty = True
+
+    def clear(self):
+        self.ids, self.rows = [], {}
+        self.lengths, self.alive = array('I'), bytearray()
+        self.total_length = 0
+        self.category_codes, self.category_names = array('H'), []
+        self.docs, self.tfs = {}, {}
+        self.dirty = True
+
+    def search(self, query: str, k: int = 20,
+               categories: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """BM25の上位k件の (チャンクID, スコア)（categoriesを指定するとそのカテゴリのチャンクだけ）"""
+        live = len(self.rows)
+        if not live:
+            return []
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32).astype(np.float32)
+        norms = self.k1 * (1 - self.b + self.b * lengths / (self.total_length / live))
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+
+        for term in char_ngrams(query):
+            if term not in self.docs:
+                continue
+            docs = np.frombuffer(self.docs[term], dtype=np.int32)
+            tfs = np.frombuffer(self.tfs[term], dtype=np.uint16).astype(np.float32)
+            # 削除済みのチャンクも文書頻度に含まれる（保存時に詰めると正確になる）
+            df = min(len(docs), live)
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            # 同じn-gramの行番号は重複しないので、ファンシーインデックスで加算できる
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+
+        scores *= np.frombuffer(self.alive, dtype=np.uint8)
+        if categories is not None:
+            codes = [i for i, name in enumerate(self.category_names)
+                     if any(category in categories for category in name.split(CATEGORY_SEPARATOR))]
+            scores *= np.isin(np.frombuffer(self.category_codes, dtype=np.uint16), codes)
+        hits = int(np.count_nonzero(scores))
+        k = min(k, hits)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def _compact(self) -> Tuple[List[str], np.ndarray, np.ndarray, List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """削除済みのチャンクを除き、行番号を詰めたCSR形式の配列を作る"""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        ids = [cid for cid in self.ids if cid is not None]
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)[alive]
+        category_codes = np.frombuffer(self.category_codes, dtype=np.uint16)[alive]
+
+        terms, offsets, doc_parts, tf_parts = [], [0], [], []
+        for term in sorted(self.docs):
+            docs = np.frombuffer(self.docs[term], dtype=np.int32)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            terms.append(term)
+            doc_parts.append(remap[docs[keep]].astype(np.int32))
+            tf_parts.append(np.frombuffer(self.tfs[term], dtype=np.uint16)[keep])
+            offsets.append(offsets[-1] + int(keep.sum()))
+
+        docs = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32)
+        tfs = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.uint16)
+        return ids, lengths, category_codes, terms, np.asarray(offsets, dtype=np.int64), docs, tfs
+
+    def save(self):
+        """変更があればディスクに書き出す（一時ファイル経由で置き換え）"""
+        if not self.dirty:
+            return
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            ids, lengths, category_codes, terms, offsets, docs, tfs = self._compact()
+            tmp_path = self.filepath + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    ids=np.asarray(ids, dtype=str),
+                    lengths=lengths,
+                    category_codes=category_codes,
+                    category_names=np.asarray(self.category_names, dtype=str),
+                    terms=np.asarray(terms, dtype=str),
+                    offsets=offsets,
+                    docs=docs,
+                    tfs=tfs
+                )
+            os.replace(tmp_path, self.filepath)
+            self.dirty = False
+            logger.info(f"Saved lexical index ({len(ids)} chunks, {len(terms)} n-grams) to {self.filepath}")
+        except Exception as e:
+            logger.error(f"Error saving lexical index: {e}")
+
+    def sync(self, vectorstore, page_size: int = PAGE_SIZE) -> bool:
+        """
+        ベクトルストアとチャンク数が一致しない場合（初回・以前のバージョンのインデックス）に、
+        ベクトルストアの全チャンクから作り直す。作り直した場合はTrueを返す。
+        """
+        result = vectorstore.get(include=[])
+        stored = result['ids']
+        if len(stored) == self.count() and all(cid in self.rows for cid in stored):
+            return False
+
+        logger.info(f"Rebuilding lexical index from {len(stored)} stored chunks...")
+        self.clear()
+        offset = 0
+        while True:
+            page = vectorstore.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.add(page['ids'], page['documents'], (chunk_categories(meta) for meta in page['metadatas']))
+            offset += len(page['ids'])
+        self.save()
+        return True
@@ -0,0 +1,189 @@
+"""
+ONNX Runtimeによる埋め込み（CPU向け）
+Sentence Transformersのモデルを初回にONNX形式へ書き出し（quantize=Trueの場合はint8に動的量子化し）、
+以降はPyTorchを使わずにONNX Runtimeで埋め込みます。書き出したモデルは cache_dir に保存して再利用します。
+プーリングと正規化はSentence Transformersと同じ処理をNumPyで行います。
+"""
+import json
+import logging
+import os
+import shutil
+from typing import List
+
+import numpy as np
+
+try:
+    from .embedding_pipeline import BatchedSentenceEmbeddings
+except ImportError:
+    from embedding_pipeline import BatchedSentenceEmbeddings
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = 'model.onnx'
+QUANTIZED_FILE = 'model.int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+CONFIG_FILE = 'config.json'
+INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+
+def export_directory(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, model_name.replace('/', '__'))
+
+
+def export_model(model_name: str, directory: str, opset: int = 14):
+    """
+    Sentence Transformersのモデルを directory に書き出す（model.onnx・tokenizer.json・config.json）。
+    書き出しにはPyTorchとsentence-transformersが必要（埋め込み時には不要）。
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer, pooling = model[0], model[1]
+    if getattr(pooling, 'pooling_mode_mean_tokens', False):
+        pooling_mode = 'mean'
+    elif getattr(pooling, 'pooling_mode_cls_token', False):
+        pooling_mode = 'cls'
+    else:
+        raise ValueError(f"Unsupported pooling for ONNX export: {pooling.get_pooling_mode_str()}")
+
+    tokenizer = transformer.tokenizer
+    names = [name for name in INPUT_NAMES if name in tokenizer.model_input_names]
+
+    class Encoder(torch.nn.Module):
+        """位置引数で受け取った入力をTransformerに渡し、最終層の隠れ状態を返す"""
+
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(names, inputs)))[0]
+
+    tmp_directory = directory + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    sample = tokenizer(['ONNX export sample'], return_tensors='pt')
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(transformer.auto_model.eval()),
+            tuple(sample[name] for name in names),
+            os.path.join(tmp_directory, MODEL_FILE),
+            input_names=names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    tokenizer.backend_tokenizer.save(os.path.join(tmp_directory, TOKENIZER_FILE))
+    with open(os.path.join(tmp_directory, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': model_name,
+            'inputs': names,
+            'pooling': pooling_mode,
+            'max_length': model.max_seq_length,
+            'pad_id': tokenizer.pad_token_id,
+            'pad_token': tokenizer.pad_token,
+            'dimension': model.get_sentence_embedding_dimension(),
+        }, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    logger.info(f"Exported {model_name} to {directory}")
+
+
+def quantize_model(directory: str):
+    """model.onnx の重みをint8に動的量子化した model.int8.onnx を作る"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = os.path.join(directory, 'model.int8.tmp.onnx')
+    quantize_dynamic(os.path.join(directory, MODEL_FILE), tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, os.path.join(directory, QUANTIZED_FILE))
+    logger.info(f"Quantized {directory}/{MODEL_FILE} to int8")
+
+
+class OnnxSentenceEmbeddings(BatchedSentenceEmbeddings):
+    """ONNX Runtimeで埋め込むBatchedSentenceEmbeddings（長さ順のバッチ分けはそのまま使う）"""
+
+    def __init__(self, model_name: str, batch_size: int = 64, quantize: bool = False, threads: int = 0,
+                 cache_dir: str = 'data/onnx_models', normalize_embeddings: bool = True):
+        """
+        Args:
+            model_name: Sentence Transformersのモデル名
+            batch_size: 1回の推論に渡すチャンク数
+            quantize: Trueの場合はint8に動的量子化したモデルを使う
+            threads: ONNX Runtimeの演算スレッド数（0: ONNX Runtimeの既定値＝物理コア数）
+            cache_dir: 書き出したモデルの保存先
+            normalize_embeddings: ベクトルを正規化するか
+        """
+        super().__init__(model_name, batch_size=batch_size, processes=0, device='cpu',
+                         normalize_embeddings=normalize_embeddings)
+        self.source_model = model_name
+        # 埋め込みキャッシュのキー（int8はベクトルがわずかに変わるため別のモデルとして扱う）
+        if quantize:
+            self.model_name = f"{model_name}#onnx-int8"
+        self.quantize = quantize
+        self.threads = threads
+        self.directory = export_directory(cache_dir, model_name)
+        self.config = None
+        self._tokenizer = None
+
+    @property
+    def model(self):
+        """ONNX Runtimeのセッション（初回の埋め込み時に読み込み、書き出していなければ書き出す）"""
+        if self._model is None:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            if not os.path.exists(os.path.join(self.directory, CONFIG_FILE)):
+                logger.info(f"Exporting {self.source_model} to ONNX...")
+                export_model(self.source_model, self.directory)
+            model_path = os.path.join(self.directory, QUANTIZED_FILE if self.quantize else MODEL_FILE)
+            if self.quantize and not os.path.exists(model_path):
+                quantize_model(self.directory)
+
+            with open(os.path.join(self.directory, CONFIG_FILE), 'r', encoding='utf-8') as f:
+                self.config = json.load(f)
+            tokenizer = Tokenizer.from_file(os.path.join(self.directory, TOKENIZER_FILE))
+            tokenizer.enable_truncation(max_length=self.config['max_length'])
+            tokenizer.enable_padding(pad_id=self.config['pad_id'], pad_token=self.config['pad_token'])
+            self._tokenizer = tokenizer
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            self._model = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+            logger.info(f"Loaded ONNX model {model_path} (threads={self.threads or 'auto'})")
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        session = self.model
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + self.batch_size])
+            inputs = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = session.run(None, {name: inputs[name] for name in self.config['inputs']})[0]
+            outputs.append(self._pool_hidden(hidden, inputs['attention_mask']))
+        if not outputs:
+            return np.zeros((0, self.config['dimension']), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def _pool_hidden(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Sentence TransformersのPooling・Normalizeと同じ計算"""
+        if self.config['pooling'] == 'cls':
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize_embeddings:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text.replace('\n', ' ')])[0].tolist()
@@ -0,0 +1,111 @@
+"""
+取得・解析パイプライン
+ネットワーク取得（スレッド）とHTML解析（プロセス）を分離し、
+有界キューで取得済みページの滞留量を制限します。
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 取得ステージの終了を示す目印
+_DONE = object()
+
+
+class FetchParsePipeline:
+    def __init__(self, fetch: Callable[[Any], Tuple[Any, Any]],
+                 parse: Callable[[Any], Any],
+                 fetch_workers: int = 4, parse_workers: int = 2,
+                 max_pending: Optional[int] = None):
+        """
+        Args:
+            fetch: 取得関数。(取得結果, 解析する入力（バイト列など）) を返す。入力がNoneなら解析しない
+            parse: 解析関数。子プロセスで実行するためpickle可能なトップレベル関数であること
+            fetch_workers: 取得スレッド数
+            parse_workers: 解析プロセス数
+            max_pending: 解析待ちで保持するページ数の上限（超えると取得を一時停止）
+        """
+        self.fetch = fetch
+        self.parse = parse
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.max_pending = max_pending or parse_workers * 4
+
+    def _produce(self, items: Iterable, raw_queue: queue.Queue, stop: threading.Event):
+        """取得ステージ：取得したページを有界キューへ積む（満杯なら空くまで待つ）"""
+        def put(entry):
+            while not stop.is_set():
+                try:
+                    raw_queue.put(entry, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def fetch_task(item):
+            try:
+                fetched, content = self.fetch(item)
+            except Exception as e:
+                logger.error(f"Error fetching {item}: {e}")
+                fetched, content = None, None
+            put((item, fetched, content))
+
+        # 投入済みの取得タスクも制限し、未処理のFutureが増え続けないようにする
+        slots = threading.BoundedSemaphore(self.fetch_workers * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+                for item in items:
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    future = executor.submit(fetch_task, item)
+                    future.add_done_callback(lambda _: slots.release())
+        finally:
+            put(_DONE)
+
+    def run(self, items: Iterable) -> Iterator[Tuple[Any, Any, Any]]:
+        """(要素, 取得結果, 解析結果) を解析が完了した順に返す"""
+        raw_queue: queue.Queue = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(items, raw_queue, stop), daemon=True)
+        producer.start()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+                pending = {}
+                fetching = True
+
+                while fetching or pending:
+                    # 解析中のタスクが上限未満ならキューから取り出して投入
+                    while fetching and len(pending) < self.parse_workers * 2:
+                        try:
+                            entry = raw_queue.get(timeout=0.05 if pending else None)
+                        except queue.Empty:
+                            break
+                        if entry is _DONE:
+                            fetching = False
+                            break
+
+                        item, fetched, content = entry
+                        if content is None:
+                            yield item, fetched, None
+                        else:
+                            pending[executor.submit(self.parse, content)] = (item, fetched)
+
+                    if pending:
+                        done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            item, fetched = pending.pop(future)
+                            try:
+                                parsed = future.result()
+                            except Exception as e:
+                                logger.error(f"Error parsing {item}: {e}")
+                                parsed = None
+                            yield item, fetched, parsed
+        finally:
+            stop.set()
+            producer.join(timeout=1)
@@ -0,0 +1,225 @@
+"""
+クロール用のレートリミッター
+ホストごとのトークンバケットでリクエスト間隔を制御します。
+AdaptiveThrottleはサーバーの応答に応じてレートを自動調整します（AIMD）。
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッター（スレッドセーフ）"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 1秒あたりに補充されるトークン数（=許可するリクエスト数）
+            capacity: バケットの最大容量（バースト許容量）
+        """
+        if rate <= 0:
+            raise ValueError("rateは正の値である必要があります")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def set_rate(self, rate: float):
+        """補充レートを変更する（それまでに貯まったトークンは旧レートで計算）"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """トークンを取得する。不足している場合は補充されるまで待機し、待機秒数を返す"""
+        with self.lock:
+            self._refill(time.monotonic())
+            # 先にトークンを予約し、ロック外で待機する
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """ホストごとにトークンバケットを管理するレートリミッター"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+        # ホストごとの初期レート（未設定のホストはrateを使う）
+        self.host_rates: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        """URLのホストに対応するバケットを取得（なければ作成）"""
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.host_rates.get(host, self.rate), self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        """URLのホストに対するリクエスト許可を取得"""
+        return self.get_bucket(url).acquire()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveThrottle(HostRateLimiter):
+    """
+    サーバーの応答に応じてホストごとのリクエストレートを調整するスロットル。
+    正常な応答が続く間はレートを加算的に上げ（additive increase）、
+    429・5xxやRetry-Afterを受けたら乗算的に下げる（multiplicative decrease）。
+    robots.txtのCrawl-delayがあれば、それを上限レートとして守る。
+    """
+
+    def __init__(self, rate: float = 1.0, min_rate: float = 0.1, max_rate: float = 8.0,
+                 increase: float = 0.1, decrease_factor: float = 0.5,
+                 latency_threshold: float = 2.0,
+                 robots_fetcher: Optional[Callable[[str], Optional[str]]] = None,
+                 user_agent: str = '*'):
+        """
+        Args:
+            rate: 初期レート（1秒あたりのリクエスト数）
+            min_rate: 下限レート
+            max_rate: 上限レート
+            increase: 正常応答1回あたりのレート増分
+            decrease_factor: 429・5xx時にレートに掛ける係数
+            latency_threshold: これより遅い応答ではレートを上げない（秒）
+            robots_fetcher: robots.txtの本文を返す関数（Noneの場合はrobots.txtを確認しない）
+            user_agent: Crawl-delayを確認するユーザーエージェント
+        """
+        # バーストさせず、レートどおりの間隔で送る
+        super().__init__(rate, capacity=1.0)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.robots_fetcher = robots_fetcher
+        self.user_agent = user_agent
+        self.host_max_rates: Dict[str, float] = {}
+        # 設定で指定されたホストごとの上限レート（robots.txtのCrawl-delayでさらに下げることがある）
+        self.host_rate_limits: Dict[str, float] = {}
+        self.paused_until: Dict[str, float] = {}
+
+    def configure_host(self, url: str, rate: Optional[float] = None, max_rate: Optional[float] = None):
+        """URLのホストに個別の初期レート・上限レートを設定する（最初のリクエストより前に呼ぶ）"""
+        host = urlparse(url).netloc
+        with self.lock:
+            if rate:
+                self.host_rates[host] = rate
+            if max_rate:
+                self.host_rate_limits[host] = max_rate
+
+    def _load_crawl_delay(self, host: str, url: str) -> float:
+        """robots.txtのCrawl-delayからホストの上限レートを決める"""
+        max_rate = self.host_rate_limits.get(host, self.max_rate)
+        if self.robots_fetcher is None:
+            return max_rate
+
+        parts = urlparse(url)
+        robots_url = f"{parts.scheme}://{host}/robots.txt"
+        try:
+            text = self.robots_fetcher(robots_url)
+            if text:
+                parser = RobotFileParser()
+                parser.parse(text.splitlines())
+                delay = parser.crawl_delay(self.user_agent)
+                if delay:
+                    max_rate = min(max_rate, 1.0 / float(delay))
+                    logger.info(f"robots.txt Crawl-delay for {host}: {delay}s")
+        except Exception as e:
+            logger.warning(f"Could not read {robots_url}: {e}")
+        return max_rate
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self.lock:
+            known = host in self.host_max_rates
+        if not known:
+            # robots.txtの取得はロック外で行う
+            max_rate = self._load_crawl_delay(host, url)
+            with self.lock:
+                self.host_max_rates.setdefault(host, max_rate)
+
+        bucket = super().get_bucket(url)
+        max_rate = self.host_max_rates[host]
+        if bucket.rate > max_rate:
+            bucket.set_rate(max_rate)
+        return bucket
+
+    def acquire(self, url: str) -> float:
+        """Retry-Afterで停止中なら再開時刻まで待ってから、リクエスト許可を取得"""
+        host = urlparse(url).netloc
+        waited = 0.0
+        pause = self.paused_until.get(host, 0.0) - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        return waited + self.get_bucket(url).acquire()
+
+    def record(self, url: str, status_code: int, elapsed: float, retry_after: Optional[float] = None) -> float:
+        """応答結果を記録してホストのレートを調整し、新しいレートを返す"""
+        host = urlparse(url).netloc
+        bucket = self.get_bucket(url)
+        max_rate = self.host_max_rates[host]
+
+        with self.lock:
+            rate = bucket.rate
+            if status_code == 429 or status_code >= 500 or retry_after:
+                rate = max(self.min_rate, rate * self.decrease_factor)
+                if retry_after:
+                    self.paused_until[host] = max(self.paused_until.get(host, 0.0),
+                                                  time.monotonic() + retry_after)
+                logger.warning(f"Throttling {host}: status={status_code}, "
+                               f"retry_after={retry_after}, rate={rate:.2f}/s")
+            elif elapsed < self.latency_threshold:
+                rate = min(max_rate, rate + self.increase)
+        bucket.set_rate(rate)
+        return rate
+
+    def observe(self, url: str, response) -> float:
+        """requestsのレスポンスからレートを調整"""
+        # トランスポートのリトライで吸収された429・5xxもレート調整に反映する
+        retries = getattr(getattr(response, 'raw', None), 'retries', None)
+        for attempt in getattr(retries, 'history', None) or ():
+            if attempt.status and (attempt.status == 429 or attempt.status >= 500):
+                self.record(url, attempt.status, 0.0)
+
+        retry_after = None
+        if response.status_code in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        return self.record(url, response.status_code, response.elapsed.total_seconds(), retry_after)
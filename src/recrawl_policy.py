@@ -0,0 +1,168 @@
+"""
+記事ごとの再クロール方針
+記事ごとに取得のたびの本文ハッシュを記録し、変更が多い記事は短い間隔で、
+変更のない記事は長い間隔で再取得します。1日あたりのリクエスト数の上限も守ります。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 3600
+
+
+def content_hash(article: Dict) -> str:
+    """記事のタイトルと本文のハッシュ"""
+    text = f"{article.get('title', '')}\n{article.get('content', '')}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ChangeHistory:
+    """URLごとの取得履歴（取得時刻と本文ハッシュ）と、直近24時間のリクエスト数"""
+    # URLごとに保持する履歴の件数
+    MAX_ENTRIES = 20
+
+    def __init__(self, filepath: str = 'data/change_history.json'):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        data = self._load()
+        self.entries: Dict[str, Dict] = data.get('entries', {})
+        self.fetch_log = data.get('fetch_log', [])
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading change history: {e}")
+            return {}
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(url)
+            return dict(entry) if entry else None
+
+    def record(self, url: str, digest: str, now: Optional[float] = None) -> Dict:
+        """取得結果を記録し、更新後のエントリを返す（'changed'に前回からの変化の有無を入れる）"""
+        now = now or time.time()
+        with self.lock:
+            entry = self.entries.setdefault(url, {'hashes': []})
+            hashes = entry['hashes']
+            changed = bool(hashes) and hashes[-1][1] != digest
+            hashes.append([now, digest])
+            del hashes[:-self.MAX_ENTRIES]
+            entry['last_checked'] = now
+            if changed or 'last_changed' not in entry:
+                entry['last_changed'] = now
+            entry['changed'] = changed
+            self.fetch_log.append(now)
+            return dict(entry)
+
+    def set_interval(self, url: str, interval: float):
+        with self.lock:
+            if url in self.entries:
+                self.entries[url]['interval'] = interval
+
+    def fetches_since(self, since: float) -> int:
+        """since以降に記録した取得の回数"""
+        with self.lock:
+            self.fetch_log = [t for t in self.fetch_log if t >= since]
+            return len(self.fetch_log)
+
+    def save(self):
+        """履歴をディスクに書き出す（一時ファイル経由で置き換え）"""
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with self.lock:
+                data = json.dumps({'entries': self.entries, 'fetch_log': self.fetch_log})
+
+            tmp_path = self.filepath + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.filepath)
+        except Exception as e:
+            logger.error(f"Error saving change history: {e}")
+
+
+class RecrawlPolicy:
+    """
+    変更履歴に応じて記事ごとの再取得間隔を調整する方針。
+    変化があれば間隔を半分に、なければbackoff倍に延ばし、[min_interval, max_interval] に収める。
+    """
+
+    def __init__(self, history: Optional[ChangeHistory] = None,
+                 min_interval_hours: float = 6, max_interval_hours: float = 24 * 14,
+                 initial_interval_hours: float = 24, backoff: float = 1.5,
+                 daily_budget: int = 500):
+        """
+        Args:
+            history: 取得履歴
+            min_interval_hours: 再取得間隔の下限
+            max_interval_hours: 再取得間隔の上限
+            initial_interval_hours: 初めて取得した記事の再取得間隔
+            backoff: 変化がなかったときに間隔に掛ける係数
+            daily_budget: 直近24時間に許可する記事の取得回数
+        """
+        self.history = history or ChangeHistory()
+        self.min_interval = min_interval_hours * 3600
+        self.max_interval = max_interval_hours * 3600
+        self.initial_interval = initial_interval_hours * 3600
+        self.backoff = backoff
+        self.daily_budget = daily_budget
+
+    def interval(self, entry: Dict) -> float:
+        return entry.get('interval', self.initial_interval)
+
+    def observe(self, url: str, article: Dict, now: Optional[float] = None) -> bool:
+        """取得した記事を記録して再取得間隔を調整し、前回から変化していればTrueを返す"""
+        entry = self.history.record(url, content_hash(article), now)
+        interval = self.interval(entry)
+        if entry['changed']:
+            interval = max(self.min_interval, interval / 2)
+        elif len(entry['hashes']) > 1:
+            interval = min(self.max_interval, interval * self.backoff)
+        self.history.set_interval(url, interval)
+        return entry['changed']
+
+    def select(self, urls: Iterable[str], now: Optional[float] = None) -> Set[str]:
+        """
+        今回取得するURLを決め、取得を見送るURLの集合を返す。
+        初めて見る記事は必ず取得し、残りの予算を再取得予定を過ぎた割合の大きい記事から割り当てる。
+        """
+        now = now or time.time()
+        remaining = self.daily_budget - self.history.fetches_since(now - DAY_SECONDS)
+
+        new_urls, due, deferred = [], [], set()
+        for url in urls:
+            entry = self.history.get(url)
+            if entry is None or 'last_checked' not in entry:
+                new_urls.append(url)
+                continue
+            interval = self.interval(entry)
+            overdue = (now - entry['last_checked']) / interval
+            if overdue >= 1.0:
+                due.append((overdue, url))
+            else:
+                deferred.add(url)
+
+        remaining -= len(new_urls)
+        due.sort(reverse=True)
+        selected = max(0, remaining)
+        deferred.update(url for _, url in due[selected:])
+
+        logger.info(f"Recrawl plan: {len(new_urls)} new, {min(selected, len(due))}/{len(due)} due articles, "
+                    f"{len(deferred)} deferred (budget left: {max(0, remaining)}/{self.daily_budget} per day)")
+        return deferred
+
+    def save(self):
+        self.history.save()
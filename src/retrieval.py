@@ -0,0 +1,177 @@
+"""
+質問の埋め込みをキャッシュする検索
+正規化した質問文ごとに埋め込みベクトルをLRUで保持し、同じ質問（サジェストのクリックなど）では
+埋め込みの計算（OpenAIへのリクエストやローカルモデルの推論）を省いてベクトル検索だけを行います。
+文字n-gramの転置インデックス（src/lexical_index.py）があれば、語句の一致による検索結果と
+ベクトル検索の結果をReciprocal Rank Fusionで統合します（ハイブリッド検索）。
+カテゴリを指定した検索では、どちらの検索もそのカテゴリのチャンクだけを対象にします。
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+try:
+    from .embedding_cache import normalize_text
+    from .index_sync import category_key
+except ImportError:
+    from embedding_cache import normalize_text
+    from index_sync import category_key
+
+logger = logging.getLogger(__name__)
+
+# 統合前に各検索から取り出す件数と、Reciprocal Rank Fusionの定数
+FETCH_K = 20
+RRF_K = 60
+
+
+def category_filter(category: Optional[str]) -> Optional[Dict]:
+    """カテゴリを絞り込むベクトルストアのwhere条件（複数のカテゴリに属するチャンクも含む。カテゴリなしはNone）"""
+    return {category_key(category): True} if category else None
+
+
+def document_key(doc: Document) -> str:
+    """統合時にチャンクを識別するキー（チャンクIDがなければ本文）"""
+    return doc.metadata.get('chunk_id') or doc.page_content
+
+
+def hybrid_search(vectorstore, lexical_index, query: str, query_vector: List[float], k: int = 4,
+                  fetch_k: int = FETCH_K, rrf_k: int = RRF_K, category: Optional[str] = None) -> List[Document]:
+    """ベクトル検索と転置インデックスの検索の順位をReciprocal Rank Fusionで統合した上位k件"""
+    dense = vectorstore.similarity_search_by_vector(query_vector, k=fetch_k, filter=category_filter(category))
+    lexical = lexical_index.search(query, k=fetch_k, categories={category} if category else None)
+
+    scores: Dict[str, float] = {}
+    documents = {}
+    for rank, doc in enumerate(dense):
+        key = document_key(doc)
+        documents[key] = doc
+        scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    for rank, (cid, _) in enumerate(lexical):
+        scores[cid] = scores.get(cid, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+    top = sorted(scores, key=scores.get, reverse=True)[:k]
+    # 転置インデックスだけで見つかったチャンクは本文とメタデータをストアから読み出す
+    missing = [key for key in top if key not in documents]
+    if missing:
+        result = vectorstore.get(ids=missing, include=['documents', 'metadatas'])
+        for cid, text, meta in zip(result['ids'], result['documents'], result['metadatas']):
+            documents[cid] = Document(page_content=text, metadata=meta or {})
+    return [documents[key] for key in top if key in documents]
+
+
+class QueryEmbeddingCache:
+    """件数上限つきのLRUキャッシュ（ttl秒を過ぎたエントリは使わない）"""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, vector: List[float]):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), vector)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class CachedQueryRetriever(BaseRetriever):
+    """
+    質問の埋め込みをキャッシュし、similarity_search_by_vector（とlexical_index）で検索するRetriever。
+    categoryを指定するとそのカテゴリのチャンクだけを検索する（scoped()でリクエストごとに作る）。
+    """
+
+    vectorstore: Any
+    cache: Any
+    lexical_index: Any = None
+    k: int = 4
+    category: Optional[str] = None
+
+    def embed_query(self, question: str) -> List[float]:
+        """正規化した質問文の埋め込み（キャッシュにあれば再計算しない）"""
+        key = normalize_text(question)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.vectorstore.embeddings.embed_query(key)
+            self.cache.put(key, vector)
+        return vector
+
+    def scoped(self, category: Optional[str]) -> 'CachedQueryRetriever':
+        """categoryに絞り込んで検索するRetriever（キャッシュは共有する）"""
+        if not category:
+            return self
+        return CachedQueryRetriever(vectorstore=self.vectorstore, cache=self.cache,
+                                    lexical_index=self.lexical_index, k=self.k, category=category)
+
+    def swap(self, vectorstore, lexical_index=None):
+        """新しい世代のインデックスに切り替える（検索中のリクエストは元のインデックスで完了する）"""
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # 検索の途中で世代が切り替わっても、同じ世代のベクトルストアと転置インデックスを使う
+        vectorstore, lexical_index = self.vectorstore, self.lexical_index
+        vector = self.embed_query(query)
+        if lexical_index is not None:
+            return hybrid_search(vectorstore, lexical_index, query, vector, k=self.k, category=self.category)
+        return vectorstore.similarity_search_by_vector(vector, k=self.k, filter=category_filter(self.category))
+
+
+def create_retriever(vectorstore, k: int = 4, cache: Optional[QueryEmbeddingCache] = None,
+                     lexical_index=None) -> CachedQueryRetriever:
+    """
+    チャットボット用のRetrieverを作成（lexical_indexを渡すとハイブリッド検索）。
+    キャッシュの件数は環境変数QUERY_CACHE_SIZE（0で無効）、有効期限はQUERY_CACHE_TTL_SECONDS（0で無期限）。
+    """
+    if cache is None:
+        ttl = float(os.getenv('QUERY_CACHE_TTL_SECONDS', '0'))
+        cache = QueryEmbeddingCache(maxsize=int(os.getenv('QUERY_CACHE_SIZE', '256')), ttl=ttl or None)
+    return CachedQueryRetriever(vectorstore=vectorstore, cache=cache, lexical_index=lexical_index, k=k)
@@ -6,10 +6,21 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 import logging
 import os
+import threading
 from dotenv import load_dotenv
 
-from crawler import JTBCSupportCrawler
-from vector_store import VectorStoreManager
+try:
+    from .crawl_engine import CrawlEngine
+    from .recrawl_policy import RecrawlPolicy
+    from .zendesk_api import ZendeskHelpCenterClient
+    from .article_store import JsonlArticleStore
+    from .vector_store import VectorStoreManager
+except ImportError:
+    from crawl_engine import CrawlEngine
+    from recrawl_policy import RecrawlPolicy
+    from zendesk_api import ZendeskHelpCenterClient
+    from article_store import JsonlArticleStore
+    from vector_store import VectorStoreManager
 
 load_dotenv()
 
@@ -21,29 +32,97 @@ class UpdateScheduler:
     def __init__(self, interval_hours: int = 24):
         self.interval_hours = interval_hours
         self.scheduler = BackgroundScheduler()
-        self.crawler = JTBCSupportCrawler()
+        # CRAWL_BACKEND=api の場合はHelp Center APIから取得する
+        if os.getenv('CRAWL_BACKEND', 'html') == 'api':
+            self.crawler = ZendeskHelpCenterClient()
+        else:
+            # CRAWL_SITESで指定したサイトを1つのエンジンで並行してクロールする
+            self.crawler = CrawlEngine(recrawl_policy=self.create_recrawl_policy())
+            if self.crawler.recrawl_policy:
+                # 記事ごとの再取得間隔で判断するため、更新処理自体は短い間隔で実行する
+                self.interval_hours = float(os.getenv('RECRAWL_CHECK_INTERVAL_HOURS',
+                                                      os.getenv('RECRAWL_MIN_INTERVAL_HOURS', 6)))
+        # クロール結果は取得した順にJSONLへ追記する（中断時は次回続きから再開）
+        self.store = JsonlArticleStore(os.getenv('ARTICLES_PATH', 'data/articles.jsonl'))
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        # 初回実行・定期実行・手動実行が同じストアを同時に更新しないようにする
+        self.update_lock = threading.Lock()
         
-    def update_data(self):
-        """データ更新処理"""
+    @staticmethod
+    def create_recrawl_policy():
+        """RECRAWL_DAILY_BUDGETが設定されていれば記事ごとの再クロール方針を作成"""
+        daily_budget = int(os.getenv('RECRAWL_DAILY_BUDGET', 0))
+        if daily_budget <= 0:
+            return None
+        return RecrawlPolicy(
+            min_interval_hours=float(os.getenv('RECRAWL_MIN_INTERVAL_HOURS', 6)),
+            max_interval_hours=float(os.getenv('RECRAWL_MAX_INTERVAL_HOURS', 24 * 14)),
+            daily_budget=daily_budget
+        )
+        
+    def update_data(self) -> bool:
+        """データ更新処理（別の更新が実行中の場合は実行せずFalseを返す）"""
+        if not self.update_lock.acquire(blocking=False):
+            logger.warning("Update already in progress. Skipping")
+            return False
+        try:
+            self.run_update()
+        finally:
+            self.update_lock.release()
+        return True
+    
+    def run_update(self):
+        """クロールしてベクトルストアを更新する（update_dataから排他的に呼ぶ）"""
         try:
             logger.info(f"Starting scheduled update at {datetime.now()}")
             
             # サイトをクロール
-            articles = self.crawler.crawl_all()
+            count = self.crawler.crawl_to_store(self.store)
             
-            if not articles:
+            if not count:
                 logger.warning("No articles crawled")
                 return
             
-            # JSONに保存
-            self.crawler.save_to_json(articles)
+            # 前回から変化した記事のみを再インデックス化（ファイルから1件ずつ読み込む）
+            unchanged_urls = self.crawler.unchanged_urls
+            changed_articles = (
+                article for article in self.store.iter_articles()
+                if article['url'] not in unchanged_urls
+            )
             
             # ベクトルストアを更新
             if self.openai_api_key:
                 vs_manager = VectorStoreManager(self.openai_api_key)
-                vs_manager.update_index()
-                logger.info("Vector store updated successfully")
+                vs_manager.load_or_create_vectorstore()
+                
+                # インデックスが空、または以前の方式のチャンクが残っている場合は全記事を同期する
+                if vs_manager.needs_full_sync():
+                    changed_articles = self.store.iter_articles()
+                
+                # 現在の世代をコピーした新しい世代に書き込み、検証してから切り替える
+                # （稼働中のアプリは切り替わるまで現在の世代で検索を続ける）
+                vs_manager.begin_generation()
+                try:
+                    indexed = vs_manager.index_articles(changed_articles)
+                    # サイトから削除された記事のチャンクを取り除く
+                    # （取得に失敗した記事のチャンクは残し、一覧が不完全な場合は削除しない）
+                    if self.crawler.discovery_complete:
+                        live_urls = {article['url'] for article in self.store.iter_articles()}
+                        removed = vs_manager.remove_missing_articles(live_urls | self.crawler.failed_urls)
+                    else:
+                        logger.warning("Article discovery was incomplete. Skipping removal of missing articles")
+                        removed = 0
+                except Exception:
+                    vs_manager.abort_generation()
+                    raise
+                
+                if indexed or removed:
+                    vs_manager.commit_generation()
+                    logger.info(f"Vector store updated successfully ({indexed} changed articles, "
+                                f"{removed} stale chunks removed, generation {vs_manager.generation})")
+                else:
+                    vs_manager.abort_generation()
+                    logger.info("No article changes detected. Skipping re-indexing")
             else:
                 logger.error("OpenAI API key not found")
             
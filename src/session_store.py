@@ -0,0 +1,96 @@
+"""
+ログインセッションの保存
+認証済みのCookieを有効期限つきでディスクに保存し、次回のクロールで再利用します。
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+
+from requests.cookies import create_cookie
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    def __init__(self, filepath: str = 'data/session_cookies.json', max_session_age: float = 12 * 3600):
+        """
+        Args:
+            filepath: Cookieの保存先
+            max_session_age: 有効期限のないCookie（セッションCookie）を再利用する最大秒数
+        """
+        self.filepath = filepath
+        self.max_session_age = max_session_age
+
+    def load(self, session) -> bool:
+        """
+        保存済みのCookieをセッションに読み込む。
+        期限切れのCookieは除外し、有効なCookieが1つでも読み込めればTrueを返す。
+        """
+        if not os.path.exists(self.filepath):
+            return False
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading session cookies: {e}")
+            return False
+
+        now = time.time()
+        session_expired = now - data.get('saved_at', 0) > self.max_session_age
+        loaded = 0
+        for cookie in data.get('cookies', []):
+            expires = cookie.get('expires')
+            if expires is not None and expires <= now:
+                continue
+            if expires is None and session_expired:
+                continue
+            session.cookies.set_cookie(create_cookie(**cookie))
+            loaded += 1
+
+        if loaded:
+            logger.info(f"Loaded {loaded} session cookies from {self.filepath}")
+        return loaded > 0
+
+    @staticmethod
+    def _dump_cookies(session) -> List[Dict]:
+        return [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'secure': cookie.secure,
+                'expires': cookie.expires,
+                'rest': {'HttpOnly': cookie.get_nonstandard_attr('HttpOnly')}
+                        if cookie.has_nonstandard_attr('HttpOnly') else {},
+            }
+            for cookie in session.cookies
+        ]
+
+    def save(self, session):
+        """セッションのCookieをディスクに書き出す（本人のみ読み書きできる権限で保存）"""
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            data = json.dumps({'saved_at': time.time(), 'cookies': self._dump_cookies(session)})
+
+            tmp_path = self.filepath + '.tmp'
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.filepath)
+            logger.info(f"Saved {len(session.cookies)} session cookies to {self.filepath}")
+        except Exception as e:
+            logger.error(f"Error saving session cookies: {e}")
+
+    def clear(self):
+        """保存済みのCookieを削除"""
+        try:
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+        except OSError as e:
+            logger.error(f"Error removing session cookies: {e}")
@@ -0,0 +1,154 @@
+"""
+クロール対象サイトのプロファイル
+サイトごとのURL・リンクのパターン・本文セレクタ・認証方式・レート制限を定義します。
+ヘルプセンターを追加する場合は SITE_PROFILES にエントリを追加するか、
+CRAWL_SITES_FILE で指定したJSONファイルに記述します。
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    from .html_extract import DEFAULT_CONTENT_SELECTORS, DEFAULT_TITLE_SELECTORS
+except ImportError:
+    from html_extract import DEFAULT_CONTENT_SELECTORS, DEFAULT_TITLE_SELECTORS
+
+logger = logging.getLogger(__name__)
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+@dataclass
+class SiteProfile:
+    """
+    1サイト分のクロール設定
+
+    Attributes:
+        name: プロファイル名（チェックポイントやCookieファイルの識別に使う）
+        base_url: ヘルプセンターのトップページ
+        locale: URLのロケール表記（重複排除時に統一する）
+        listing_patterns: トップページからたどるカテゴリ・セクション一覧のリンク（空ならトップページの記事リンクを直接使う）
+        article_pattern: 記事ページのリンク
+        sitemap_path: サイトマップのパス（オリジンからの相対、Noneの場合は一覧ページを巡回）
+        breadcrumb_selectors: パンくずリストの候補（サイトマップで見つけた記事のカテゴリに使う）
+        title_selectors: タイトルノードの候補（"タグ.クラス" 形式）
+        content_selectors: 本文ノードの候補（"タグ.クラス" 形式）
+        category: 一覧ページを持たないサイトで全記事に付けるカテゴリ名
+        auth: 認証方式（none: なし / form: ログインフォーム）
+        login_path: ログインページのパス（base_urlからの相対）
+        login_email_env: ログインに使うメールアドレスの環境変数名
+        login_password_env: ログインに使うパスワードの環境変数名
+        requests_per_second: 初期レート（Noneの場合はエンジンの既定値）
+        max_requests_per_second: 上限レート（Noneの場合はエンジンの既定値）
+        headers: リクエストヘッダー
+    """
+    name: str
+    base_url: str
+    locale: Optional[str] = 'ja'
+    listing_patterns: Tuple[str, ...] = ('/hc/ja/categories/', '/hc/ja/sections/')
+    article_pattern: str = '/hc/ja/articles/'
+    sitemap_path: Optional[str] = '/hc/sitemap.xml'
+    breadcrumb_selectors: Tuple[str, ...] = ('ol.breadcrumbs',)
+    title_selectors: Tuple[str, ...] = DEFAULT_TITLE_SELECTORS
+    content_selectors: Tuple[str, ...] = DEFAULT_CONTENT_SELECTORS
+    category: Optional[str] = None
+    auth: str = 'none'
+    login_path: str = 'signin'
+    login_email_env: str = 'JTBC_LOGIN_EMAIL'
+    login_password_env: str = 'JTBC_LOGIN_PASSWORD'
+    requests_per_second: Optional[float] = None
+    max_requests_per_second: Optional[float] = None
+    headers: Dict[str, str] = field(default_factory=lambda: dict(BROWSER_HEADERS))
+
+    @property
+    def origin(self) -> str:
+        """スキームとホスト部分（https://example.com）"""
+        parts = urlsplit(self.base_url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SiteProfile':
+        """JSONの辞書からプロファイルを作成（未知のキーは無視）"""
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in data.items() if key in known}
+        for key in ('listing_patterns', 'title_selectors', 'content_selectors', 'breadcrumb_selectors'):
+            if key in values:
+                values[key] = tuple(values[key])
+        return cls(**values)
+
+
+SITE_PROFILES: Dict[str, SiteProfile] = {
+    'jtbc': SiteProfile(
+        name='jtbc',
+        base_url='https://biz.help.jtbc.info/hc/ja',
+        content_selectors=('div.article-body', 'article', 'main'),
+    ),
+    'jtbc_login': SiteProfile(
+        name='jtbc_login',
+        base_url='https://biz.help.jtbc.info/hc/ja',
+        content_selectors=('div.article-body', 'article', 'main', 'div.article-content'),
+        auth='form',
+    ),
+    'dmobile': SiteProfile(
+        name='dmobile',
+        base_url='https://help.dmobile.jp/hc/ja',
+        listing_patterns=(),
+        article_pattern='/articles/',
+        title_selectors=('h1',),
+        # よくあるクラス名を試し、見つからない場合はarticle・mainタグを探す
+        content_selectors=(
+            'div.article-body', 'article.article-body',
+            'div.article-content', 'article.article-content',
+            'div.article', 'article.article',
+            'div.content', 'article.content',
+            'div.main-content', 'article.main-content',
+            'article', 'main',
+        ),
+        category='dmobileサポート',
+        headers={'User-Agent': BROWSER_HEADERS['User-Agent']},
+    ),
+}
+
+
+def load_profiles(filepath: str) -> Dict[str, SiteProfile]:
+    """JSONファイル（プロファイルの配列）からプロファイルを読み込む"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    profiles = {}
+    for entry in entries:
+        profile = SiteProfile.from_dict(entry)
+        profiles[profile.name] = profile
+    logger.info(f"Loaded {len(profiles)} site profiles from {filepath}")
+    return profiles
+
+
+def get_profiles(names: Optional[str] = None) -> List[SiteProfile]:
+    """
+    クロール対象のプロファイルを返す。
+    namesはカンマ区切りのプロファイル名（省略時は環境変数CRAWL_SITES、既定はjtbc）。
+    CRAWL_SITES_FILEが設定されていれば、そのファイルの定義を組み込みの定義に追加する。
+    """
+    profiles = dict(SITE_PROFILES)
+    sites_file = os.getenv('CRAWL_SITES_FILE')
+    if sites_file:
+        profiles.update(load_profiles(sites_file))
+
+    names = names or os.getenv('CRAWL_SITES', 'jtbc')
+    selected = []
+    for name in (n.strip() for n in names.split(',')):
+        if not name:
+            continue
+        if name not in profiles:
+            raise ValueError(f"Unknown site profile: {name} (available: {', '.join(sorted(profiles))})")
+        selected.append(profiles[name])
+    return selected
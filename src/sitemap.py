@@ -0,0 +1,119 @@
+"""
+サイトマップによる記事の発見
+sitemap.xml（サイトマップインデックスを含む）から記事URLとlastmodを取り出し、
+前回のクロール時のlastmodと比較して、更新された記事だけを取得できるようにします。
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[Tuple[str, Optional[str]]], List[str]]:
+    """
+    サイトマップを解析し、((URL, lastmod) のリスト, 子サイトマップのURLのリスト) を返す。
+    名前空間のないサイトマップも受け付ける。
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+    try:
+        root = etree.fromstring(content, parser=parser)
+    except (etree.XMLSyntaxError, ValueError):
+        return [], []
+    if root is None:
+        return [], []
+
+    def child_text(element, name: str) -> Optional[str]:
+        found = element.find(f'{{{SITEMAP_NS}}}{name}')
+        if found is None:
+            found = element.find(name)
+        return found.text.strip() if found is not None and found.text else None
+
+    urls, sitemaps = [], []
+    tag = etree.QName(root).localname
+    for element in root:
+        if not isinstance(element.tag, str):
+            continue
+        loc = child_text(element, 'loc')
+        if not loc:
+            continue
+        if tag == 'sitemapindex':
+            sitemaps.append(loc)
+        else:
+            urls.append((loc, child_text(element, 'lastmod')))
+    return urls, sitemaps
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """lastmod（W3C日時形式）をdatetimeに変換"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class SitemapState:
+    """前回のクロールで取得した記事のlastmodを保存する"""
+
+    def __init__(self, filepath: str = 'data/sitemap_state.json'):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.lastmods: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading sitemap state: {e}")
+            return {}
+
+    def is_unchanged(self, key: str, lastmod: Optional[str]) -> bool:
+        """前回取得した時点からlastmodが進んでいなければTrue"""
+        if not lastmod:
+            return False
+        with self.lock:
+            previous = self.lastmods.get(key)
+        if previous is None:
+            return False
+        if previous == lastmod:
+            return True
+        previous_at, current_at = parse_lastmod(previous), parse_lastmod(lastmod)
+        return previous_at is not None and current_at is not None and current_at <= previous_at
+
+    def update(self, key: str, lastmod: Optional[str]):
+        """記事を取得できたときのlastmodを記録"""
+        if lastmod:
+            with self.lock:
+                self.lastmods[key] = lastmod
+
+    def save(self):
+        """状態をディスクに書き出す（一時ファイル経由で置き換え）"""
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with self.lock:
+                data = json.dumps(self.lastmods, ensure_ascii=False)
+
+            tmp_path = self.filepath + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.filepath)
+        except Exception as e:
+            logger.error(f"Error saving sitemap state: {e}")
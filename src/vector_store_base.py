@@ -0,0 +1,322 @@
+"""
+ベクトルストアの管理の共通処理
+インデックスの世代管理・記事のインデックス化・検索など、埋め込みの種類によらない処理をまとめます。
+埋め込み（OpenAI / Sentence Transformers）とテキスト分割の設定は各モジュールのVectorStoreManagerで行います。
+"""
+from typing import Callable, List, Dict, Iterable, Iterator, Optional
+import logging
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import os
+
+try:
+    from .article_store import iter_articles, batched
+    from .index_sync import (
+        upsert_chunks, prune_removed, has_legacy_chunks, count_chunks, save_index, validate_index,
+        list_categories, category_metadata
+    )
+    from .embedding_cache import CachedEmbeddings
+    from .flat_index import FlatIndex
+    from .lexical_index import LexicalIndex
+    from .retrieval import hybrid_search, category_filter
+    from .index_generations import IndexGenerations, GenerationWatcher
+except ImportError:
+    from article_store import iter_articles, batched
+    from index_sync import (
+        upsert_chunks, prune_removed, has_legacy_chunks, count_chunks, save_index, validate_index,
+        list_categories, category_metadata
+    )
+    from embedding_cache import CachedEmbeddings
+    from flat_index import FlatIndex
+    from lexical_index import LexicalIndex
+    from retrieval import hybrid_search, category_filter
+    from index_generations import IndexGenerations, GenerationWatcher
+
+logger = logging.getLogger(__name__)
+
+
+class BaseVectorStoreManager:
+    """VectorStoreManager（vector_store.py / vector_store_free.py）の共通処理"""
+
+    def __init__(self, embeddings: Embeddings, persist_directory: str = "./chroma_db", backend: str = None,
+                 batch_embeddings=None):
+        """
+        Args:
+            embeddings: チャンクと質問の埋め込み（ディスクのキャッシュを挟んで使う）
+            persist_directory: ベクトルストアの保存先
+            backend: ベクトルストアの種類（chroma / flat、省略時は環境変数VECTOR_BACKEND）
+            batch_embeddings: 長さ順のバッチで埋め込むBatchedSentenceEmbeddings（インデックス化のバッチの大きさに使う）
+        """
+        self.persist_directory = persist_directory
+        self.backend = backend or os.getenv('VECTOR_BACKEND', 'chroma')
+        # 文字n-gramの転置インデックス（HYBRID_SEARCH=falseで無効）
+        self.hybrid = os.getenv('HYBRID_SEARCH', 'true').lower() == 'true'
+        self.lexical_index = None
+        self.batch_embeddings = batch_embeddings
+        # 埋め込みはディスクにキャッシュし、変化のないチャンクを再計算しない
+        self.embeddings = CachedEmbeddings(
+            embeddings,
+            cache_path=os.getenv('EMBEDDING_CACHE_PATH', 'data/embedding_cache.sqlite')
+        )
+        self.vectorstore = None
+        # インデックスは世代ごとのディレクトリに作り、検証してから切り替える
+        self.generations = IndexGenerations(persist_directory, keep=int(os.getenv('INDEX_KEEP_GENERATIONS', '3')))
+        self.generation = None
+        self.building = None
+        
+    def _open(self, directory: str):
+        """directoryのベクトルストアと転置インデックスを開く"""
+        if self.backend == 'flat':
+            # NumPyのフラットインデックス（directory/flat_index に保存）
+            # VECTOR_PRECISIONにfloat16 / int8を指定すると圧縮形式で検索し、候補をfloat32で再スコアリングする
+            logger.info("Loading flat vector index...")
+            vectorstore = FlatIndex(
+                os.path.join(directory, 'flat_index'),
+                self.embeddings,
+                precision=os.getenv('VECTOR_PRECISION', 'float32'),
+                rescore=os.getenv('VECTOR_RESCORE', 'true').lower() == 'true'
+            )
+        else:
+            # Chroma（chromadb）はflatバックエンドでは読み込まない
+            from langchain_community.vectorstores import Chroma
+            if os.path.exists(directory):
+                logger.info("Loading existing vector store...")
+            else:
+                logger.info("Creating new vector store...")
+            vectorstore = Chroma(
+                persist_directory=directory,
+                embedding_function=self.embeddings
+            )
+        
+        lexical_index = None
+        if self.hybrid:
+            # ベクトルストアと同じチャンクの転置インデックス（ない場合はストアの全チャンクから作成）
+            lexical_index = LexicalIndex(os.path.join(directory, 'lexical_index.npz'))
+            lexical_index.sync(vectorstore)
+        return vectorstore, lexical_index
+    
+    def load_or_create_vectorstore(self):
+        """現在の世代のベクトルストアをロードまたは作成（開き終えてから差し替える）"""
+        generation = self.generations.current()
+        vectorstore, lexical_index = self._open(self.generations.path(generation))
+        self.vectorstore, self.lexical_index, self.generation = vectorstore, lexical_index, generation
+        return self.vectorstore
+    
+    def begin_generation(self) -> str:
+        """現在の世代をコピーした新しい世代を作り、以降の更新をその世代に書き込む"""
+        if self.vectorstore is None:
+            self.load_or_create_vectorstore()
+        # 世代の作成から有効化・破棄までは書き込みのロックを保持する（同時に動いた更新は待たせる）
+        self.building = self.generations.create()
+        try:
+            self.vectorstore, self.lexical_index = self._open(self.generations.path(self.building))
+        except Exception:
+            self.abort_generation()
+            raise
+        return self.building
+    
+    def commit_generation(self):
+        """
+        新しい世代を検証して有効化する
+        （検証に失敗した場合・作成後に現在の世代が変わっていた場合は破棄して例外を送出）
+        """
+        generation, self.building = self.building, None
+        try:
+            validate_index(self.vectorstore, self.lexical_index)
+            self.generations.activate(generation)
+        except Exception:
+            logger.error(f"Index generation {generation} failed validation or activation")
+            self.generations.discard(generation)
+            self.load_or_create_vectorstore()
+            raise
+        self.generation = generation
+    
+    def abort_generation(self):
+        """新しい世代を破棄して現在の世代に戻す"""
+        if self.building is not None:
+            self.generations.discard(self.building)
+            self.building = None
+        self.load_or_create_vectorstore()
+    
+    def watch_generations(self, on_reload: Optional[Callable[[], None]] = None,
+                          interval: float = None) -> GenerationWatcher:
+        """
+        別のプロセス（スケジューラー・update_index）が有効化した世代をバックグラウンドで読み込み、on_reloadを呼ぶ。
+        確認の間隔は環境変数INDEX_RELOAD_INTERVAL_SECONDS（秒）。
+        """
+        if interval is None:
+            interval = float(os.getenv('INDEX_RELOAD_INTERVAL_SECONDS', '30'))
+        
+        def on_change(generation):
+            logger.info(f"Switching to index generation {generation}...")
+            self.load_or_create_vectorstore()
+            if on_reload is not None:
+                on_reload()
+        
+        return GenerationWatcher(self.generations, on_change, interval=interval, generation=self.generation).start()
+    
+    def load_articles_from_json(self, filepath: str = 'data/articles.json') -> Iterator[Dict]:
+        """
+        記事ファイルから記事を1件ずつ読み込む（.jsonlはストリーミング読み込み）。
+        途中で読み込めなくなった場合は、残りの記事を削除済みと誤認しないよう例外をそのまま送出する。
+        """
+        count = 0
+        try:
+            for article in iter_articles(filepath):
+                count += 1
+                yield article
+        except Exception as e:
+            logger.error(f"Error loading articles from {filepath} after {count} articles: {e}")
+            raise
+        logger.info(f"Loaded {count} articles from {filepath}")
+    
+    def prepare_documents(self, articles: List[Dict]) -> List[Document]:
+        """記事をLangChainのDocumentオブジェクトに変換"""
+        documents = []
+        
+        for article in articles:
+            if article.get('content'):
+                doc = Document(
+                    page_content=article['content'],
+                    metadata={
+                        'title': article.get('title', ''),
+                        'url': article.get('url', ''),
+                        # 代表のカテゴリと、属するすべてのカテゴリのキー
+                        **category_metadata(article),
+                        'crawled_at': article.get('crawled_at', '')
+                    }
+                )
+                documents.append(doc)
+        
+        logger.info(f"Prepared {len(documents)} documents")
+        return documents
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """ドキュメントを小さなチャンクに分割（各モジュールで実装）"""
+        raise NotImplementedError
+    
+    def index_articles(self, articles: Iterable[Dict], batch_size: int = 100) -> int:
+        """
+        記事をインデックス化してベクトルストアに保存（batch_size件ずつ処理）。
+        チャンクIDで差分を判定し、変化したチャンクだけを追加・古いチャンクを削除する。
+        変化があった記事の件数を返す。
+        """
+        logger.info("Starting indexing process...")
+        self.embeddings.reset_stats()
+        if self.vectorstore is None:
+            self.load_or_create_vectorstore()
+        
+        documents_count = 0
+        added = deleted = 0
+        changed_urls = set()
+        
+        add_batch_size = None
+        if self.batch_embeddings is not None:
+            # 全プロセスに仕事が行き渡るよう記事のバッチを大きくし、
+            # 埋め込みが終わった分から順にストアへ書き込む
+            processes = max(1, self.batch_embeddings.processes)
+            batch_size *= processes
+            add_batch_size = self.batch_embeddings.batch_size * processes * 4
+        
+        try:
+            for batch in batched(articles, batch_size):
+                # ドキュメント準備
+                documents = self.prepare_documents(batch)
+                
+                if not documents:
+                    continue
+                
+                # チャンク分割
+                splits = self.split_documents(documents)
+                
+                # 変化したチャンクだけをベクトルストアに反映
+                batch_added, batch_deleted, batch_changed = upsert_chunks(
+                    self.vectorstore, splits, add_batch_size=add_batch_size, lexical_index=self.lexical_index
+                )
+                added += batch_added
+                deleted += batch_deleted
+                changed_urls.update(batch_changed)
+                documents_count += len(documents)
+        finally:
+            if self.batch_embeddings is not None:
+                self.batch_embeddings.close()
+        
+        save_index(self.vectorstore, self.lexical_index)
+        
+        if not documents_count:
+            logger.warning("No documents to index")
+            return 0
+        
+        logger.info(f"Indexing completed ({documents_count} documents, {len(changed_urls)} changed, "
+                    f"{added} chunks added, {deleted} stale chunks deleted)")
+        self.embeddings.log_stats()
+        return len(changed_urls)
+    
+    def remove_missing_articles(self, live_urls: Iterable[str]) -> int:
+        """記事ファイルにない（サイトから削除された）記事のチャンクを削除"""
+        if self.vectorstore is None:
+            self.load_or_create_vectorstore()
+        removed = prune_removed(self.vectorstore, set(live_urls), self.lexical_index)
+        save_index(self.vectorstore, self.lexical_index)
+        if removed:
+            logger.info(f"Removed {removed} chunks of deleted articles")
+        return removed
+    
+    def needs_full_sync(self) -> bool:
+        """インデックスが空、または以前の方式（ランダムなID・カテゴリの所属のキーなし）のチャンクが残っている場合はTrue"""
+        if self.vectorstore is None:
+            self.load_or_create_vectorstore()
+        return count_chunks(self.vectorstore) == 0 or has_legacy_chunks(self.vectorstore)
+    
+    def search(self, query: str, k: int = 4, category: Optional[str] = None) -> List[Document]:
+        """類似度検索を実行（categoryを指定するとそのカテゴリのチャンクだけを検索）"""
+        if self.vectorstore is None:
+            logger.error("Vector store not initialized")
+            return []
+        
+        if self.lexical_index is not None:
+            # 語句の一致とベクトル検索の結果を統合する
+            results = hybrid_search(self.vectorstore, self.lexical_index, query, self.embeddings.embed_query(query),
+                                    k=k, category=category)
+        else:
+            results = self.vectorstore.similarity_search(query, k=k, filter=category_filter(category))
+        logger.info(f"Found {len(results)} results for query: {query}")
+        return results
+    
+    def categories(self) -> List[Dict]:
+        """保存済みのチャンクのカテゴリと記事数"""
+        if self.vectorstore is None:
+            self.load_or_create_vectorstore()
+        return list_categories(self.vectorstore)
+    
+    def update_index(self, articles_filepath: str = 'data/articles.json'):
+        """インデックスを更新（新しい記事を追加）"""
+        logger.info("Updating index...")
+        
+        # 現在の世代をコピーした新しい世代に書き込む（稼働中のアプリは現在の世代を読み続ける）
+        self.load_or_create_vectorstore()
+        self.begin_generation()
+        
+        # 新しい記事を読み込み（1件ずつストリーミング）
+        live_urls = set()
+        
+        def articles():
+            for article in self.load_articles_from_json(articles_filepath):
+                live_urls.add(article.get('url', ''))
+                yield article
+        
+        # インデックス化（変化したチャンクのみ）し、削除された記事のチャンクを取り除く
+        try:
+            changed = self.index_articles(articles())
+            removed = self.remove_missing_articles(live_urls) if live_urls else 0
+        except Exception:
+            self.abort_generation()
+            raise
+        
+        if changed or removed:
+            # 検証してから新しい世代に切り替える
+            self.commit_generation()
+            logger.info(f"Index update completed (generation {self.generation})")
+        else:
+            self.abort_generation()
+            logger.info("No article changes detected")
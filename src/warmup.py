@@ -0,0 +1,66 @@
+"""
+バックグラウンドでの初期化
+LangChain・Chroma・埋め込みモデル・LLMの読み込みをHTTPサーバーの起動と並行して行い、
+その間は /api/ready などで初期化の状態を返せるようにします。
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTING = 'starting'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class Warmup:
+    """initializeをデーモンスレッドで1回だけ実行し、その状態を保持する"""
+
+    def __init__(self, initialize: Callable[[], bool], name: str = 'warmup'):
+        """
+        Args:
+            initialize: 初期化処理（成功したらTrueを返す）
+            name: スレッド名
+        """
+        self.initialize = initialize
+        self.state = STARTING
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self) -> 'Warmup':
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            ok = self.initialize()
+            self.state = READY if ok else FAILED
+            if not ok:
+                self.error = 'Initialization failed'
+        except Exception as e:
+            logger.error(f"Error during warmup: {e}")
+            self.state, self.error = FAILED, str(e)
+        self.finished_at = time.monotonic()
+        logger.info(f"Warmup {self.state} in {self.finished_at - self.started_at:.1f}s")
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """初期化の完了を待ち、準備ができたかを返す"""
+        self.thread.join(timeout)
+        return self.ready
+
+    def status(self) -> Dict:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'error': self.error,
+            'seconds': round(end - self.started_at, 2),
+        }
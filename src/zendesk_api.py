@@ -0,0 +1,307 @@
+"""
+Zendesk Help Center API クローラー
+HTMLを1ページずつ解析する代わりに、Help CenterのJSON APIから
+カテゴリ・セクション・記事をまとめて取得します。
+"""
+from bs4 import BeautifulSoup
+from typing import List, Dict, Iterator, Optional, Tuple
+import json
+import time
+from datetime import datetime
+import logging
+import os
+import requests
+from dotenv import load_dotenv
+
+try:
+    from .rate_limiter import AdaptiveThrottle
+    from .http_transport import create_session, TransportStats
+    from .article_store import JsonlArticleStore, iter_articles
+    from .crawl_archive import ResponseRecorder
+except ImportError:
+    from rate_limiter import AdaptiveThrottle
+    from http_transport import create_session, TransportStats
+    from article_store import JsonlArticleStore, iter_articles
+    from crawl_archive import ResponseRecorder
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ZendeskHelpCenterClient:
+    def __init__(self, base_url: str = "https://biz.help.jtbc.info", locale: str = "ja",
+                 per_page: int = 100, requests_per_second: Optional[float] = None,
+                 state_path: str = 'data/zendesk_state.json', full_sync_hours: Optional[float] = None,
+                 record_dir: Optional[str] = None):
+        """
+        Args:
+            base_url: ヘルプセンターのオリジン（ローカルの代替サーバーも指定可能）
+            locale: 記事のロケール
+            per_page: 1リクエストあたりの取得件数（最大100）
+            requests_per_second: 1秒あたりに許可するリクエスト数
+            state_path: 差分取得用の状態（前回の取得時刻）の保存先
+            full_sync_hours: 全記事の一覧を取得し直す間隔（時間、省略時は環境変数ZENDESK_FULL_SYNC_HOURS）
+            record_dir: APIのレスポンスを記録するディレクトリ（省略時は環境変数CRAWL_RECORD_DIR）
+        """
+        self.base_url = base_url.rstrip('/')
+        self.locale = locale
+        self.per_page = min(per_page, 100)
+        self.state_path = state_path
+        # 削除・アーカイブされた記事は差分エクスポートに現れないため、定期的に全記事の一覧で取り直す
+        self.full_sync_hours = (full_sync_hours if full_sync_hours is not None
+                                else float(os.getenv('ZENDESK_FULL_SYNC_HOURS', 24)))
+        # 429（APIのレート制限）やRetry-Afterに応じてレートを自動調整
+        self.rate_limiter = AdaptiveThrottle(
+            rate=requests_per_second or float(os.getenv('CRAWL_REQUESTS_PER_SECOND', 2.0)),
+            max_rate=float(os.getenv('CRAWL_MAX_REQUESTS_PER_SECOND', 8.0))
+        )
+        # 接続プール・リトライ・タイムアウトを設定した共通トランスポート
+        self.transport_stats = TransportStats()
+        self.session = create_session(
+            max_retries=int(os.getenv('CRAWL_MAX_RETRIES', 3)),
+            timeout=(5.0, float(os.getenv('CRAWL_TIMEOUT_SECONDS', 30))),
+            stats=self.transport_stats
+        )
+        self.session.headers.update({
+            'Accept': 'application/json',
+        })
+        # 記録したレスポンスはcrawl_archive.pyのReplayServerで再生できる
+        record_dir = record_dir or os.getenv('CRAWL_RECORD_DIR')
+        if record_dir:
+            recorder = ResponseRecorder(record_dir)
+            recorder.add_site('zendesk_api', self.base_url)
+            self.session.hooks['response'].append(recorder.record)
+
+        # 非公開記事を取得する場合はAPIトークンで認証
+        email = os.getenv('ZENDESK_EMAIL')
+        api_token = os.getenv('ZENDESK_API_TOKEN')
+        if email and api_token:
+            self.session.auth = (f"{email}/token", api_token)
+        # 差分エクスポートAPIはエージェントの認証が必要なため、認証情報がある場合だけ使う
+        self.authenticated = bool(email and api_token)
+
+        # 直近のクロールで前回から変化がなかった記事のURL
+        self.unchanged_urls = set()
+        # CrawlEngineと同じ属性（APIは一覧の取得に失敗するとクロール全体を中止するため常に完全）
+        self.failed_urls = set()
+        self.discovery_complete = True
+
+    def _get_json(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """APIを呼び出してJSONを返す"""
+        self.rate_limiter.acquire(url)
+        response = self.session.get(url, params=params)
+        self.rate_limiter.observe(url, response)
+        response.raise_for_status()
+        return response.json()
+
+    def _paginate(self, url: str, key: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """next_pageをたどって全ページの要素を返す"""
+        while url:
+            data = self._get_json(url, params)
+            items = data.get(key, [])
+            for item in items:
+                yield item
+
+            next_page = data.get('next_page')
+            if not items or next_page == url or data.get('end_of_stream'):
+                break
+            # next_pageにはクエリパラメータが含まれる
+            url, params = next_page, None
+
+    def get_categories(self) -> Dict[int, Dict]:
+        """カテゴリ一覧を取得（ID -> カテゴリ）"""
+        url = f"{self.base_url}/api/v2/help_center/{self.locale}/categories.json"
+        categories = {c['id']: c for c in self._paginate(url, 'categories', {'per_page': self.per_page})}
+        logger.info(f"Found {len(categories)} categories")
+        return categories
+
+    def get_sections(self) -> Dict[int, Dict]:
+        """セクション一覧を取得（ID -> セクション）"""
+        url = f"{self.base_url}/api/v2/help_center/{self.locale}/sections.json"
+        sections = {s['id']: s for s in self._paginate(url, 'sections', {'per_page': self.per_page})}
+        logger.info(f"Found {len(sections)} sections")
+        return sections
+
+    def iter_articles(self) -> Iterator[Dict]:
+        """全記事をページ単位で取得"""
+        url = f"{self.base_url}/api/v2/help_center/{self.locale}/articles.json"
+        params = {'per_page': self.per_page, 'sort_by': 'updated_at', 'sort_order': 'desc'}
+        return self._paginate(url, 'articles', params)
+
+    def iter_updated_articles(self, start_time: int) -> Iterator[Dict]:
+        """指定時刻（UNIX時間）以降に更新された記事を差分エクスポートAPIで取得（要認証）"""
+        url = f"{self.base_url}/api/v2/help_center/incremental/articles.json"
+        for article in self._paginate(url, 'articles', {'start_time': start_time}):
+            if article.get('locale', self.locale) == self.locale:
+                yield article
+
+    def to_article(self, item: Dict, sections: Dict[int, Dict], categories: Dict[int, Dict]) -> Dict:
+        """APIの記事データをクローラーと同じ形式の辞書に変換"""
+        section = sections.get(item.get('section_id'), {})
+        category = categories.get(section.get('category_id'), {})
+
+        content = ''
+        if item.get('body'):
+            content = BeautifulSoup(item['body'], 'html.parser').get_text(separator='\n', strip=True)
+
+        return {
+            'id': item.get('id'),
+            'title': item.get('title', ''),
+            'content': content,
+            'url': item.get('html_url', ''),
+            'category': category.get('name') or section.get('name', ''),
+            'crawled_at': datetime.now().isoformat()
+        }
+
+    def load_state(self) -> Dict:
+        """差分取得の状態を読み込む"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading Zendesk state: {e}")
+            return {}
+
+    def save_state(self, state: Dict):
+        """差分取得の状態を保存"""
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except Exception as e:
+            logger.error(f"Error saving Zendesk state: {e}")
+
+    def iter_crawl(self, incremental: bool = True, articles_path: str = 'data/articles.json') -> Iterator[Dict]:
+        """
+        記事を1件ずつ取得する。
+        incremental=Trueで認証情報が設定され、前回の取得時刻が記録されている場合は、それ以降に
+        更新された記事だけを取得し、前回の記事データ（articles_path）とマージして返す。
+        差分エクスポートAPIが401/403を返した場合は全記事の一覧に切り替える。
+        前回の全記事の取得からfull_sync_hoursが経過した場合も、削除された記事を取り除くため全記事を取得する。
+        """
+        self.unchanged_urls = set()
+        self.transport_stats.reset()
+        started_at = int(time.time())
+
+        categories = self.get_categories()
+        sections = self.get_sections()
+
+        state = self.load_state() if incremental else {}
+        full_sync_at = state.get('full_sync_at')
+        changes = None
+        if (self.authenticated and state.get('start_time') and os.path.exists(articles_path)
+                and full_sync_at and started_at - full_sync_at < self.full_sync_hours * 3600):
+            try:
+                changes = self.fetch_changes(state['start_time'], sections, categories)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in (401, 403):
+                    raise
+                logger.warning(f"Incremental export API returned {status}. Falling back to the full article listing")
+
+        if changes is not None:
+            updated, removed = changes
+            # 前回の記事データに更新分をマージ（タイトルの変更でURLが変わるため記事IDで照合する）
+            for article in iter_articles(articles_path):
+                if article.get('id') in removed or article.get('id') in updated:
+                    continue
+                self.unchanged_urls.add(article.get('url'))
+                yield article
+            yield from updated.values()
+        else:
+            full_sync_at = started_at
+            for item in self.iter_articles():
+                if item.get('draft'):
+                    continue
+                article = self.to_article(item, sections, categories)
+                if article['content']:
+                    logger.info(f"Fetched: {article['title']}")
+                    yield article
+
+        self.save_state({'start_time': started_at, 'full_sync_at': full_sync_at})
+
+    def fetch_changes(self, start_time: int, sections: Dict[int, Dict],
+                      categories: Dict[int, Dict]) -> Tuple[Dict[int, Dict], set]:
+        """前回の取得時刻以降に更新された記事（記事ID -> 記事）と、下書きに戻された記事のIDを返す"""
+        logger.info(f"Fetching articles updated since {datetime.fromtimestamp(start_time)}")
+        updated = {}
+        removed = set()
+        for item in self.iter_updated_articles(start_time):
+            if item.get('draft'):
+                removed.add(item.get('id'))
+                continue
+            article = self.to_article(item, sections, categories)
+            if article['content']:
+                updated[article['id']] = article
+                logger.info(f"Fetched: {article['title']}")
+            else:
+                # 本文が空になった記事は前回の内容を残さない
+                removed.add(article['id'])
+        return updated, removed
+
+    def crawl_all(self, incremental: bool = True, articles_path: str = 'data/articles.json') -> List[Dict]:
+        """全記事を取得する"""
+        logger.info("Starting Help Center API crawl...")
+        try:
+            all_articles = list(self.iter_crawl(incremental, articles_path))
+        except Exception as e:
+            logger.error(f"Error fetching articles from Help Center API: {e}")
+            return []
+
+        logger.info(f"HTTP stats: {self.transport_stats.summary()}")
+        logger.info(f"Crawl completed. Total articles: {len(all_articles)} "
+                    f"(unchanged: {len(self.unchanged_urls)})")
+        return all_articles
+
+    def crawl_to_store(self, store: JsonlArticleStore, resume: bool = True, incremental: bool = True) -> int:
+        """
+        全記事を取得し、1件ずつJSONLストアへ追記する。
+        APIは数回のリクエストで済むため、中断時は最初からやり直す（resumeは無視）。
+        取得に失敗した場合・1件も取得できなかった場合は、前回の記事データをそのまま残す。
+        """
+        logger.info("Starting Help Center API crawl...")
+        store.start(resume=False)
+        try:
+            for article in self.iter_crawl(incremental, store.filepath):
+                store.append(article)
+        except Exception as e:
+            logger.error(f"Error fetching articles from Help Center API: {e}")
+            store.close()
+            return 0
+
+        if not store.count and os.path.exists(store.filepath):
+            logger.error(f"No articles fetched from Help Center API. Keeping {store.filepath}")
+            store.discard()
+            return 0
+
+        store.finish()
+        logger.info(f"HTTP stats: {self.transport_stats.summary()}")
+        logger.info(f"Crawl completed. Total articles: {store.count} "
+                    f"(unchanged: {len(self.unchanged_urls)})")
+        return store.count
+
+    def save_to_json(self, articles: List[Dict], filepath: str = 'data/articles.json'):
+        """記事データをJSONファイルに保存"""
+        try:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(articles, f, ensure_ascii=False, indent=2)
+            logger.info(f"Saved {len(articles)} articles to {filepath}")
+        except Exception as e:
+            logger.error(f"Error saving to JSON: {e}")
+
+
+if __name__ == "__main__":
+    client = ZendeskHelpCenterClient(base_url=os.getenv('ZENDESK_BASE_URL', "https://biz.help.jtbc.info"))
+    articles = client.crawl_all()
+
+    if articles:
+        client.save_to_json(articles)
+        print(f"\n✅ Successfully fetched {len(articles)} articles!")
+    else:
+        print("\n❌ No articles were fetched.")
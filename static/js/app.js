@@ -9,10 +9,14 @@ const sendButton = document.getElementById('sendButton');
 const suggestionsButtons = document.getElementById('suggestionsButtons');
 const updateButton = document.getElementById('updateButton');
 const loading = document.getElementById('loading');
+const categoriesContainer = document.getElementById('categories');
+const categoryChips = document.getElementById('categoryChips');
+
+// 選択中のカテゴリ（nullは全カテゴリ）
+let selectedCategory = null;
 
 // 初期化
 document.addEventListener('DOMContentLoaded', () => {
-    loadSuggestions();
     setupEventListeners();
     checkStatus();
 });
@@ -69,6 +73,41 @@ function displaySuggestions(suggestions) {
     });
 }
 
+// カテゴリを読み込む
+async function loadCategories() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/categories`);
+        const data = await response.json();
+        
+        if (data.categories && data.categories.length) {
+            displayCategories(data.categories);
+        }
+    } catch (error) {
+        console.error('Error loading categories:', error);
+    }
+}
+
+// カテゴリのチップを表示（「すべて」で絞り込みを解除）
+function displayCategories(categories) {
+    categoryChips.innerHTML = '';
+    
+    const chips = [{ name: null, label: 'すべて' }].concat(
+        categories.map(category => ({ name: category.name, label: `${category.name} (${category.count})` }))
+    );
+    chips.forEach(chip => {
+        const button = document.createElement('button');
+        button.className = chip.name === selectedCategory ? 'category-chip active' : 'category-chip';
+        button.textContent = chip.label;
+        button.addEventListener('click', () => {
+            selectedCategory = chip.name;
+            categoryChips.querySelectorAll('.category-chip').forEach(b => b.classList.remove('active'));
+            button.classList.add('active');
+        });
+        categoryChips.appendChild(button);
+    });
+    categoriesContainer.style.display = 'block';
+}
+
 // メッセージを送信
 async function sendMessage() {
     const question = chatInput.value.trim();
@@ -94,7 +133,7 @@ async function sendMessage() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ question }),
+            body: JSON.stringify({ question, category: selectedCategory }),
         });
 
         const data = await response.json();
@@ -175,18 +214,32 @@ function showLoading(show) {
     loading.style.display = show ? 'flex' : 'none';
 }
 
-// ステータスチェック
+// ステータスチェック（初期化が終わるまで待ってからサジェスト質問を読み込む）
+const READY_POLL_INTERVAL_MS = 1000;
+let startingMessageShown = false;
+
 async function checkStatus() {
     try {
-        const response = await fetch(`${API_BASE_URL}/status`);
+        const response = await fetch(`${API_BASE_URL}/ready`);
         const data = await response.json();
         
-        if (!data.chatbot_ready) {
+        if (data.ready) {
+            loadSuggestions();
+            loadCategories();
+            return;
+        }
+        if (data.state === 'failed') {
+            addMessage('システムの初期化に失敗しました。管理者にお問い合わせください。', 'bot');
+            return;
+        }
+        if (!startingMessageShown) {
             addMessage('システムの初期化中です。少々お待ちください...', 'bot');
+            startingMessageShown = true;
         }
     } catch (error) {
         console.error('Error checking status:', error);
     }
+    setTimeout(checkStatus, READY_POLL_INTERVAL_MS);
 }
 
 // データ更新をトリガー